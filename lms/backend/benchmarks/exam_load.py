@@ -0,0 +1,171 @@
+"""
+Imtihon rejimi yuklama testi: butun filial bir vaqtda test topshiradi.
+
+Har bir imtihon topshiruvchi: POST /tests/{id}/start, har bir savolga
+`--think` soniya (o‘rtacha) o‘ylab PATCH avtosaqlash, oxirida barcha
+javoblari bilan POST /tests/attempts/{id}/submit. Hamma bir vaqtda
+boshlaydi — yakunlashlar ham bir necha soniya ichida keladi.
+
+Avval baza generator bilan to‘ldiriladi (benchmarks/generate.py), so‘ng
+bitta API node’ga qarshi:
+
+    uvicorn main:app --port 8000 --workers 1
+    python -m benchmarks.exam_load --base-url http://127.0.0.1:8000 --takers 500 --think 2
+
+    # serversiz, ilovani shu process ichida (ASGI) chaqirib
+    python -m benchmarks.exam_load --in-process --database-url sqlite:////tmp/lms_bench.db
+
+Bosqichlar bo‘yicha p50/p95/p99 latency, xatolar va umumiy throughput
+chiqariladi. Avtosaqlash buffer’i process ichida — natija bitta node
+(bitta uvicorn worker) uchun; bir nechta workerda client yakunlashda
+barcha javoblarini yuboradi (bu skript shunday qiladi).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.loadtest import auth, login, percentile  # noqa: E402
+
+PHASES = ("start", "autosave", "submit")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url")
+    target.add_argument("--in-process", action="store_true")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="--in-process uchun")
+    parser.add_argument("--takers", type=int, default=500, help="bir vaqtdagi imtihon topshiruvchilar")
+    parser.add_argument("--students", type=int, default=5_000, help="generatorga berilgan --students")
+    parser.add_argument("--think", type=float, default=2.0, help="savollar orasidagi o‘rtacha pauza, soniya")
+    parser.add_argument("--login-concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+# ------------------------------
+# Tayyorgarlik: login va har bir student uchun test
+# ------------------------------
+async def prepare(client, args, rng) -> list:
+    """[(token, test payload)] — o‘lchovdan oldin, cheklangan parallellik bilan."""
+    semaphore = asyncio.Semaphore(args.login_concurrency)
+    usernames = [f"student{i}" for i in rng.sample(range(args.students), min(args.takers, args.students))]
+
+    async def one(username):
+        async with semaphore:
+            token = auth(await login(client, username))
+            tests = await client.get("/tests/?limit=10", headers=token)
+            tests.raise_for_status()
+            tests = [t for t in tests.json() if t["questions"]]
+            if not tests:
+                return None
+            test = await client.get(f"/tests/{rng.choice(tests)['id']}", headers=token)
+            test.raise_for_status()
+            return token, test.json()
+
+    takers = [t for t in await asyncio.gather(*(one(u) for u in usernames)) if t is not None]
+    if not takers:
+        raise SystemExit("Studentlarda test yo‘q — avval benchmarks.generate ishga tushiring")
+    return takers
+
+
+# ------------------------------
+# Bitta imtihon
+# ------------------------------
+async def take_exam(client, token, test, args, rng, samples, errors):
+    async def call(phase, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=token, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        samples[phase].append(time.perf_counter() - started)
+        if not ok:
+            errors[phase] += 1
+        return response if ok else None
+
+    response = await call("start", "POST", f"/tests/{test['id']}/start")
+    if response is None:
+        return False
+    attempt_id = response.json()["attempt_id"]
+
+    answers = {}
+    for question in test["questions"]:
+        await asyncio.sleep(rng.uniform(0, 2 * args.think))
+        answers[question["id"]] = [rng.choice(question["options"])["id"]]
+        await call("autosave", "PATCH", f"/tests/attempts/{attempt_id}",
+                   json={"answers": {question["id"]: answers[question["id"]]}})
+
+    response = await call("submit", "POST", f"/tests/attempts/{attempt_id}/submit", json={"answers": answers})
+    return response is not None
+
+
+def report(result: dict):
+    total = sum(len(s) for s in result["samples"].values())
+    print(
+        f"\ntakers={result['takers']}  completed={result['completed']}  "
+        f"requests={total}  elapsed={result['elapsed']:.1f}s  throughput={total / result['elapsed']:.1f} req/s"
+    )
+    print(f"{'phase':>10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for phase in PHASES:
+        values = sorted(result["samples"][phase])
+        print(
+            f"{phase:>10} {len(values):>7} {result['errors'][phase]:>7} "
+            f"{percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+            f"{percentile(values, 99) * 1000:>9.1f} {(values[-1] if values else 0) * 1000:>9.1f}"
+        )
+
+
+async def run(args):
+    if args.in_process:
+        if not args.database_url:
+            raise SystemExit("--in-process uchun --database-url yoki DATABASE_URL kerak")
+        os.environ["DATABASE_URL"] = args.database_url
+        from main import app
+        from routers.exams import answer_buffer
+
+        await answer_buffer.start()  # ASGITransport lifespan’ni ishga tushirmaydi
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://examload", timeout=120)
+    else:
+        client = httpx.AsyncClient(
+            base_url=args.base_url, timeout=120,
+            limits=httpx.Limits(max_connections=args.takers),
+        )
+
+    async with client:
+        takers = await prepare(client, args, random.Random(args.seed))
+        questions = sum(len(test["questions"]) for _, test in takers) / len(takers)
+        print(f"takers={len(takers)} questions/test={questions:.0f} think={args.think}s")
+
+        samples = {phase: [] for phase in PHASES}
+        errors = {phase: 0 for phase in PHASES}
+        started = time.perf_counter()
+        completed = await asyncio.gather(*(
+            take_exam(client, token, test, args, random.Random(args.seed * 1000 + i), samples, errors)
+            for i, (token, test) in enumerate(takers)
+        ))
+        elapsed = time.perf_counter() - started
+        report({
+            "takers": len(takers), "completed": sum(completed),
+            "samples": samples, "errors": errors, "elapsed": elapsed,
+        })
+
+    if args.in_process:
+        await answer_buffer.stop()
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
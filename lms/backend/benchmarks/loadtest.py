@@ -0,0 +1,215 @@
+"""
+LMS API yuklama testi: haqiqiy endpointlarning vaznli aralashmasi.
+
+Avval baza generator bilan to‘ldiriladi (benchmarks/generate.py), so‘ng:
+
+    # ishlab turgan serverga qarshi
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --concurrency 1 10 50 --duration 30
+
+    # serversiz, ilovani shu process ichida (ASGI) chaqirib
+    python -m benchmarks.loadtest --in-process --database-url sqlite:////tmp/lms_bench.db
+
+Har bir concurrency darajasi uchun endpointlar bo‘yicha p50/p95/p99 latency,
+xatolar soni va umumiy throughput (req/s) chiqariladi.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.generate import ADMIN_USERNAME, BENCH_PASSWORD  # noqa: E402
+
+DEFAULT_MIX = "login=1,dashboard=4,attendance_report=3,payments=3,test_submit=2"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url")
+    target.add_argument("--in-process", action="store_true")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="--in-process uchun")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=20.0, help="har bir daraja uchun soniya")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=vazn,...")
+    parser.add_argument("--students", type=int, default=5_000, help="generatorga berilgan --students")
+    parser.add_argument("--sample", type=int, default=50, help="login qilinadigan studentlar soni")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    args.mix = {
+        name.strip(): float(weight)
+        for name, weight in (part.split("=") for part in args.mix.split(","))
+    }
+    unknown = set(args.mix) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"noma'lum endpointlar: {sorted(unknown)}")
+    return args
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# ------------------------------
+# Holat: tokenlar, guruhlar, testlar
+# ------------------------------
+class Fixture:
+    def __init__(self):
+        self.admin = None
+        self.students = []  # [(username, token, [test payload...])]
+        self.group_ids = []
+
+
+async def login(client, username: str) -> str:
+    response = await client.post("/auth/login", json={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def prepare(client, args, rng) -> Fixture:
+    fixture = Fixture()
+    fixture.admin = auth(await login(client, ADMIN_USERNAME))
+
+    groups = await client.get("/groups/?limit=500", headers=fixture.admin)
+    groups.raise_for_status()
+    fixture.group_ids = [g["id"] for g in groups.json()]
+
+    for index in rng.sample(range(args.students), min(args.sample, args.students)):
+        username = f"student{index}"
+        token = auth(await login(client, username))
+        tests = await client.get("/tests/?limit=10", headers=token)
+        tests.raise_for_status()
+        fixture.students.append((username, token, tests.json()))
+    if not fixture.group_ids or not any(tests for _, _, tests in fixture.students):
+        raise SystemExit("Bazada guruh yoki test yo‘q — avval benchmarks.generate ishga tushiring")
+    return fixture
+
+
+# ------------------------------
+# Endpointlar
+# ------------------------------
+async def op_login(client, fixture, rng):
+    username, _, _ = rng.choice(fixture.students)
+    return await client.post("/auth/login", json={"username": username, "password": BENCH_PASSWORD})
+
+
+async def op_dashboard(client, fixture, rng):
+    headers = fixture.admin if rng.random() < 0.5 else rng.choice(fixture.students)[1]
+    return await client.get("/dashboard/stats", headers=headers)
+
+
+async def op_attendance_report(client, fixture, rng):
+    today = date.today()
+    return await client.get(
+        f"/attendance/report/{rng.choice(fixture.group_ids)}?month={today.month}&year={today.year}",
+        headers=fixture.admin,
+    )
+
+
+async def op_payments(client, fixture, rng):
+    return await client.get("/payments/?limit=100", headers=fixture.admin)
+
+
+async def op_test_submit(client, fixture, rng):
+    _, token, tests = rng.choice([s for s in fixture.students if s[2]])
+    test = rng.choice(tests)
+    answers = [
+        {"question_id": q["id"], "option_id": rng.choice(q["options"])["id"]}
+        for q in test["questions"] if q["options"]
+    ]
+    return await client.post(f"/tests/{test['id']}/submit", json={"answers": answers}, headers=token)
+
+
+OPERATIONS = {
+    "login": op_login,
+    "dashboard": op_dashboard,
+    "attendance_report": op_attendance_report,
+    "payments": op_payments,
+    "test_submit": op_test_submit,
+}
+
+
+# ------------------------------
+# Yuklama
+# ------------------------------
+async def run_level(client, fixture, args, concurrency: int) -> dict:
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_id: int):
+        rng = random.Random(args.seed * 1000 + concurrency * 100 + worker_id)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, fixture, rng)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples[name].append(time.perf_counter() - started)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"samples": samples, "errors": errors, "elapsed": elapsed}
+
+
+def report(concurrency: int, result: dict):
+    total = sum(len(s) for s in result["samples"].values())
+    print(f"\nconcurrency={concurrency}  requests={total}  throughput={total / result['elapsed']:.1f} req/s")
+    print(f"{'endpoint':>18} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, values in result["samples"].items():
+        values = sorted(values)
+        print(
+            f"{name:>18} {len(values):>7} {result['errors'][name]:>7} "
+            f"{percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+            f"{percentile(values, 99) * 1000:>9.1f}"
+        )
+
+
+async def run(args):
+    if args.in_process:
+        if not args.database_url:
+            raise SystemExit("--in-process uchun --database-url yoki DATABASE_URL kerak")
+        os.environ["DATABASE_URL"] = args.database_url
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60)
+    else:
+        client = httpx.AsyncClient(
+            base_url=args.base_url, timeout=60,
+            limits=httpx.Limits(max_connections=max(args.concurrency)),
+        )
+
+    async with client:
+        fixture = await prepare(client, args, random.Random(args.seed))
+        print(f"mix={args.mix} duration={args.duration}s students={len(fixture.students)} groups={len(fixture.group_ids)}")
+        for concurrency in args.concurrency:
+            report(concurrency, await run_level(client, fixture, args, concurrency))
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
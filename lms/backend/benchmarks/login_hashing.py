@@ -0,0 +1,62 @@
+"""
+Login hot-path benchmark: bcrypt tekshiruvi PasswordHasher process pool’i orqali.
+
+Ishga tushirish (lms/backend papkasidan):
+    python -m benchmarks.login_hashing --logins 200 --workers 1 4 8
+
+Har bir worker soni uchun `--concurrency` ta bir vaqtdagi login so‘rovini
+taqlid qiluvchi korutinlar `await verify_and_update` chaqiradi va login/s
+o‘lchanadi.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routers.utils import BCRYPT_ROUNDS, PasswordHasher, _hash  # noqa: E402
+
+
+async def run(workers: int, logins: int, concurrency: int, rounds: int, hashed: str) -> float:
+    hasher = PasswordHasher(workers=workers, queue_limit=concurrency, rounds=rounds)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            valid, _ = await hasher.verify_and_update("secret", hashed)
+            return valid
+
+    try:
+        # Pool processlarini ishga tushirish vaqti o‘lchovga kirmasin
+        await asyncio.gather(*(hasher.verify_and_update("secret", hashed) for _ in range(workers)))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+    finally:
+        hasher.shutdown()
+
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=40, help="bir vaqtdagi login so‘rovlari")
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    hashed = _hash("secret", args.rounds)
+    print(f"bcrypt rounds={args.rounds} logins={args.logins} concurrency={args.concurrency} cpus={os.cpu_count()}")
+    print(f"{'workers':>8} {'logins/s':>10} {'ms/login':>10}")
+    for workers in args.workers:
+        rate = asyncio.run(run(workers, args.logins, args.concurrency, args.rounds, hashed))
+        print(f"{workers:>8} {rate:>10.1f} {1000 / rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
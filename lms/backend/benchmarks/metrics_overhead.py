@@ -0,0 +1,90 @@
+"""
+MetricsMiddleware + SQL hook’larining qo‘shimcha narxi.
+
+Ishga tushirish (lms/backend papkasidan):
+    python -m benchmarks.metrics_overhead --requests 2000 --rounds 5
+
+Bir xil endpoint (SQLite’dan 20 qator o‘qiydi) ikki ilovada — metrikasiz va
+MetricsMiddleware bilan — navbatma-navbat o‘lchanadi. Har bir ilova uchun eng
+yaxshi raund olinadi (shovqinni kamaytirish uchun) va farq foizda chiqariladi.
+Maqsad: < 2%.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from routers.metrics import MetricsMiddleware, MetricsRegistry  # noqa: E402
+
+
+def build_app(engine, instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{group_id}")
+    def list_items(group_id: int):
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT id, name FROM items WHERE group_id = :g ORDER BY id LIMIT 20"), {"g": group_id}
+            ).all()
+        return [{"id": i, "name": n} for i, n in rows]
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    return app
+
+
+async def run_round(app: FastAPI, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for i in queue:
+                response = await client.get(f"/items/{i % 10}")
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, group_id INTEGER, name TEXT)"))
+        conn.execute(text("CREATE INDEX ix_items_group ON items (group_id)"))
+        conn.execute(
+            text("INSERT INTO items (group_id, name) VALUES (:g, :n)"),
+            [{"g": i % 10, "n": f"item {i}"} for i in range(1000)],
+        )
+
+    apps = {"baseline": build_app(engine, False), "metrics": build_app(engine, True)}
+    best = {name: 0.0 for name in apps}
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            best[name] = max(best[name], asyncio.run(run_round(app, args.requests, args.concurrency)))
+
+    overhead = (best["baseline"] - best["metrics"]) / best["baseline"] * 100
+    print(f"requests={args.requests} rounds={args.rounds} concurrency={args.concurrency}")
+    for name, rate in best.items():
+        print(f"{name:>9} {rate:>10.1f} req/s")
+    print(f"overhead {overhead:>8.2f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
+import os
+
 import uvicorn
+from anyio import to_thread
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
-from routers.database import  engine, Base
+from routers.database import  engine, async_engine
+from routers.query_budget import QueryBudgetMiddleware
+from routers.metrics import MetricsMiddleware
+from routers.jobs import job_runner
+from routers.exams import answer_buffer
+from routers.utils import hasher
 from routers import (
     auth_router,
     attend_router,
@@ -13,7 +21,9 @@ from routers import (
     teachers_router,
     tests_router,
     users_router,
-    dashboard_router
+    dashboard_router,
+    metrics_router,
+    jobs_router
 )
 app = FastAPI(title="LMS Backend")
 
@@ -31,9 +41,66 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],         # Barcha metodlarga ruxsat (GET, POST, PUT, DELETE)
     allow_headers=["*"],         # Barcha header’lar uchun
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate", "X-DB-Route"],  # sahifalash va DB route header’lari
 )
 
-Base.metadata.create_all(bind=engine)
+# Endpointlarning SQL budjeti (@sql_budget) — SQL_BUDGET_STRICT=1 da oshib ketsa 500
+app.add_middleware(QueryBudgetMiddleware)
+
+# Route bo‘yicha latency/SQL metrikalari — GET /metrics (Prometheus)
+app.add_middleware(MetricsMiddleware)
+
+# Sync endpointlar ishlaydigan threadpool hajmi (Starlette default: 40)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+
+@app.on_event("startup")
+def configure_threadpool():
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+# Sxema Alembic migratsiyalari bilan boshqariladi (`python migrate.py --upgrade`).
+# AUTO_MIGRATE=1 bo‘lsa ilova ishga tushganda migratsiyalar qo‘llanadi.
+@app.on_event("startup")
+def apply_migrations():
+    if os.getenv("AUTO_MIGRATE") == "1":
+        from migrate import upgrade_head
+        upgrade_head()
+
+
+# Og‘ir hisobotlar uchun fon workerlari (JOB_WORKERS=0 — faqat `python worker.py`)
+@app.on_event("startup")
+async def start_job_runner():
+    await job_runner.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    await job_runner.stop()
+
+
+# Imtihon avtosaqlash buffer’i: fon task’i draftlarni partiyalab yozadi (to‘xtashda oxirgi flush)
+@app.on_event("startup")
+async def start_answer_buffer():
+    await answer_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_answer_buffer():
+    await answer_buffer.stop()
+
+
+# Bcrypt pool processlari "spawn" bilan yaratiladi (server socket’ini meros olmaydi);
+# pool shutdown’da aniq yopiladi — worker processlar server bilan birga tugaydi
+@app.on_event("shutdown")
+def stop_password_hasher():
+    hasher.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
 
 app.include_router(auth_router)
 app.include_router(attend_router)
@@ -45,6 +112,8 @@ app.include_router(students_router)
 app.include_router(teachers_router)
 app.include_router(users_router)
 app.include_router(dashboard_router)
+app.include_router(metrics_router)
+app.include_router(jobs_router)
 
 
 
@@ -0,0 +1,67 @@
+"""
+Migratsiyalar holati.
+
+    python migrate.py            # qaysi migratsiyalar qo‘llanmaganini ko‘rsatadi (bo‘lsa exit code 1)
+    python migrate.py --upgrade  # barcha kutilayotgan migratsiyalarni qo‘llaydi
+
+Mavjud (create_all bilan yaratilgan) bazani birinchi marta ulashda:
+    alembic stamp 0001 && alembic upgrade head
+"""
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    return config
+
+
+def pending_revisions(config: Config = None) -> list:
+    """Bazaga hali qo‘llanmagan revisionlar (eskisidan yangisiga)."""
+    from routers.database import engine
+
+    config = config or alembic_config()
+    script = ScriptDirectory.from_config(config)
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_heads()
+
+    pending = []
+    for head in script.get_heads():
+        for rev in script.iterate_revisions(head, current or "base"):
+            if rev.revision not in current:
+                pending.append(rev)
+    return list(reversed(pending))
+
+
+def upgrade_head(config: Config = None):
+    config = config or alembic_config()
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def main():
+    if "--upgrade" in sys.argv:
+        upgrade_head()
+
+    pending = pending_revisions()
+    if not pending:
+        print("✅ Database is up to date")
+        return 0
+
+    print(f"⏳ {len(pending)} pending migration(s):")
+    for rev in pending:
+        print(f"  {rev.revision}  {rev.doc.splitlines()[0] if rev.doc else ''}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, BASE_DIR)
+    sys.exit(main())
@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from routers.database import Base, engine
+from routers import models  # noqa: F401 — jadvallar metadata’ga ro‘yxatdan o‘tadi
+from routers.search import FTS_TABLE, TRGM_INDEX
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # Qidiruv indekslari modelda emas, migratsiya 0007 da qo‘lda quriladi
+    if type_ == "table" and name.startswith(FTS_TABLE):
+        return False
+    if type_ == "index" and name == TRGM_INDEX:
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+        include_name=include_name,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Ilova ishlatadigan engine (DATABASE_URL, pool sozlamalari) qayta ishlatiladi
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True,  # SQLite ALTER cheklovlari uchun
+            include_name=include_name,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,180 @@
+"""initial schema
+
+Ilgari `Base.metadata.create_all` yaratgan sxema. Mavjud bazalar uchun:
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+userrole = sa.Enum("admin", "teacher", "manager", "student", name="userrole")
+studentstatus = sa.Enum("interested", "studying", "left", "graduated", name="studentstatus")
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == "sqlite"
+
+    # users <-> groups <-> courses aylana FK: users.group_id keyin qo‘shiladi
+    # (SQLite mavjud bo‘lmagan jadvalga FK e’lon qilishga ruxsat beradi)
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("role", userrole, nullable=True),
+        sa.Column("phone", sa.String(), nullable=True),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("age", sa.Integer(), nullable=True),
+        sa.Column("group_id", sa.Integer(), *([sa.ForeignKey("groups.id")] if sqlite else []), nullable=True),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("subject", sa.String(), nullable=True),
+        sa.Column("fee", sa.Float(), nullable=True),
+        sa.Column("status", studentstatus, nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "courses",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("teacher_name", sa.String(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=True),
+        sa.Column("start_date", sa.Date(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_courses_id", "courses", ["id"])
+
+    op.create_table(
+        "groups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index("ix_groups_id", "groups", ["id"])
+
+    if not sqlite:
+        op.create_foreign_key("users_group_id_fkey", "users", "groups", ["group_id"], ["id"])
+
+    op.create_table(
+        "group_students",
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id"), nullable=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+    op.create_table(
+        "group_teachers",
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id"), nullable=True),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id"), nullable=True),
+        sa.Column("month", sa.String(length=7), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "attendance",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id"), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_attendance_id", "attendance", ["id"])
+
+    op.create_table(
+        "tests",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tests_id", "tests", ["id"])
+
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("test_id", sa.Integer(), sa.ForeignKey("tests.id"), nullable=True),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_questions_id", "questions", ["id"])
+
+    op.create_table(
+        "options",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=True),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("is_correct", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_options_id", "options", ["id"])
+
+    op.create_table(
+        "student_answers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=True),
+        sa.Column("selected_option_id", sa.Integer(), sa.ForeignKey("options.id"), nullable=True),
+        sa.Column("submitted_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_student_answers_id", "student_answers", ["id"])
+
+    op.create_table(
+        "student_courses",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), nullable=True),
+        sa.Column("joined_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    for table in (
+        "student_courses", "student_answers", "options", "questions", "tests", "attendance",
+        "payments", "group_teachers", "group_students",
+    ):
+        op.drop_table(table)
+    if op.get_bind().dialect.name != "sqlite":
+        op.drop_constraint("users_group_id_fkey", "users", type_="foreignkey")
+    op.drop_table("groups")
+    op.drop_table("courses")
+    op.drop_table("users")
+    studentstatus.drop(op.get_bind(), checkfirst=True)
+    userrole.drop(op.get_bind(), checkfirst=True)
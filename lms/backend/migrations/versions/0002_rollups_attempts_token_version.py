@@ -0,0 +1,99 @@
+"""dashboard rollup, test attempts, attendance uniqueness, token version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "dashboard_counters",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index("ix_payments_created_at", "payments", ["created_at"])
+
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+    # Bir kunda bir student uchun bitta yozuv — avval takrorlar o‘chiriladi
+    op.execute(
+        "DELETE FROM attendance WHERE id NOT IN "
+        "(SELECT min_id FROM (SELECT MIN(id) AS min_id FROM attendance "
+        "GROUP BY group_id, student_id, date) AS keep)"
+    )
+    with op.batch_alter_table("attendance") as batch:
+        batch.create_unique_constraint("uq_attendance_group_student_date", ["group_id", "student_id", "date"])
+
+    op.create_table(
+        "test_attempts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("test_id", sa.Integer(), sa.ForeignKey("tests.id"), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("submitted_at", sa.DateTime(), nullable=True),
+        sa.Column("score", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_test_attempts_id", "test_attempts", ["id"])
+    op.create_index("ix_test_attempts_student_id", "test_attempts", ["student_id"])
+    op.create_index("ix_test_attempts_test_id", "test_attempts", ["test_id"])
+
+    with op.batch_alter_table("student_answers") as batch:
+        batch.add_column(sa.Column("attempt_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key(
+            "student_answers_attempt_id_fkey", "test_attempts", ["attempt_id"], ["id"]
+        )
+        batch.create_index("ix_student_answers_attempt_id", ["attempt_id"])
+
+    # Eski javoblardan urinishlar: bitta submit = bir xil submitted_at
+    op.execute(
+        """
+        INSERT INTO test_attempts (student_id, test_id, started_at, submitted_at, score, total)
+        SELECT sa.student_id, q.test_id, sa.submitted_at, sa.submitted_at,
+               SUM(CASE WHEN o.is_correct = 1 THEN 1 ELSE 0 END),
+               (SELECT COUNT(*) FROM questions q2 WHERE q2.test_id = q.test_id)
+        FROM student_answers sa
+        JOIN questions q ON q.id = sa.question_id
+        LEFT JOIN options o ON o.id = sa.selected_option_id
+        WHERE sa.attempt_id IS NULL AND sa.student_id IS NOT NULL AND q.test_id IS NOT NULL
+        GROUP BY sa.student_id, q.test_id, sa.submitted_at
+        """
+    )
+    op.execute(
+        """
+        UPDATE student_answers SET attempt_id = (
+            SELECT ta.id FROM test_attempts ta
+            JOIN questions q ON q.test_id = ta.test_id
+            WHERE q.id = student_answers.question_id
+              AND ta.student_id = student_answers.student_id
+              AND ta.submitted_at = student_answers.submitted_at
+        )
+        WHERE attempt_id IS NULL
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("student_answers") as batch:
+        batch.drop_index("ix_student_answers_attempt_id")
+        batch.drop_constraint("student_answers_attempt_id_fkey", type_="foreignkey")
+        batch.drop_column("attempt_id")
+    op.drop_table("test_attempts")
+    with op.batch_alter_table("attendance") as batch:
+        batch.drop_constraint("uq_attendance_group_student_date", type_="unique")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
+    op.drop_index("ix_payments_created_at", table_name="payments")
+    op.drop_table("dashboard_counters")
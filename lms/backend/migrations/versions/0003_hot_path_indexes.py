@@ -0,0 +1,68 @@
+"""hot-path indexes and membership primary keys
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_attendance_group_date", "attendance", ["group_id", "date"]),
+    ("ix_student_answers_student_question", "student_answers", ["student_id", "question_id"]),
+    ("ix_questions_test_id", "questions", ["test_id"]),
+    ("ix_options_question_id", "options", ["question_id"]),
+    ("ix_payments_student_id", "payments", ["student_id"]),
+    ("ix_payments_month", "payments", ["month"]),
+    ("ix_users_role_status", "users", ["role", "status"]),
+]
+
+MEMBERSHIPS = [
+    ("group_students", "student_id"),
+    ("group_teachers", "teacher_id"),
+]
+
+
+def _dedupe(table: str, member: str):
+    bind = op.get_bind()
+    op.execute(f"DELETE FROM {table} WHERE group_id IS NULL OR {member} IS NULL")
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            f"DELETE FROM {table} a USING {table} b "
+            f"WHERE a.ctid < b.ctid AND a.group_id = b.group_id AND a.{member} = b.{member}"
+        )
+    else:
+        op.execute(
+            f"DELETE FROM {table} WHERE rowid NOT IN "
+            f"(SELECT MIN(rowid) FROM {table} GROUP BY group_id, {member})"
+        )
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+    # Takroriy a’zoliklar olib tashlanadi, keyin (group_id, member) primary key
+    for table, member in MEMBERSHIPS:
+        _dedupe(table, member)
+        with op.batch_alter_table(table, recreate="auto") as batch:
+            batch.alter_column("group_id", existing_type=sa.Integer(), nullable=False)
+            batch.alter_column(member, existing_type=sa.Integer(), nullable=False)
+            batch.create_primary_key(f"{table}_pkey", ["group_id", member])
+
+
+def downgrade():
+    for table, member in MEMBERSHIPS:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(f"{table}_pkey", type_="primary")
+            batch.alter_column("group_id", existing_type=sa.Integer(), nullable=True)
+            batch.alter_column(member, existing_type=sa.Integer(), nullable=True)
+
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+"""monthly payment rollup for the ledger
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "payment_month_totals",
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("student_id", "month"),
+    )
+    op.execute(
+        """
+        INSERT INTO payment_month_totals (student_id, month, amount)
+        SELECT student_id, month, SUM(amount) FROM payments
+        WHERE student_id IS NOT NULL AND month IS NOT NULL
+        GROUP BY student_id, month
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("payment_month_totals")
@@ -0,0 +1,40 @@
+"""background jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("result_path", sa.String(), nullable=True),
+        sa.Column("result_name", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_jobs_status_id", "jobs", ["status", "id"])
+    op.create_index("ix_jobs_created_by", "jobs", ["created_by"])
+
+
+def downgrade():
+    op.drop_index("ix_jobs_created_by", table_name="jobs")
+    op.drop_index("ix_jobs_status_id", table_name="jobs")
+    op.drop_table("jobs")
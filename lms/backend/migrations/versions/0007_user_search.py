@@ -0,0 +1,129 @@
+"""user search key with trigram / FTS5 index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 1000
+
+# ------------------------------
+# routers.search’dan muzlatilgan nusxa (2026-10-18 holati). Migratsiya ilova
+# kodiga bog‘lanmaydi: keyinchalik fold() o‘zgarsa, bu revision eski bazalarda
+# baribir shu natijani beradi; yangi qoidalar uchun alohida backfill yoziladi.
+# ------------------------------
+FTS_TABLE = "users_fts"
+TRGM_INDEX = "ix_users_search_key_trgm"
+COUNTRY_CODE = "998"
+
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "ғ": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "қ": "q", "л": "l", "м": "m",
+    "н": "n", "о": "o", "ў": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ҳ": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+_LATIN_VARIANTS = [("kh", "x"), ("iy", "i")]
+_APOSTROPHES = re.compile(r"['`‘’ʻʼ]")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def _fold(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(_CYRILLIC.get(ch, ch) for ch in text)
+    text = _APOSTROPHES.sub("", text)
+    text = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)
+    )
+    for variant, canonical in _LATIN_VARIANTS:
+        text = text.replace(variant, canonical)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _phone_digits(phone):
+    digits = _NON_DIGIT.sub("", phone or "")
+    if len(digits) == 9:
+        digits = COUNTRY_CODE + digits
+    return digits
+
+
+def _build_search_key(full_name, username, phone):
+    return " ".join(part for part in (_fold(full_name), _fold(username), _phone_digits(phone)) if part)
+
+
+def _backfill():
+    users = sa.table(
+        "users", sa.column("id"), sa.column("full_name"), sa.column("username"),
+        sa.column("phone"), sa.column("search_key"),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(users.c.id, users.c.full_name, users.c.username, users.c.phone)).all()
+    stmt = users.update().where(users.c.id == sa.bindparam("_id")).values(search_key=sa.bindparam("_key"))
+    for start in range(0, len(rows), BACKFILL_BATCH):
+        bind.execute(stmt, [
+            {"_id": id_, "_key": _build_search_key(full_name, username, phone)}
+            for id_, full_name, username, phone in rows[start:start + BACKFILL_BATCH]
+        ])
+
+
+def upgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("search_key", sa.Text(), nullable=True))
+    _backfill()
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            TRGM_INDEX, "users", ["search_key"],
+            postgresql_using="gin", postgresql_ops={"search_key": "gin_trgm_ops"},
+        )
+        return
+
+    # SQLite: users jadvaliga bog‘langan (external content) FTS5 trigram jadvali.
+    # Diqqat: users jadvalini qayta yaratadigan batch migratsiyalar triggerlarni
+    # o‘chiradi — ular shu yerdagidek qayta yaratilishi kerak.
+    op.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"search_key, content='users', content_rowid='id', tokenize='trigram')"
+    )
+    op.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON users BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON users BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF search_key ON users BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key); "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END"
+    )
+    op.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    # Statistikasiz planner qidiruvda FTS o‘rniga ix_users_role_status’ni tanlaydi
+    op.execute("ANALYZE users")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index(TRGM_INDEX, table_name="users")
+    else:
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("search_key")
@@ -0,0 +1,54 @@
+"""exam sessions: attempt status/deadline and autosave drafts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+OPEN = sa.text("status = 'in_progress'")
+
+
+def upgrade():
+    with op.batch_alter_table("tests") as batch:
+        batch.add_column(sa.Column("duration_minutes", sa.Integer(), nullable=True))
+
+    # Mavjud urinishlar allaqachon topshirilgan
+    with op.batch_alter_table("test_attempts") as batch:
+        batch.add_column(sa.Column("status", sa.String(length=20), nullable=False, server_default="submitted"))
+        batch.add_column(sa.Column("deadline_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ux_test_attempts_open", "test_attempts", ["student_id", "test_id"], unique=True,
+        postgresql_where=OPEN, sqlite_where=OPEN,
+    )
+    op.create_index(
+        "ix_test_attempts_open_deadline", "test_attempts", ["deadline_at"],
+        postgresql_where=OPEN, sqlite_where=OPEN,
+    )
+
+    op.create_table(
+        "attempt_drafts",
+        sa.Column("attempt_id", sa.Integer(), sa.ForeignKey("test_attempts.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("question_id", sa.Integer(), nullable=False),
+        sa.Column("option_ids", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("attempt_id", "question_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("attempt_drafts")
+    op.drop_index("ix_test_attempts_open_deadline", table_name="test_attempts")
+    op.drop_index("ux_test_attempts_open", table_name="test_attempts")
+    with op.batch_alter_table("test_attempts") as batch:
+        batch.drop_column("deadline_at")
+        batch.drop_column("status")
+    with op.batch_alter_table("tests") as batch:
+        batch.drop_column("duration_minutes")
@@ -0,0 +1,48 @@
+"""exam timestamps as timezone-aware UTC
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+# Imtihon vaqtlari endi bitta konvensiyada — aware UTC (exams.utcnow)
+COLUMNS = [
+    ("test_attempts", "started_at"),
+    ("test_attempts", "submitted_at"),
+    ("test_attempts", "deadline_at"),
+    ("student_answers", "submitted_at"),
+    ("attempt_drafts", "updated_at"),
+]
+
+
+def upgrade():
+    # SQLite’da saqlash formati o‘zgarmaydi (qiymatlar UTC matn sifatida qoladi)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # Mavjud qiymatlar UTC deb olinadi: aware Toshkent vaqti ham `timestamp` ustunga
+    # sessiya vaqt zonasiga (serverda UTC) o‘girilib yozilgan
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(timezone=True), existing_type=sa.DateTime(),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(), existing_type=sa.DateTime(timezone=True),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
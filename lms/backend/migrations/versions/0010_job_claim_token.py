@@ -0,0 +1,26 @@
+"""jobs: claim token for reclaimed jobs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Har bir claim yangi token yozadi — muddati o‘tib qayta olingan jobni
+    # birinchi worker yakunlay olmaydi
+    with op.batch_alter_table("jobs") as batch:
+        batch.add_column(sa.Column("claim_token", sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("jobs") as batch:
+        batch.drop_column("claim_token")
@@ -9,9 +9,12 @@ from .teachers import teachers_router
 from .test_page import tests_router
 from .users import users_router
 from .dashboard import dashboard_router
+from .metrics import metrics_router
+from .jobs import jobs_router
 
 __all__ = [
     "Base", "engine", "auth_router", "attend_router", "courses_router",
     "groups_router", "payments_router", "students_router", "teachers_router",
-    "tests_router", "users_router", "dashboard_router"
+    "tests_router", "users_router", "dashboard_router", "metrics_router",
+    "jobs_router"
 ]
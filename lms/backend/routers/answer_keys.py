@@ -0,0 +1,88 @@
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from .cache import LRUCache
+from .loaders import TEST_DETAIL
+from .models import Test
+from .schemas import TestResponse
+
+# ==============================
+# Kompilyatsiya qilingan javob kalitlari
+# ==============================
+# Test e'lon qilingandan keyin o‘zgarmaydi; savollar qo‘shilsa Test.version
+# oshadi. Shu sabab (test_id, version) bo‘yicha bir marta quriladi:
+#   - savollar tartibi va har bir variantning (savol, bit) joylashuvi
+#   - har bir savol uchun to‘g‘ri variantlar bitmap’i
+#   - studentga beriladigan TestResponse JSON’i (tayyor baytlar)
+# Baholash shundan keyin DB’siz, faqat bit amallari bilan bajariladi.
+ANSWER_KEY_CACHE_SIZE = int(os.getenv("ANSWER_KEY_CACHE_SIZE", "256"))
+
+
+class CompiledTest:
+    __slots__ = ("test_id", "version", "question_ids", "option_slots", "correct_masks", "payload")
+
+    def __init__(self, test: Test):
+        self.test_id = test.id
+        self.version = test.version
+        self.question_ids: Tuple[int, ...] = tuple(q.id for q in test.questions)
+        # option_id -> (question_id, bit)
+        self.option_slots: Dict[int, Tuple[int, int]] = {}
+        # question_id -> to‘g‘ri variantlar bitmap’i
+        self.correct_masks: Dict[int, int] = {}
+        for question in test.questions:
+            mask = 0
+            for position, option in enumerate(question.options):
+                bit = 1 << position
+                self.option_slots[option.id] = (question.id, bit)
+                if option.is_correct:
+                    mask |= bit
+            self.correct_masks[question.id] = mask
+        self.payload: bytes = TestResponse.model_validate(test).model_dump_json().encode()
+
+    @property
+    def total(self) -> int:
+        return len(self.question_ids)
+
+    def selected_pairs(self, answers: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Shu testga tegishli, takrorlanmagan (question_id, option_id) juftliklari (StudentAnswer qatorlari)."""
+        return list(dict.fromkeys(
+            (question_id, option_id) for question_id, option_id in answers
+            if self.option_slots.get(option_id, (None,))[0] == question_id
+        ))
+
+    def selected_masks(self, answers: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+        """(question_id, option_id) juftliklaridan savol -> tanlangan bitmap (begona variantlar tashlanadi)."""
+        selected: Dict[int, int] = {}
+        for question_id, option_id in answers:
+            slot = self.option_slots.get(option_id)
+            if slot is None or slot[0] != question_id:
+                continue
+            selected[question_id] = selected.get(question_id, 0) | slot[1]
+        return selected
+
+    def grade(self, answers: Iterable[Tuple[int, int]]) -> int:
+        """
+        To‘g‘ri yechilgan savollar soni: tanlangan variantlar to‘g‘rilari bilan aynan
+        mos kelishi kerak — barcha variantni belgilash ball bermaydi (0 <= ball <= total).
+        """
+        return sum(
+            mask == self.correct_masks[question_id]
+            for question_id, mask in self.selected_masks(answers).items()
+        )
+
+
+_compiled = LRUCache(maxsize=ANSWER_KEY_CACHE_SIZE)
+
+
+def get_compiled(db: Session, test_id: int, version: int) -> CompiledTest:
+    """Keshdan oladi; yo‘q bo‘lsa testni savollar/variantlari bilan (2 so‘rov) yuklab kompilyatsiya qiladi."""
+    key = (test_id, version)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        test = db.query(Test).options(*TEST_DETAIL).filter(Test.id == test_id).one()
+        compiled = CompiledTest(test)
+        # Yuklash paytida versiya o‘zgargan bo‘lsa yangi kalit ostida saqlanadi
+        _compiled.set((test_id, compiled.version), compiled)
+    return compiled
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from typing import List, Optional
 
 from datetime import datetime, date
-from .models import User, UserRole, Group, Attendance
-from .dependencies import get_db, get_current_user
+from .models import User, UserRole, Group, Attendance, group_students
+from .dependencies import get_db, get_current_user, replica_reads
 from .schemas import AttendanceResponse, AttendanceCreate
+from .spreadsheets import export_response
+from .events import broker
 
 attend_router = APIRouter(
     prefix="/attendance",
@@ -35,44 +39,62 @@ def create_attendance(
 
     attendance_date = date_ or datetime.utcnow().date()
 
-    # Shu kunga oldin yozilgan attendance mavjudligini tekshirish
-    existing = db.query(Attendance).filter(
-        Attendance.group_id == group_id,
-        Attendance.date == attendance_date
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail=f"Attendance for {attendance_date} already exists")
+    # Bir student ikki marta yuborilsa oxirgisi olinadi
+    statuses = {r.student_id: "present" if r.is_present else "absent" for r in records}
+    if not statuses:
+        return []
 
-    attendance_list = []
-    for record in records:
-        student = db.query(User).filter(User.id == record.student_id).first()
-        if not student:
-            continue
-
-        attendance_entry = Attendance(
-            student_id=record.student_id,
-            teacher_id=current_user.id,
-            group_id=group_id,
-            date=attendance_date,
-            status="present" if record.is_present else "absent"
+    # Barcha student_id’lar guruh a’zoligi bo‘yicha bitta so‘rovda tekshiriladi
+    members = {
+        student_id for (student_id,) in db.query(group_students.c.student_id).filter(
+            group_students.c.group_id == group_id,
+            group_students.c.student_id.in_(statuses)
         )
-        db.add(attendance_entry)
-        attendance_list.append(attendance_entry)
+    }
+    unknown = sorted(set(statuses) - members)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Students not in this group: {unknown}")
+
+    # Bitta ko‘p qatorli INSERT ... RETURNING; takroriy kun unique constraint bilan ushlanadi
+    try:
+        attendance_list = db.scalars(
+            insert(Attendance).returning(Attendance, sort_by_parameter_order=True),
+            [
+                {
+                    "student_id": student_id,
+                    "teacher_id": current_user.id,
+                    "group_id": group_id,
+                    "date": attendance_date,
+                    "status": status,
+                }
+                for student_id, status in statuses.items()
+            ],
+        ).all()
+        # Commit’dan keyin obyektlar expire bo‘ladi — javob oldindan tayyorlanadi
+        response = [AttendanceResponse.from_orm(att) for att in attendance_list]
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Attendance for {attendance_date} already exists")
 
-    db.commit()
-    for att in attendance_list:
-        db.refresh(att)
+    present = sum(1 for status in statuses.values() if status == "present")
+    broker.publish(
+        "attendance", group_id=group_id, date=attendance_date.isoformat(),
+        present=present, absent=len(statuses) - present,
+    )
 
-    return attendance_list
+    return response
 
 
 # ------------------------------
 # GET: Oy bo‘yicha hisobot (faqat saqlangan kunlar)
 # ------------------------------
 @attend_router.get("/report/{group_id}")
+@replica_reads
 def get_group_report(
     group_id: int,
-    month: Optional[int] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    year: Optional[int] = Query(None, ge=2000, le=2100),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -85,37 +107,91 @@ def get_group_report(
 
     today = datetime.utcnow()
     month = month or today.month
-    year = today.year
+    year = year or today.year
 
-    # Oy boshidan hozirgi kungacha yoki tanlangan oy oxirigacha
+    # Oyning birinchi kunidan keyingi oyning birinchi kunigacha (oxirgi kunlar tushib qolmaydi)
     first_day = date(year, month, 1)
-    last_day = today if month == today.month else date(year, month, 28)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
 
     # O‘quvchilar
     students = group.students
 
-    # Ushbu oy uchun attendance
-    attendances = db.query(Attendance).filter(
+    # Ushbu oy uchun attendance — faqat kerakli ustunlar
+    attendances = db.query(Attendance.student_id, Attendance.date, Attendance.status).filter(
         Attendance.group_id == group_id,
         Attendance.date >= first_day,
-        Attendance.date <= last_day
-    ).order_by(Attendance.date.asc()).all()
+        Attendance.date < next_month
+    ).all()
 
     if not attendances:
         return {"day_list": [], "rows": [], "message": "Bu oyda dars mavjud emas"}
 
+    # (student_id, kun) -> status indeksi bitta o‘tishda quriladi
+    grid = {(student_id, day): status for student_id, day, status in attendances}
+
     # Faol attendance saqlangan kunlar ro‘yxati
-    day_list = sorted(list({a.date for a in attendances}))
+    day_list = sorted({day for _, day in grid})
+    day_labels = [d.strftime("%d.%m.%Y") for d in day_list]
 
     rows = []
     for s in students:
         row = {"fullname": s.full_name}
-        for d in day_list:
-            att = next((a for a in attendances if a.student_id == s.id and a.date == d), None)
-            row[d.strftime("%d.%m.%Y")] = "Bor" if att and att.status=="present" else "Yo'q"
+        for d, label in zip(day_list, day_labels):
+            row[label] = "Bor" if grid.get((s.id, d)) == "present" else "Yo'q"
         rows.append(row)
 
     return {
-        "day_list": [d.strftime("%d.%m.%Y") for d in day_list],
+        "day_list": day_labels,
         "rows": rows
     }
+
+
+# ------------------------------
+# EXPORT: Yo‘qlamani CSV / XLSX ko‘rinishida oqim bilan yuklab olish
+# ------------------------------
+ATTENDANCE_EXPORT_HEADER = ["date", "group", "student", "status", "teacher"]
+
+
+@attend_router.get("/export")
+@replica_reads
+def export_attendance(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    group_id: Optional[int] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    year: Optional[int] = Query(None, ge=2000, le=2100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in [UserRole.teacher, UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed to view attendance")
+
+    student = aliased(User)
+    teacher = aliased(User)
+    query = (
+        db.query(Attendance)
+        .join(Group, Attendance.group_id == Group.id)
+        .join(student, Attendance.student_id == student.id)
+        .outerjoin(teacher, Attendance.teacher_id == teacher.id)
+    )
+
+    if current_user.role == UserRole.teacher:
+        query = query.filter(Attendance.group_id.in_([g.id for g in current_user.groups_as_teacher]))
+    if group_id:
+        query = query.filter(Attendance.group_id == group_id)
+
+    # Hisobot bilan bir xil: oy berilsa yil joriy yil bo‘yicha olinadi
+    if month or year:
+        year = year or datetime.utcnow().year
+        first_day = date(year, month or 1, 1)
+        if month:
+            next_day = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        else:
+            next_day = date(year + 1, 1, 1)
+        query = query.filter(Attendance.date >= first_day, Attendance.date < next_day)
+
+    stmt = (
+        query.with_entities(Attendance.date, Group.name, student.full_name, Attendance.status, teacher.full_name)
+        .order_by(Attendance.group_id, Attendance.date, Attendance.id)
+        .statement
+    )
+    return export_response(stmt, ATTENDANCE_EXPORT_HEADER, "attendance", format)
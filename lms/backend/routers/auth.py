@@ -1,36 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.security import OAuth2PasswordBearer
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import jwt
 from .schemas import UserCreate, UserResponse
-from .database import SessionLocal
-from .models import User
+from .dependencies import get_db, get_current_user, SECRET_KEY, ALGORITHM
+from .models import User, StudentStatus
+from .rollups import bump, student_deltas
+from .utils import hash_password, verify_and_update
 
 auth_router = APIRouter(prefix="/auth", tags=["Auth"])
 
 # ------------------------------
 # Sozlamalar
 # ------------------------------
-SECRET_KEY = "2001"  # ⚠️ Buni .env faylga o‘tkazish kerak
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
-# ------------------------------
-# DB sessiya
-# ------------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ------------------------------
 # Token yaratish
 # ------------------------------
@@ -43,13 +29,15 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 # ------------------------------
 # Register
 # ------------------------------
+# Parol bilan ishlaydigan endpointlar async: bcrypt process pool’da await qilinadi,
+# sync Session bilan ishlash esa threadpool’da (to_thread) — event loop bloklanmaydi
 @auth_router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await to_thread.run_sync(db.query(User).filter(User.username == user.username).first)
     if db_user:
         raise HTTPException(status_code=400, detail="❌ Username already exists")
 
-    hashed_pw = pwd_context.hash(user.password)
+    hashed_pw = await hash_password(user.password)
     new_user = User(
         username=user.username,
         password=hashed_pw,
@@ -59,11 +47,17 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         address=user.address,
         subject=user.subject,
         fee=user.fee,
+        status=StudentStatus.interested,
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+
+    def save():
+        db.add(new_user)
+        bump(db, student_deltas(after=(new_user.role, new_user.status)))
+        db.commit()
+        db.refresh(new_user)
+        return new_user
+
+    return await to_thread.run_sync(save)
 
 
 # ------------------------------
@@ -74,44 +68,29 @@ class LoginRequest(BaseModel):
     password: str
 
 @auth_router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == request.username).first()
-    if not user or not pwd_context.verify(request.password, user.password):
+async def login(request: LoginRequest, db: Session = Depends(get_db)):
+    user = await to_thread.run_sync(db.query(User).filter(User.username == request.username).first)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await verify_and_update(request.password, user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = create_access_token({"sub": str(user.id)})
+    access_token = create_access_token({"sub": str(user.id), "ver": user.token_version})
+    role = user.role.value  # commit’dan keyin atributlar expire bo‘ladi
+
+    # BCRYPT_ROUNDS o‘zgargan bo‘lsa parol yangi cost bilan qayta saqlanadi
+    if new_hash:
+        user.password = new_hash
+        await to_thread.run_sync(db.commit)
+
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "role": user.role.value
+        "role": role
     }
 
-# ------------------------------
-# Get Current User
-# ------------------------------
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
 # ------------------------------
 # Current user endpoint (test)
 # ------------------------------
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Mapping, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+
+# ==============================
+# In-process TTL kesh
+# ==============================
+class TTLCache:
+    """
+    Oddiy thread-safe kesh: har bir yozuv `ttl` soniyadan keyin eskiradi.
+    Faqat shu process ichida ishlaydi — ko‘p workerli deployda har bir
+    worker o‘z nusxasini saqlaydi, shuning uchun TTL qisqa bo‘lishi kerak.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._evict_expired()
+                if len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[key]
+
+
+# ==============================
+# LRU kesh (o‘zgarmas, versiyalangan obyektlar uchun)
+# ==============================
+class LRUCache:
+    """Eng uzoq ishlatilmagan yozuv `maxsize`dan oshganda chiqariladi; TTL yo‘q."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ==============================
+# ETag’li javob keshi (katalog tipidagi GET’lar uchun)
+# ==============================
+# Teg versiyalari ham, javoblar ham process ichida. Bir nechta worker bo‘lsa,
+# `invalidate` faqat yozish kelgan workerdagi keshni bekor qiladi — qolganlari
+# eski tana va ETag’ni CATALOG_CACHE_TTL soniyagacha berishi mumkin. Shuning
+# uchun TTL qisqa; ko‘p workerli deployda katalog shu kechikish bilan yangilanadi.
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+
+# Teglar: qaysi yozish endpointi qaysi keshlangan o‘qishlarni bekor qiladi
+COURSES_TAG = "courses"
+GROUPS_TAG = "groups"
+PUBLIC = "public"  # autentifikatsiyasiz endpointlar uchun principal
+
+
+class ResponseCache:
+    """
+    Tayyor JSON javoblarni (route + query + rol) kaliti bo‘yicha saqlaydi.
+    Yozish endpointlari `invalidate(tag)` chaqiradi — teg versiyasi oshadi va
+    eski yozuvlar kalitdan chiqib qoladi (TTL bilan o‘zi tozalanadi).
+    ETag tana bo‘yicha sha256, shuning uchun kesh eskirgan/boshqa workerda
+    qayta qurilgan javob ham o‘zgarmagan bo‘lsa 304 beradi.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, maxsize: int = 1_000):
+        self._entries = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, *tags: str):
+        """Faqat shu process keshini bekor qiladi (CATALOG_CACHE_TTL izohiga qarang)."""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def lookup(self, request: Request, tag: str, principal: str):
+        """(kalit, javob) — keshda bo‘lmasa javob None, endpoint `store` chaqiradi."""
+        with self._lock:
+            version = self._versions.get(tag, 0)
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        key = (tag, version, request.url.path, query, principal)
+        entry = self._entries.get(key)
+        return key, (self._respond(request, *entry) if entry is not None else None)
+
+    def store(self, request: Request, key, content, adapter: Optional[TypeAdapter] = None,
+              headers: Optional[Mapping[str, str]] = None) -> Response:
+        if adapter is not None:
+            body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+        else:
+            body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        extra = {k: v for k, v in (headers or {}).items() if k.lower() != "content-length"}
+        self._entries.set(key, (etag, body, extra))
+        return self._respond(request, etag, body, extra)
+
+    @staticmethod
+    def _respond(request: Request, etag: str, body: bytes, extra: dict) -> Response:
+        headers = {
+            **extra,
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",  # brauzer har safar If-None-Match bilan tekshiradi
+            "Vary": "Authorization",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+catalog_cache = ResponseCache()
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .dependencies import get_db, get_current_user
 from .schemas import CourseCreate, CourseOut
 from .models import User, Course, UserRole
+from .pagination import PageParams, paginate
+from .query_budget import sql_budget
+from .cache import catalog_cache, COURSES_TAG, PUBLIC
 
 courses_router = APIRouter(prefix="/courses", tags=["Courses"])
 
@@ -35,14 +39,34 @@ def create_course(
 
     db.add(new_course)
     db.commit()
+    # Boshqa workerlar ro‘yxatni CATALOG_CACHE_TTL gacha eski holida berishi mumkin
+    catalog_cache.invalidate(COURSES_TAG)
     db.refresh(new_course)
 
     return CourseOut.from_orm(new_course)
 
 
 # ------------------------------
-# GET All Courses
+# GET All Courses (ETag bilan keshlanadi)
 # ------------------------------
+COURSE_LIST = TypeAdapter(List[CourseOut])
+
+
 @courses_router.get("/", response_model=List[CourseOut])
-def get_courses(db: Session = Depends(get_db)):
-    return db.query(Course).all()
+@sql_budget(2)
+def get_courses(
+    request: Request,
+    response: Response,
+    subject: Optional[str] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    key, cached = catalog_cache.lookup(request, COURSES_TAG, PUBLIC)
+    if cached is not None:
+        return cached
+
+    query = db.query(Course)
+    if subject:
+        query = query.filter(Course.subject == subject)
+    items = paginate(query, Course, page, response)
+    return catalog_cache.store(request, key, items, COURSE_LIST, response.headers)
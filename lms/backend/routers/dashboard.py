@@ -1,14 +1,150 @@
+from datetime import timedelta
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import distinct, func, select, case
 
-from .models import User, StudentStatus, Group, Payment, Attendance, UserRole, StudentAnswer, group_students, \
-    group_teachers, Question, Option, Test
-from .dependencies import get_db, get_current_user
+from .models import User, StudentStatus, Group, Payment, Attendance, UserRole, group_students, \
+    group_teachers, Test, TestAttempt
+from .database import SessionLocal
+from .dependencies import get_db, get_current_user, get_stream_user, replica_reads
+from .events import broker, event_stream
+from .exams import SUBMITTED, local_time, utcnow
+from .rollups import (
+    read_dashboard, today_payments, STUDENT_TOTAL, STUDENT_STATUS_KEYS, GROUPS_COUNT, PAYMENTS_TOTAL
+)
+from .query_budget import sql_budget
 
 dashboard_router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+ATTENDANCE_WINDOW_DAYS = 30
+
+
+def _teacher_stats(db: Session, teacher_id: int) -> dict:
+    """
+    Teacher guruhlari bo‘yicha barcha ko‘rsatkichlar bitta so‘rovda:
+    studentlar (distinct), bitiruvchilar, oxirgi 30 kunlik davomat va
+    har bir (student, test) juftligining so‘nggi urinishi bo‘yicha o‘rtacha ball.
+    """
+    my_groups = select(group_teachers.c.group_id).where(group_teachers.c.teacher_id == teacher_id)
+    graduated = case((User.status == StudentStatus.graduated, group_students.c.student_id))
+
+    members = (
+        select(
+            group_students.c.group_id,
+            func.count(distinct(group_students.c.student_id)).label("students"),
+            func.count(distinct(graduated)).label("graduated"),
+        )
+        .select_from(group_students)
+        .join(User, User.id == group_students.c.student_id)
+        .where(group_students.c.group_id.in_(my_groups))
+        .group_by(group_students.c.group_id)
+        .subquery()
+    )
+
+    # Attendance.date naive UTC ustun — aware qiymat shu ko‘rinishga keltiriladi
+    since = utcnow().replace(tzinfo=None) - timedelta(days=ATTENDANCE_WINDOW_DAYS)
+    attendance = (
+        select(
+            Attendance.group_id,
+            func.sum(case((Attendance.status == "present", 1), else_=0)).label("present"),
+            func.count(Attendance.id).label("lessons"),
+        )
+        .where(
+            Attendance.group_id.in_(my_groups),
+            Attendance.date >= since,
+        )
+        .group_by(Attendance.group_id)
+        .subquery()
+    )
+
+    ranked = (
+        select(
+            Test.group_id,
+            TestAttempt.score,
+            TestAttempt.total,
+            func.rank().over(
+                partition_by=(TestAttempt.student_id, TestAttempt.test_id),
+                order_by=(TestAttempt.submitted_at.desc(), TestAttempt.id.desc()),
+            ).label("rn"),
+        )
+        .join(Test, Test.id == TestAttempt.test_id)
+        .where(Test.group_id.in_(my_groups), TestAttempt.total > 0)
+        .subquery()
+    )
+    scores = (
+        select(
+            ranked.c.group_id,
+            func.avg(100.0 * ranked.c.score / ranked.c.total).label("average"),
+            func.count().label("attempts"),
+        )
+        .where(ranked.c.rn == 1)
+        .group_by(ranked.c.group_id)
+        .subquery()
+    )
+
+    # Bir student bir nechta guruhda bo‘lishi mumkin — umumiy son alohida distinct
+    def distinct_total(column):
+        return (
+            select(func.count(distinct(column)))
+            .select_from(group_students)
+            .join(User, User.id == group_students.c.student_id)
+            .where(group_students.c.group_id.in_(my_groups))
+            .scalar_subquery()
+        )
+
+    rows = db.execute(
+        select(
+            Group.id,
+            Group.name,
+            func.coalesce(members.c.students, 0),
+            func.coalesce(members.c.graduated, 0),
+            func.coalesce(attendance.c.present, 0),
+            func.coalesce(attendance.c.lessons, 0),
+            scores.c.average,
+            func.coalesce(scores.c.attempts, 0),
+            distinct_total(group_students.c.student_id).label("total_students"),
+            distinct_total(graduated).label("total_graduated"),
+        )
+        .where(Group.id.in_(my_groups))
+        .outerjoin(members, members.c.group_id == Group.id)
+        .outerjoin(attendance, attendance.c.group_id == Group.id)
+        .outerjoin(scores, scores.c.group_id == Group.id)
+        .order_by(Group.name)
+    ).all()
+
+    groups = []
+    present_sum = lessons_sum = attempts_sum = 0
+    score_sum = 0.0
+    for group_id, name, students, grads, present, lessons, average, attempts, _, _ in rows:
+        average = float(average) if average is not None else None  # Postgres avg() -> Decimal
+        present_sum += present
+        lessons_sum += lessons
+        attempts_sum += attempts
+        score_sum += (average or 0) * attempts
+        groups.append({
+            "id": group_id,
+            "name": name,
+            "students": students,
+            "graduated": grads,
+            "attendance_rate": round(100 * present / lessons, 2) if lessons else None,
+            "average_score": round(average, 2) if average is not None else None,
+        })
+
+    return {
+        "groups": len(groups),
+        "students_count": rows[0].total_students if rows else 0,
+        "graduated": rows[0].total_graduated if rows else 0,
+        "attendance_rate": round(100 * present_sum / lessons_sum, 2) if lessons_sum else None,
+        "average_score": round(score_sum / attempts_sum, 2) if attempts_sum else None,
+        "groups_detail": groups,
+    }
+
+
 @dashboard_router.get("/stats")
+@sql_budget(6)
+@replica_reads
 def get_dashboard_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -20,53 +156,27 @@ def get_dashboard_stats(
     # ADMIN & MANAGER statistikasi
     # -------------------------
     if role in [UserRole.admin, UserRole.manager]:
-        total_students = db.query(User).filter(User.role == "student").count()
-        interested = db.query(User).filter(User.role == "student").filter(User.status == "interested").count()
-        studying = db.query(User).filter(User.role == "student").filter(User.status == "studying").count()
-        left = db.query(User).filter(User.role == "student").filter(User.status == "left").count()
-        graduated = db.query(User).filter(User.role == "student").filter(User.status == "graduated").count()
-
-        groups_count = db.query(Group).count()
-
-        total_payments = db.query(Payment).with_entities(
-            func.sum(Payment.amount)
-        ).scalar() or 0
-        today_payments = db.query(Payment).filter(
-            func.date(Payment.created_at) == func.current_date()
-        ).with_entities(func.sum(Payment.amount)).scalar() or 0
+        # Rollup jadvalidan bitta PK o‘qish + bugungi to‘lovlar uchun indeks oralig‘i
+        counters = read_dashboard(db)
 
         stats = {
             "students": {
-                "total": total_students,
-                "interested": interested,
-                "studying": studying,
-                "left": left,
-                "graduated": graduated,
+                "total": int(counters[STUDENT_TOTAL]),
+                **{
+                    status.value: int(counters[key])
+                    for status, key in STUDENT_STATUS_KEYS.items()
+                },
             },
-            "groups": {"count": groups_count},
-            "payments": {"total": total_payments, "today": today_payments},
+            "groups": {"count": int(counters[GROUPS_COUNT])},
+            "payments": {"total": counters[PAYMENTS_TOTAL], "today": today_payments(db)},
         }
 
     # -------------------------
     # TEACHER statistikasi
     # -------------------------
     elif role == UserRole.teacher:
-        teacher_groups = (
-            db.query(Group)
-            .join(group_teachers, group_teachers.c.group_id == Group.id)
-            .filter(group_teachers.c.teacher_id == current_user.id)
-            .all()
-        )
-        student_ids = [s.id for g in teacher_groups for s in g.students]
-        total_students = len(student_ids)
-
-        graduated = db.query(User).filter(User.role == "student").filter(User.status == "graduated").count()
-
-        stats = {
-            "groups": len(teacher_groups),
-            "students_count": total_students,
-            "graduated": graduated,
-        }
+        # Faqat o‘z guruhlari; studentlar obyekt sifatida yuklanmaydi
+        stats = _teacher_stats(db, current_user.id)
 
     # -------------------------
     # STUDENT statistikasi
@@ -81,62 +191,43 @@ def get_dashboard_stats(
         if not student:
             raise HTTPException(status_code=404, detail="Student topilmadi")
 
-        # 2️⃣ Student qatnashgan testlar ID’lari
-        test_ids = (
-            db.query(Question.test_id)
-            .join(StudentAnswer, StudentAnswer.question_id == Question.id)
-            .filter(StudentAnswer.student_id == student.id)
-            .distinct()
-            .all()
+        # 2️⃣ Saqlangan urinishlardan har bir testning eng so‘nggisi (rank() = 1)
+        attempts = (
+            select(
+                TestAttempt.test_id,
+                TestAttempt.submitted_at,
+                TestAttempt.score,
+                TestAttempt.total,
+                func.rank().over(
+                    partition_by=TestAttempt.test_id,
+                    order_by=(TestAttempt.submitted_at.desc(), TestAttempt.id.desc()),
+                ).label("rn"),
+            )
+            .where(TestAttempt.student_id == student.id, TestAttempt.status == SUBMITTED)  # ochiq imtihonlarsiz
+            .subquery()
         )
-        test_ids = [tid[0] for tid in test_ids]
-
-        results = []
 
-        for test_id in test_ids:
-            # 3️⃣ Testdagi savollar soni
-            total_q = db.query(Question).filter(Question.test_id == test_id).count()
-            if total_q == 0:
-                continue
-
-            # 4️⃣ Studentning eng so‘nggi topshirgan vaqti
-            last_attempt = (
-                db.query(func.max(StudentAnswer.submitted_at))
-                .join(Question, StudentAnswer.question_id == Question.id)
-                .filter(
-                    StudentAnswer.student_id == student.id,
-                    Question.test_id == test_id
-                )
-                .scalar()
+        # 3️⃣ Test nomi bilan bitta so‘rovda
+        latest = db.execute(
+            select(
+                attempts.c.test_id,
+                Test.title,
+                attempts.c.submitted_at,
+                attempts.c.score,
+                attempts.c.total,
             )
-            if not last_attempt:
-                continue
-
-            # 5️⃣ Faqat eng so‘nggi urinishdagi javoblarni olish
-            correct = (
-                db.query(func.count(StudentAnswer.id))
-                .join(Option, StudentAnswer.selected_option_id == Option.id)
-                .join(Question, StudentAnswer.question_id == Question.id)
-                .filter(
-                    StudentAnswer.student_id == student.id,
-                    Question.test_id == test_id,
-                    Option.is_correct == 1,
-                    func.date_trunc('second', StudentAnswer.submitted_at)
-                    == func.date_trunc('second', last_attempt)
-                )
-                .scalar()
-            )
-
-            # 6️⃣ Test nomini olish
-            test = db.query(Test).filter(Test.id == test_id).first()
-            test_name = test.title if test else f"Test #{test_id}"
+            .outerjoin(Test, Test.id == attempts.c.test_id)
+            .where(attempts.c.rn == 1, attempts.c.total > 0)
+            .order_by(attempts.c.submitted_at.asc())
+        ).all()
 
-            # 7️⃣ Test natijasini hisoblash
+        results = []
+        for test_id, title, submitted_at, correct, total_q in latest:
             score = round((correct / total_q) * 100, 2) if total_q else 0
             results.append({
                 "test_id": test_id,
-                "test_name": test_name,
-                "submitted_at": last_attempt.strftime("%Y-%m-%d %H:%M:%S"),
+                "test_name": title or f"Test #{test_id}",
+                "submitted_at": local_time(submitted_at),
                 "correct": correct,
                 "total_questions": total_q,
                 "score": score
@@ -146,20 +237,18 @@ def get_dashboard_stats(
         avg_score = round(sum(r["score"] for r in results) / len(results), 2) if results else 0
         last_score = results[-1]["score"] if results else 0
 
+        attended, missed = db.query(
+            func.sum(case((Attendance.status == "present", 1), else_=0)),
+            func.sum(case((Attendance.status == "absent", 1), else_=0)),
+        ).filter(Attendance.student_id == student.id).one()
+
         # 9️⃣ Yakuniy statistika
         stats = {
             "profile": {
                 "full_name": student.full_name,
                 "phone": student.phone,
             },
-            "attendance": {
-                "attended": db.query(Attendance)
-                .filter(Attendance.student_id == student.id, Attendance.status == "present")
-                .count(),
-                "missed": db.query(Attendance)
-                .filter(Attendance.student_id == student.id, Attendance.status == "absent")
-                .count(),
-            },
+            "attendance": {"attended": attended or 0, "missed": missed or 0},
             "tests": {
                 "average": avg_score,
                 "last": last_score,
@@ -174,3 +263,61 @@ def get_dashboard_stats(
         raise HTTPException(status_code=403, detail="Role not supported")
 
     return stats
+
+
+# -------------------------
+# Jonli yangilanishlar (SSE)
+# -------------------------
+class _TeacherGroups:
+    """Teacher filtri: faqat o‘z guruhlari eventlari; guruhlar ro‘yxati `refresh()` bilan yangilanadi."""
+
+    def __init__(self, teacher_id: int, group_ids: set):
+        self.teacher_id = teacher_id
+        self.group_ids = group_ids
+
+    def __call__(self, event: dict) -> bool:
+        group_ids = self.group_ids
+        return event.get("group_id") in group_ids or not group_ids.isdisjoint(event.get("group_ids", ()))
+
+    def refresh(self):
+        with SessionLocal() as db:
+            self.group_ids = set(db.scalars(
+                select(group_teachers.c.group_id).where(group_teachers.c.teacher_id == self.teacher_id)
+            ))
+
+
+@dashboard_router.get("/stream")
+def dashboard_stream(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    `text/event-stream`: client avval /dashboard/stats’ni o‘qiydi, so‘ng shu yerdan
+    kelgan deltalarni qo‘shib boradi. Eventlar:
+      payment    — amount, student_id, group_id, month, counters
+      attendance — group_id, date, present, absent
+      student    — student_id, before, after (status), group_ids, counters
+      students   — created (import), group_ids, counters
+      resync     — eventlar tashlab yuborildi, statistikani qayta o‘qish kerak
+    `counters` kalitlari dashboard rollup kalitlari bilan bir xil (students.total, payments.total ...).
+    """
+    role = current_user.role
+    refresh = None
+    if role in [UserRole.admin, UserRole.manager]:
+        accepts = lambda event: True  # noqa: E731
+    elif role == UserRole.teacher:
+        accepts = _TeacherGroups(current_user.id, {g.id for g in current_user.groups_as_teacher})
+        refresh = accepts.refresh
+    else:
+        raise HTTPException(status_code=403, detail="Role not supported")
+
+    if broker.subscribers >= broker.max_subscribers:
+        raise HTTPException(status_code=503, detail="Too many live dashboards, try again later")
+
+    # Ulanish soatlab ochiq turadi — pool’dagi DB connection band qilinmasin
+    db.close()
+    return StreamingResponse(
+        event_stream(accepts, refresh),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,18 @@
+import itertools
+import logging
 import os
+import threading
+import time
+from typing import Optional
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.selectable import Select
+
+logger = logging.getLogger(__name__)
 
 # 🔹 backend/.env faylini yuklash
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # backend papka
@@ -15,6 +25,168 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL is not set in .env file!")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 🔹 Connection pool sozlamalari (.env orqali)
+def pool_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}  # SQLite uchun pool hajmi ahamiyatsiz
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+
+
+def async_url(url: str) -> str:
+    """postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://"""
+    parsed = make_url(url)
+    driver = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"❌ No async driver configured for {parsed.drivername}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+
+
+# ==============================
+# O‘qish replikalari (ixtiyoriy)
+# ==============================
+# DATABASE_REPLICA_URLS — vergul bilan ajratilgan URL’lar. `@replica_reads` bilan
+# belgilangan GET endpointlarning sessiyasi o‘qishlarni navbatma-navbat (round-robin)
+# sog‘lom replikaga yuboradi; yozuvlar va shu sessiyadagi yozuvdan keyingi barcha
+# so‘rovlar primary’da qoladi.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "10"))  # soniya
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+PRIMARY = "primary"
+
+# Postgres standby: WAL to‘liq qo‘llangan bo‘lsa 0, aks holda oxirgi replay’dan beri o‘tgan vaqt
+_PG_LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(url, **pool_options(url))
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0  # birinchi tanlashda tekshiriladi
+        self.checking = False
+
+
+class ReplicaPool:
+    """Round-robin tanlash; har bir replika REPLICA_HEALTH_INTERVAL’da bir marta tekshiriladi."""
+
+    def __init__(self, urls, interval: float = REPLICA_HEALTH_INTERVAL, max_lag: float = REPLICA_MAX_LAG_SECONDS):
+        self.replicas = [Replica(f"replica-{i}", url) for i, url in enumerate(urls)]
+        self.interval = interval
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._routes = {engine: PRIMARY}
+        for replica in self.replicas:
+            self._routes[replica.engine] = replica.name
+            event.listen(replica.engine, "handle_error", self._on_error(replica))
+
+    def route_name(self, bind) -> str:
+        return self._routes.get(bind, PRIMARY)
+
+    def _on_error(self, replica: Replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_down(replica, "disconnect")
+        return handle_error
+
+    def mark_down(self, replica: Replica, reason: str):
+        if replica.healthy:
+            logger.warning("%s is unhealthy (%s), reads go to other replicas/primary", replica.name, reason)
+        replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    def check(self, replica: Replica):
+        with self._lock:
+            if replica.checking:
+                return  # boshqa thread tekshiryapti — oxirgi holat ishlatiladi
+            replica.checking = True
+        try:
+            # Xom DBAPI ulanish: tekshiruv so‘rovning SQL budjeti/metrikalariga qo‘shilmasin
+            conn = replica.engine.raw_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(_PG_LAG_SQL if replica.engine.dialect.name == "postgresql" else "SELECT 0")
+                replica.lag = float(cursor.fetchone()[0] or 0)
+                cursor.close()
+            finally:
+                conn.close()
+            if replica.lag > self.max_lag:
+                self.mark_down(replica, f"lag {replica.lag:.1f}s")
+            else:
+                if not replica.healthy:
+                    logger.info("%s is healthy again", replica.name)
+                replica.healthy = True
+                replica.checked_at = time.monotonic()
+        except Exception as e:
+            self.mark_down(replica, type(e).__name__)
+        finally:
+            replica.checking = False
+
+    def pick(self) -> Optional[Replica]:
+        """Navbatdagi sog‘lom replika; hammasi ishlamasa None (primary ishlatiladi)."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next) % len(self.replicas)]
+            if time.monotonic() - replica.checked_at >= self.interval:
+                self.check(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+
+replicas = ReplicaPool(DATABASE_REPLICA_URLS)
+
+
+def _is_write(clause) -> bool:
+    if clause is None:
+        return False  # db.get_bind() — dialektni aniqlash uchun; replika ham shu dialektda
+    if isinstance(clause, Select):
+        return clause._for_update_arg is not None  # SELECT ... FOR UPDATE — primary’da qulflanadi
+    return True  # INSERT/UPDATE/DELETE, text() va noma’lum statementlar — ehtiyot uchun primary
+
+
+class RoutingSession(Session):
+    """
+    `info["replica"]` o‘rnatilgan bo‘lsa o‘qishlar o‘sha replikaga boradi. Birinchi
+    yozuv (flush, DML, FOR UPDATE) sessiyani primary’ga "yopishtiradi": keyingi
+    o‘qishlar o‘z yozuvini ko‘rishi uchun replikaga qaytmaydi.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self.info.get("wrote"):
+            if not self._flushing and not _is_write(clause):
+                return replica.engine
+            self.info["wrote"] = True
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def use_replica(session: Session) -> bool:
+    """Sessiya o‘qishlarini replikaga yo‘naltiradi; sog‘lom replika bo‘lmasa False."""
+    replica = replicas.pick()
+    if replica is None:
+        return False
+    session.info["replica"] = replica
+    return True
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+# 🔹 Async engine — routerlar birma-bir `async def`ga o‘tkaziladi
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
@@ -1,26 +1,68 @@
-from fastapi import Depends, HTTPException
+import os
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from jose import JWTError, jwt
-from .database import SessionLocal
+from .cache import TTLCache
+from .database import SessionLocal, AsyncSessionLocal, use_replica
 from .models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
-SECRET_KEY = "2001"
-ALGORITHM = "HS256"
+SECRET_KEY = os.getenv("SECRET_KEY", "2001")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
-def get_db():
+# Token `sub` -> User ustunlari. Har bir so‘rovda users jadvaliga murojaat qilmaslik uchun.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+_user_cache = TTLCache(ttl=USER_CACHE_TTL)
+
+def replica_reads(func):
+    """
+    GET endpoint o‘qishlarini replikaga yo‘naltirish (DATABASE_REPLICA_URLS bo‘lsa).
+    Faqat bir necha soniyalik eskirgan ma’lumot ko‘rsatsa bo‘ladigan ro‘yxat/hisobotlar
+    uchun; router dekoratoridan keyin qo‘yiladi.
+    """
+    func.replica_reads = True
+    return func
+
+
+def get_db(request: Request):
     db = SessionLocal()
+    endpoint = request.scope.get("endpoint")
+    if request.method == "GET" and getattr(endpoint, "replica_reads", False):
+        use_replica(db)
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """`async def` endpointlar uchun; qolgan routerlar `get_db` bilan ishlashda davom etadi."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _snapshot(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+def _attach(db: Session, snapshot: dict) -> User:
+    # Keshdagi ustunlardan SELECT’siz persistent obyekt yasaymiz — lazy relationship’lar
+    # va `current_user in group.teachers` kabi tekshiruvlar odatdagidek ishlaydi
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def invalidate_user(user_id: int):
+    """User o‘zgarganda (update/delete) chaqiriladi."""
+    _user_cache.delete(str(user_id))
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
-        status_code=401,
+        status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -30,7 +72,38 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        user = db.query(User).filter(User.id == int(user_id)).first()
+        if user is None:
+            raise credentials_exception
+        snapshot = _snapshot(user)
+        _user_cache.set(user_id, snapshot)
+    else:
+        user = _attach(db, snapshot)
+
+    # Parol o‘zgarganda token_version oshiriladi — eski tokenlar bekor bo‘ladi.
+    # `ver`siz (eski) token 0-versiya hisoblanadi.
+    if payload.get("ver", 0) != (snapshot["token_version"] or 0):
         raise credentials_exception
     return user
+
+
+def get_stream_user(
+    header_token: Optional[str] = Depends(oauth2_optional),
+    query_token: Optional[str] = Query(None, alias="token"),
+    db: Session = Depends(get_db),
+):
+    """
+    SSE uchun: brauzer EventSource’i Authorization header yubora olmaydi, shuning
+    uchun token `?token=` orqali ham qabul qilinadi (header ustun turadi).
+    URL’dagi token access log’larga tushishi mumkin — tokenlar qisqa muddatli.
+    """
+    token = header_token or query_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return get_current_user(token, db)
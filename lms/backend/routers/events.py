@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from anyio import to_thread
+
+# ==============================
+# Jarayon ichidagi pub/sub (dashboard SSE uchun)
+# ==============================
+# Yozish endpointlari (sync, threadpool’da) commit’dan keyin `broker.publish()`
+# chaqiradi. Har bir event loop’ga bitta `call_soon_threadsafe` yuboriladi va
+# loop ichida hamma obunachilarning navbatiga tarqatiladi — N ta ochiq
+# dashboard N ta so‘rov emas, bitta fan-out.
+#
+# Cheklov: obunachilar faqat shu processdagi yozuvlarni ko‘radi. Bir nechta
+# uvicorn worker bo‘lsa, har bir SSE ulanish o‘z workeridagi o‘zgarishlarni
+# oladi — bunday holda Postgres LISTEN/NOTIFY yoki Redis kabi tashqi broker kerak.
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_MAX_SUBSCRIBERS = int(os.getenv("EVENT_MAX_SUBSCRIBERS", "1000"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_REFRESH_SECONDS = float(os.getenv("EVENT_REFRESH_SECONDS", "60"))  # filtr ma'lumotlari (teacher guruhlari)
+EVENT_RETRY_MS = 5000  # uzilganda brauzer shuncha kutib qayta ulanadi
+
+RESYNC = "resync"  # navbat to‘lib eventlar tashlab yuborildi — client /dashboard/stats’ni qayta o‘qiydi
+
+
+class Subscription:
+    __slots__ = ("queue", "accepts", "loop")
+
+    def __init__(self, loop, accepts, queue_size: int):
+        self.loop = loop
+        self.accepts = accepts  # event -> bool (rol bo‘yicha filtr)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, event: dict):
+        if not self.accepts(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Sekin client: eskilarini tashlab, bitta resync qoldiramiz
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": RESYNC})
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, max_subscribers: int = EVENT_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._by_loop = {}  # loop -> set(Subscription)
+        self._ids = itertools.count(1)
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._by_loop.values())
+
+    def subscribe(self, accepts) -> Optional[Subscription]:
+        """Event loop ichida chaqiriladi; limitga yetgan bo‘lsa None."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if sum(len(subs) for subs in self._by_loop.values()) >= self.max_subscribers:
+                return None
+            subscription = Subscription(loop, accepts, self.queue_size)
+            self._by_loop.setdefault(loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subs = self._by_loop.get(subscription.loop)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._by_loop[subscription.loop]
+
+    def publish(self, type_: str, **data):
+        """Istalgan threaddan (sync endpointlar) chaqirsa bo‘ladi; obunachi yo‘q bo‘lsa hech narsa qilmaydi."""
+        with self._lock:
+            if not self._by_loop:
+                return
+            loops = list(self._by_loop)
+        event = {"id": next(self._ids), "type": type_, **data}
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._dispatch, loop, event)
+            except RuntimeError:  # loop yopilgan
+                pass
+
+    def _dispatch(self, loop, event: dict):
+        with self._lock:
+            subs = list(self._by_loop.get(loop, ()))
+        for subscription in subs:
+            subscription.offer(event)
+
+
+broker = EventBroker()
+
+
+def sse_format(event: dict) -> str:
+    """Server-sent events matni: `id`, `event` va bitta qatorli JSON `data`."""
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append("data: " + json.dumps(event, default=str, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(accepts, refresh: Optional[Callable[[], None]] = None) -> AsyncIterator[str]:
+    """
+    Bitta SSE ulanish: avval `ready`, so‘ng filtrdan o‘tgan eventlar. Jim
+    paytlarda proxy’lar ulanishni uzmasligi uchun `: ping` izohi yuboriladi.
+    Client uzilganda Starlette generatorni bekor qiladi va obuna o‘chadi.
+    `refresh` (sync, DB o‘qiydi) filtr ma'lumotini yangilaydi: har resync’da
+    va EVENT_REFRESH_SECONDS’da bir marta — ulanish soatlab ochiq turadi.
+    """
+    subscription = broker.subscribe(accepts)
+    if subscription is None:  # endpoint tekshiruvidan keyin limit to‘lib qolgan
+        return
+    try:
+        yield f"retry: {EVENT_RETRY_MS}\n\n"
+        yield sse_format({"type": "ready"})
+        refreshed_at = time.monotonic()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = None
+            if refresh is not None and (
+                (event is not None and event["type"] == RESYNC)
+                or time.monotonic() - refreshed_at >= EVENT_REFRESH_SECONDS
+            ):
+                await to_thread.run_sync(refresh)
+                refreshed_at = time.monotonic()
+            yield ": ping\n\n" if event is None else sse_format(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,378 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from anyio import CapacityLimiter, to_thread
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .answer_keys import get_compiled
+from .cache import TTLCache
+from .database import SessionLocal
+from .models import AttemptDraft, StudentAnswer, Test, TestAttempt
+
+logger = logging.getLogger(__name__)
+
+# ==============================
+# Imtihon rejimi: start -> avtosaqlash -> yakunlash
+# ==============================
+# POST /tests/{id}/start ochiq urinish (status=in_progress, deadline_at) yaratadi.
+# PATCH avtosaqlash DB’ga tegmaydi: javoblar shu processdagi bufferga yoziladi va
+# fon task’i ularni har EXAM_FLUSH_SECONDS’da bitta ko‘p qatorli upsert bilan
+# `attempt_drafts` jadvaliga tushiradi. Yakunlash draftlar + buffer’ni kompilyatsiya
+# qilingan kalit bilan baholab, urinishni shartli UPDATE bilan muhrlaydi.
+#
+# Cheklovlar (bitta API node uchun mo‘ljallangan):
+#   - process qulasa oxirgi EXAM_FLUSH_SECONDS ichidagi avtosaqlashlar yo‘qoladi —
+#     client /start’dan qaytgan javoblarni o‘zidagisi bilan solishtirib qayta yuboradi;
+#   - bir nechta worker bo‘lsa, boshqa workerdagi buffer yakunlashda ko‘rinmaydi —
+#     client yakunlashda barcha javoblarini body’da yuborishi kerak (yuboriladi);
+#   - `_open_attempts` ham process ichida: boshqa worker ochgan urinish keshda
+#     bo‘lmasa DB’dan o‘qiladi, lekin boshqa workerda muhrlangan urinish bu yerda
+#     EXAM_ATTEMPT_CACHE_SECONDS gacha ochiq ko‘rinadi. Shu orada kelgan avtosaqlash
+#     draftga tushadi va seal_expired o‘chiradi; ball — faqat shartli UPDATE’dan.
+EXAM_DEFAULT_MINUTES = int(os.getenv("EXAM_DEFAULT_MINUTES", "60"))
+EXAM_GRACE_SECONDS = int(os.getenv("EXAM_GRACE_SECONDS", "30"))  # tarmoq kechikishi uchun
+EXAM_FLUSH_SECONDS = float(os.getenv("EXAM_FLUSH_SECONDS", "2"))
+EXAM_FLUSH_BATCH = int(os.getenv("EXAM_FLUSH_BATCH", "2000"))  # shuncha javob yig‘ilsa darhol yoziladi
+EXAM_SWEEP_SECONDS = float(os.getenv("EXAM_SWEEP_SECONDS", "30"))
+EXAM_SWEEP_LIMIT = 200
+EXAM_ATTEMPT_CACHE_SECONDS = float(os.getenv("EXAM_ATTEMPT_CACHE_SECONDS", "60"))
+
+IN_PROGRESS, SUBMITTED = "in_progress", "submitted"
+TASHKENT = timezone(timedelta(hours=5))
+
+
+def utcnow() -> datetime:
+    """Imtihon vaqtlari (started/deadline/submitted) uchun yagona konvensiya: aware UTC."""
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite DateTime(timezone=True) ustunini ham naive qaytaradi — saqlangani UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def local_time(value: datetime) -> str:
+    """Javoblardagi vaqt avvalgidek Toshkent vaqtida ko‘rsatiladi."""
+    return as_utc(value).astimezone(TASHKENT).strftime("%Y-%m-%d %H:%M:%S")
+
+_UPSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+class OpenAttempt:
+    __slots__ = ("id", "student_id", "test_id", "version", "deadline_at")
+
+    def __init__(self, id: int, student_id: int, test_id: int, version: int, deadline_at: datetime):
+        self.id = id
+        self.student_id = student_id
+        self.test_id = test_id
+        self.version = version
+        self.deadline_at = as_utc(deadline_at)
+
+    def seconds_left(self, now: Optional[datetime] = None) -> int:
+        return max(0, int((self.deadline_at - (now or utcnow())).total_seconds()))
+
+    def expired(self, now: Optional[datetime] = None) -> bool:
+        return (now or utcnow()) > self.deadline_at + timedelta(seconds=EXAM_GRACE_SECONDS)
+
+    def payload(self, answers: Dict[int, List[int]]) -> dict:
+        return {
+            "attempt_id": self.id,
+            "test_id": self.test_id,
+            "status": IN_PROGRESS,
+            "deadline_at": self.deadline_at.isoformat().replace("+00:00", "Z"),
+            "seconds_left": self.seconds_left(),
+            "answers": answers,
+        }
+
+
+# Avtosaqlash har safar urinishni DB’dan o‘qimasligi uchun (yakunlanganda o‘chiriladi).
+# Faqat shu process uchun — yuqoridagi cheklovlarga qarang
+_open_attempts = TTLCache(ttl=EXAM_ATTEMPT_CACHE_SECONDS)
+
+
+# ==============================
+# Write-behind buffer
+# ==============================
+class AnswerBuffer:
+    """
+    attempt_id -> {savol_id: [variant_id...]}. Yozish paytida olingan javoblar
+    `_inflight`’da turadi — shu orada yakunlangan urinish ularni ham ko‘radi.
+    """
+
+    def __init__(self, interval: float = EXAM_FLUSH_SECONDS, batch: int = EXAM_FLUSH_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, Dict[int, List[int]]] = {}
+        self._inflight: Dict[int, Dict[int, List[int]]] = {}
+        self._size = 0
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self._limiter = None
+        self._swept_at = 0.0
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._size
+
+    def put(self, attempt_id: int, answers: Dict[int, List[int]]):
+        with self._lock:
+            slot = self._pending.setdefault(attempt_id, {})
+            before = len(slot)
+            slot.update(answers)
+            self._size += len(slot) - before
+            full = self._size >= self.batch
+        if self._task is None:
+            self.flush()  # fon task’i ishlamayapti (skript, test) — darhol yoziladi
+        elif full:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def peek(self, attempt_id: int) -> Dict[int, List[int]]:
+        with self._lock:
+            return {**self._inflight.get(attempt_id, {}), **self._pending.get(attempt_id, {})}
+
+    def take(self, attempt_id: int) -> Dict[int, List[int]]:
+        """Urinishning yozilmagan javoblarini olib tashlaydi (yakunlashda)."""
+        with self._lock:
+            slot = self._pending.pop(attempt_id, {})
+            self._size -= len(slot)
+            return {**self._inflight.pop(attempt_id, {}), **slot}
+
+    def flush(self) -> int:
+        with self._flush_lock:  # bir vaqtda bitta yozish (_inflight bitta)
+            return self._flush()
+
+    def _flush(self) -> int:
+        now = utcnow()
+        with self._lock:
+            if not self._pending:
+                return 0
+            self._inflight, self._pending, self._size = self._pending, {}, 0
+            rows = [
+                {"attempt_id": attempt_id, "question_id": question_id, "option_ids": option_ids, "updated_at": now}
+                for attempt_id, answers in self._inflight.items()
+                for question_id, option_ids in answers.items()
+            ]
+        try:
+            with SessionLocal() as db:
+                upsert = _UPSERTS[db.get_bind().dialect.name]
+                stmt = upsert(AttemptDraft)
+                db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[AttemptDraft.attempt_id, AttemptDraft.question_id],
+                        set_={"option_ids": stmt.excluded.option_ids, "updated_at": stmt.excluded.updated_at},
+                    ),
+                    rows,
+                )
+                db.commit()
+        except Exception:
+            logger.exception("autosave flush failed, %d answers kept for retry", len(rows))
+            with self._lock:
+                # Shu orada kelgan yangiroq javoblar ustun
+                for attempt_id, answers in self._inflight.items():
+                    slot = self._pending.setdefault(attempt_id, {})
+                    for question_id, option_ids in answers.items():
+                        if question_id not in slot:
+                            slot[question_id] = option_ids
+                            self._size += 1
+                self._inflight = {}
+            return 0
+        with self._lock:
+            self._inflight = {}
+        return len(rows)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._limiter = CapacityLimiter(1)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await to_thread.run_sync(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await to_thread.run_sync(self.flush, limiter=self._limiter)
+            if time.monotonic() - self._swept_at >= EXAM_SWEEP_SECONDS:
+                self._swept_at = time.monotonic()
+                try:
+                    await to_thread.run_sync(seal_expired, limiter=self._limiter)
+                except Exception:
+                    logger.exception("sealing expired exam attempts failed")
+
+
+answer_buffer = AnswerBuffer()
+
+
+# ==============================
+# Urinishlar
+# ==============================
+def load_drafts(db: Session, attempt_id: int) -> Dict[int, List[int]]:
+    rows = db.execute(
+        select(AttemptDraft.question_id, AttemptDraft.option_ids).where(AttemptDraft.attempt_id == attempt_id)
+    ).all()
+    return {question_id: list(option_ids) for question_id, option_ids in rows}
+
+
+def get_open_attempt(db: Session, attempt_id: int) -> OpenAttempt:
+    """Keshdan yoki bitta so‘rov bilan; urinish yo‘q bo‘lsa 404, yakunlangan bo‘lsa 409."""
+    attempt = _open_attempts.get(attempt_id)
+    if attempt is not None:
+        return attempt
+    row = db.execute(
+        select(TestAttempt.student_id, TestAttempt.test_id, TestAttempt.status, TestAttempt.deadline_at, Test.version)
+        .join(Test, Test.id == TestAttempt.test_id)
+        .where(TestAttempt.id == attempt_id)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Urinish topilmadi")
+    if row.status != IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="Urinish allaqachon yakunlangan")
+    attempt = OpenAttempt(attempt_id, row.student_id, row.test_id, row.version, row.deadline_at)
+    _open_attempts.set(attempt_id, attempt)
+    return attempt
+
+
+def start_attempt(db: Session, student_id: int, test) -> tuple:
+    """
+    Ochiq urinishni qaytaradi (saqlangan javoblari bilan) yoki yangisini yaratadi.
+    Muddati o‘tgan ochiq urinish avval muhrlanadi. `test` — (id, version, duration_minutes).
+    """
+    for _ in range(2):  # bir vaqtdagi ikkita /start — unique indeks, ikkinchisi mavjudini oladi
+        existing = db.execute(
+            select(TestAttempt.id, TestAttempt.deadline_at).where(
+                TestAttempt.student_id == student_id,
+                TestAttempt.test_id == test.id,
+                TestAttempt.status == IN_PROGRESS,
+            )
+        ).first()
+        if existing is not None:
+            attempt = OpenAttempt(existing.id, student_id, test.id, test.version, existing.deadline_at)
+            if not attempt.expired():
+                _open_attempts.set(attempt.id, attempt)
+                answers = load_drafts(db, attempt.id)
+                answers.update(answer_buffer.peek(attempt.id))
+                return attempt, answers
+            seal(db, attempt, collect_answers(db, attempt.id))
+            db.commit()
+
+        now = utcnow()
+        row = TestAttempt(
+            student_id=student_id,
+            test_id=test.id,
+            started_at=now,
+            submitted_at=None,
+            status=IN_PROGRESS,
+            deadline_at=now + timedelta(minutes=test.duration_minutes or EXAM_DEFAULT_MINUTES),
+            score=0,
+            total=0,  # dashboard’lar total > 0 bo‘lganlarini hisoblaydi
+        )
+        db.add(row)
+        try:
+            db.flush()
+            attempt = OpenAttempt(row.id, student_id, test.id, test.version, row.deadline_at)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            continue
+        _open_attempts.set(attempt.id, attempt)
+        return attempt, {}
+    raise HTTPException(status_code=409, detail="Imtihonni boshlab bo‘lmadi, qayta urinib ko‘ring")
+
+
+def collect_answers(db: Session, attempt_id: int) -> Dict[int, List[int]]:
+    """DB’dagi draftlar + buffer’dagi yozilmagan javoblar (buffer yangiroq)."""
+    answers = load_drafts(db, attempt_id)
+    answers.update(answer_buffer.take(attempt_id))
+    return answers
+
+
+def seal(db: Session, attempt: OpenAttempt, answers: Dict[int, List[int]]) -> Optional[tuple]:
+    """
+    Baholaydi va urinishni `in_progress` -> `submitted` qiladi (commit yo‘q).
+    Boshqa so‘rov oldinroq muhrlagan bo‘lsa None.
+    """
+    _open_attempts.delete(attempt.id)
+    compiled = get_compiled(db, attempt.test_id, attempt.version)
+    selected = compiled.selected_pairs(
+        (question_id, option_id) for question_id, option_ids in answers.items() for option_id in option_ids
+    )
+    score = compiled.grade(selected)
+    submitted_at = utcnow()
+
+    sealed = db.execute(
+        update(TestAttempt)
+        .where(TestAttempt.id == attempt.id, TestAttempt.status == IN_PROGRESS)
+        .values(status=SUBMITTED, score=score, total=compiled.total, submitted_at=submitted_at)
+        .returning(TestAttempt.id)
+    ).scalar()
+    if sealed is None:
+        return None
+
+    if selected:
+        db.execute(insert(StudentAnswer), [
+            {
+                "student_id": attempt.student_id,
+                "question_id": question_id,
+                "selected_option_id": option_id,
+                "attempt_id": attempt.id,
+                "submitted_at": submitted_at,
+            }
+            for question_id, option_id in selected
+        ])
+    db.execute(delete(AttemptDraft).where(AttemptDraft.attempt_id == attempt.id))
+    return score, compiled.total, submitted_at
+
+
+def seal_expired(limit: int = EXAM_SWEEP_LIMIT) -> int:
+    """
+    Muddati (grace va boshqa workerlar buffer’i yozilishi bilan) o‘tgan ochiq
+    urinishlarni saqlangan javoblari bilan muhrlaydi.
+    """
+    cutoff = utcnow() - timedelta(seconds=EXAM_GRACE_SECONDS + 2 * EXAM_FLUSH_SECONDS)
+    sealed = 0
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(TestAttempt.id, TestAttempt.student_id, TestAttempt.test_id, TestAttempt.deadline_at, Test.version)
+            .join(Test, Test.id == TestAttempt.test_id)
+            .where(TestAttempt.status == IN_PROGRESS, TestAttempt.deadline_at < cutoff)
+            .limit(limit)
+        ).all()
+        for attempt_id, student_id, test_id, deadline_at, version in rows:
+            attempt = OpenAttempt(attempt_id, student_id, test_id, version, deadline_at)
+            if seal(db, attempt, collect_answers(db, attempt_id)) is not None:
+                sealed += 1
+            db.commit()
+        # Yakunlash bilan bir vaqtda yozilgan kechikkan draftlar
+        db.execute(delete(AttemptDraft).where(
+            select(TestAttempt.id)
+            .where(TestAttempt.id == AttemptDraft.attempt_id, TestAttempt.status != IN_PROGRESS)
+            .exists()
+        ))
+        db.commit()
+    return sealed
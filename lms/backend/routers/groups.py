@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
+from typing import Optional
 from sqlalchemy.orm import Session
 from .dependencies import get_db
 from .models import Group, Course, User, UserRole
 from .schemas import GroupCreate, GroupUpdate, GroupResponse
+from .rollups import bump, GROUPS_COUNT
+from .pagination import PageParams, paginate
+from .query_budget import sql_budget
+from .cache import catalog_cache, COURSES_TAG, GROUPS_TAG, PUBLIC
 
 groups_router = APIRouter(prefix="/groups", tags=["Groups"])
 
@@ -22,30 +28,38 @@ def create_group(group: GroupCreate, db: Session = Depends(get_db)):
         student_id=group.student_id
     )
     db.add(new_group)
+    bump(db, {GROUPS_COUNT: 1})
     db.commit()
+    # Shu worker keshi darhol, qolganlari CATALOG_CACHE_TTL ichida yangilanadi
+    catalog_cache.invalidate(GROUPS_TAG)
     db.refresh(new_group)
     return new_group
 
 
 # ------------------------------
-# GET all groups
+# GET all groups (ETag bilan keshlanadi)
 # ------------------------------
+GROUP_LIST = TypeAdapter(list[GroupResponse])
+
+
 @groups_router.get("/", response_model=list[GroupResponse])
-def get_groups(db: Session = Depends(get_db)):
-    groups = db.query(Group).all()
-    return [
-        GroupResponse(
-            id=g.id,
-            name=g.name,
-            course_id=g.course_id,
-            course_name=g.course.title if g.course else None,
-            teacher_id=g.teacher_id,
-            teacher_name=g.teacher.full_name if g.teacher else None,
-            student_id=g.student_id,
-            student_name=g.student.full_name if g.student else None,
-        )
-        for g in groups
-    ]
+@sql_budget(2)
+def get_groups(
+    request: Request,
+    response: Response,
+    course_id: Optional[int] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    key, cached = catalog_cache.lookup(request, GROUPS_TAG, PUBLIC)
+    if cached is not None:
+        return cached
+
+    query = db.query(Group)
+    if course_id:
+        query = query.filter(Group.course_id == course_id)
+    items = paginate(query, Group, page, response)
+    return catalog_cache.store(request, key, items, GROUP_LIST, response.headers)
 
 
 # ------------------------------
@@ -63,6 +77,7 @@ def update_group(group_id: int, updated: GroupUpdate, db: Session = Depends(get_
     group.student_id = updated.student_id or group.student_id
 
     db.commit()
+    catalog_cache.invalidate(GROUPS_TAG)
     db.refresh(group)
     return group
 
@@ -75,8 +90,10 @@ def delete_group(group_id: int, db: Session = Depends(get_db)):
     group = db.query(Group).filter(Group.id == group_id).first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
+    bump(db, {GROUPS_COUNT: -1})
     db.delete(group)
     db.commit()
+    catalog_cache.invalidate(GROUPS_TAG)
     return {"message": "Group deleted successfully"}
 
 
@@ -84,8 +101,11 @@ def delete_group(group_id: int, db: Session = Depends(get_db)):
 # GET courses, teachers, students
 # ------------------------------
 @groups_router.get("/courses")
-def get_courses(db: Session = Depends(get_db)):
-    return db.query(Course).all()
+def get_courses(request: Request, db: Session = Depends(get_db)):
+    key, cached = catalog_cache.lookup(request, COURSES_TAG, PUBLIC)
+    if cached is not None:
+        return cached
+    return catalog_cache.store(request, key, db.query(Course).all())
 
 
 @groups_router.get("/teachers/{course_id}")
@@ -0,0 +1,364 @@
+import asyncio
+import logging
+import os
+import time
+import traceback
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from anyio import CapacityLimiter, to_thread
+from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .exams import SUBMITTED
+from .dependencies import get_db, get_current_user
+from .models import Attendance, Group, Job, Test, TestAttempt, User, UserRole
+from .payments import payments_export_statement, PAYMENT_EXPORT_HEADER
+from .schemas import AttendanceReportParams, JobResponse, PaymentsExportParams, TestResultsParams
+from .spreadsheets import EXPORT_FORMATS, csv_chunks, iter_statement, xlsx_chunks
+
+jobs_router = APIRouter(prefix="/jobs", tags=["Jobs"])
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Sozlamalar
+# ------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Natija fayllari shu katalogda, ya'ni jobni bajargan mashina diskida. Bir nechta
+# host bo‘lsa katalog umumiy (NFS, volume) bo‘lishi kerak — aks holda boshqa
+# hostga tushgan /result so‘rovi faylni topmaydi va 410 qaytaradi.
+JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR", os.path.join(BASE_DIR, "job_results"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))          # 0 — faqat alohida `python worker.py`
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_TIMEOUT_SECONDS = int(os.getenv("JOB_TIMEOUT_SECONDS", "3600"))  # shundan uzoq "running" — qayta olinadi
+JOB_RESULT_TTL_HOURS = float(os.getenv("JOB_RESULT_TTL_HOURS", "24"))  # natija fayli shuncha saqlanadi
+JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", "600"))
+JOB_SWEEP_LIMIT = 200
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+# ==============================
+# Job turlari: parametrlar -> (SELECT, sarlavha, fayl nomi)
+# ==============================
+def _month_range(month: Optional[int], year: Optional[int]):
+    today = datetime.utcnow()
+    month = month or today.month
+    year = year or today.year
+    first_day = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return first_day, next_month
+
+
+def _require_staff(user: User):
+    if user.role not in [UserRole.teacher, UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+
+def attendance_report(db: Session, user: User, params: AttendanceReportParams):
+    """Barcha (yoki bitta) guruh bo‘yicha oylik yo‘qlama: har bir student uchun bor/yo‘q kunlar."""
+    _require_staff(user)
+    first_day, next_month = _month_range(params.month, params.year)
+    present = func.sum(case((Attendance.status == "present", 1), else_=0))
+    lessons = func.count(Attendance.id)
+
+    stmt = (
+        select(
+            Group.name, User.full_name, present, lessons - present,
+            func.round(100.0 * present / lessons, 1),
+        )
+        .select_from(Attendance)
+        .join(Group, Attendance.group_id == Group.id)
+        .join(User, Attendance.student_id == User.id)
+        .where(Attendance.date >= first_day, Attendance.date < next_month)
+        .group_by(Group.id, Group.name, User.id, User.full_name)
+        .order_by(Group.name, User.full_name)
+    )
+    if user.role == UserRole.teacher:
+        stmt = stmt.where(Attendance.group_id.in_([g.id for g in user.groups_as_teacher]))
+    if params.group_id:
+        stmt = stmt.where(Attendance.group_id == params.group_id)
+
+    header = ["group", "student", "present", "absent", "rate_percent"]
+    return stmt, header, f"attendance_{first_day:%Y-%m}"
+
+
+def payments_export(db: Session, user: User, params: PaymentsExportParams):
+    stmt = payments_export_statement(db, user, params.month, params.group_id, params.student_id)
+    return stmt, PAYMENT_EXPORT_HEADER, "payments"
+
+
+def test_results(db: Session, user: User, params: TestResultsParams):
+    """Har bir urinish: test, guruh, student, ball, foiz."""
+    _require_staff(user)
+    stmt = (
+        select(
+            Test.title, Group.name, User.full_name, TestAttempt.score, TestAttempt.total,
+            func.round(100.0 * TestAttempt.score / func.nullif(TestAttempt.total, 0), 1),
+            TestAttempt.submitted_at,
+        )
+        .select_from(TestAttempt)
+        .join(Test, TestAttempt.test_id == Test.id)
+        .outerjoin(Group, Test.group_id == Group.id)
+        .join(User, TestAttempt.student_id == User.id)
+        .where(TestAttempt.status == SUBMITTED)
+        .order_by(Test.id, TestAttempt.submitted_at)
+    )
+    if user.role == UserRole.teacher:
+        stmt = stmt.where(Test.created_by == user.id)
+    if params.test_id:
+        stmt = stmt.where(Test.id == params.test_id)
+    if params.group_id:
+        stmt = stmt.where(Test.group_id == params.group_id)
+
+    header = ["test", "group", "student", "score", "total", "percent", "submitted_at"]
+    return stmt, header, "test_results"
+
+
+JOB_KINDS = {
+    "attendance_report": (AttendanceReportParams, attendance_report),
+    "payments_export": (PaymentsExportParams, payments_export),
+    "test_results": (TestResultsParams, test_results),
+}
+
+
+# ==============================
+# Navbat: olish va bajarish (in-process runner va worker.py uchun umumiy)
+# ==============================
+def claim_job() -> Optional[Tuple[int, str]]:
+    """
+    Navbatdagi eng eski jobni atomik ravishda `running` qiladi va (job_id, claim_token)
+    qaytaradi; bo‘lmasa None. JOB_TIMEOUT_SECONDS’dan uzoq ishlayotgan job yangi
+    token bilan qayta olinadi — eski worker natijasi shu token bo‘yicha rad etiladi.
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        Job.status == QUEUED,
+        and_(Job.status == RUNNING, Job.started_at < now - timedelta(seconds=JOB_TIMEOUT_SECONDS)),
+    )
+    with SessionLocal() as db:
+        for _ in range(5):  # boshqa worker oldinroq olib qo‘ysa qayta urinadi
+            candidate = db.execute(
+                select(Job.id).where(claimable).order_by(Job.id).limit(1)
+            ).scalar()
+            if candidate is None:
+                return None
+            token = uuid.uuid4().hex
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == candidate, claimable)
+                .values(status=RUNNING, started_at=now, claim_token=token)
+                .returning(Job.id)
+            ).scalar()
+            db.commit()
+            if claimed is not None:
+                return claimed, token
+    return None
+
+
+def run_job(job_id: int, token: str):
+    """
+    Natija vaqtinchalik faylga yoziladi; job hali shu claim’niki bo‘lsa holat
+    shartli UPDATE bilan yakunlanadi va fayl atomik (os.replace) joyiga qo‘yiladi.
+    """
+    tmp = None
+    owned = and_(Job.id == job_id, Job.status == RUNNING, Job.claim_token == token)
+    with SessionLocal() as db:
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return
+            user = db.get(User, job.created_by)
+            params_model, build = JOB_KINDS[job.kind]
+            params = params_model.model_validate(job.params or {})
+            stmt, header, name = build(db, user, params)
+
+            os.makedirs(JOB_RESULTS_DIR, exist_ok=True)
+            path = os.path.join(JOB_RESULTS_DIR, f"job_{job.id}.{params.format}")
+            tmp = f"{path}.{token}.tmp"
+            batches = iter_statement(stmt)
+            with open(tmp, "wb") as out:
+                if params.format == "xlsx":
+                    for chunk in xlsx_chunks(header, batches):
+                        out.write(chunk)
+                else:
+                    for chunk in csv_chunks(header, batches):
+                        out.write(chunk.encode("utf-8"))
+
+            finished = db.execute(
+                update(Job).where(owned)
+                .values(
+                    status=SUCCEEDED, result_path=path, result_name=f"{name}.{params.format}",
+                    finished_at=datetime.utcnow(),
+                )
+                .returning(Job.id)
+            ).scalar()
+            if finished is None:
+                db.rollback()
+                os.remove(tmp)
+                logger.warning("job %s was reclaimed by another worker, result discarded", job_id)
+                return
+            os.replace(tmp, path)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)  # yarim yozilgan fayl
+            error = e.detail if isinstance(e, HTTPException) else "".join(
+                traceback.format_exception_only(type(e), e)
+            ).strip()
+            db.execute(
+                update(Job).where(owned)
+                .values(status=FAILED, error=error, result_path=None, finished_at=datetime.utcnow())
+            )
+            db.commit()
+
+
+def expire_results(limit: int = JOB_SWEEP_LIMIT) -> int:
+    """
+    JOB_RESULT_TTL_HOURS’dan eski natija fayllarini o‘chiradi — /result ular uchun
+    410 qaytaradi. Qulagan workerlardan qolgan `.tmp` fayllar ham tozalanadi.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=JOB_RESULT_TTL_HOURS)
+    if os.path.isdir(JOB_RESULTS_DIR):
+        stale = time.time() - JOB_TIMEOUT_SECONDS
+        for entry in os.scandir(JOB_RESULTS_DIR):
+            if entry.name.endswith(".tmp") and entry.stat().st_mtime < stale:
+                os.remove(entry.path)
+    with SessionLocal() as db:
+        jobs = db.scalars(
+            select(Job).where(Job.result_path.isnot(None), Job.finished_at < cutoff)
+            .order_by(Job.id).limit(limit)
+        ).all()
+        for job in jobs:
+            if os.path.exists(job.result_path):
+                os.remove(job.result_path)
+            job.result_path = None
+        db.commit()
+    return len(jobs)
+
+
+class JobRunner:
+    """
+    API process ichidagi cheklangan worker pool: `workers` ta asyncio task
+    navbatdan job oladi va uni alohida thread limiter’da bajaradi — API’ning
+    threadpool’i band bo‘lmaydi. Yangi job qo‘shilganda `notify()` darhol
+    uyg‘otadi; boshqa processlar qo‘shgan joblar `poll` soniyada topiladi.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll: float = JOB_POLL_SECONDS):
+        self.workers = workers
+        self.poll = poll
+        self._tasks = []
+        self._loop = None
+        self._wakeup = None
+        self._limiter = None
+        self._swept_at = 0.0
+
+    async def start(self):
+        if self.workers <= 0 or self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._limiter = CapacityLimiter(self.workers)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Sync endpointlar (threadpool) ichidan chaqirsa bo‘ladi."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await to_thread.run_sync(claim_job, limiter=self._limiter)
+                if claimed is not None:
+                    await to_thread.run_sync(run_job, *claimed, limiter=self._limiter)
+                    continue
+                if time.monotonic() - self._swept_at >= JOB_SWEEP_SECONDS:
+                    self._swept_at = time.monotonic()
+                    await to_thread.run_sync(expire_results, limiter=self._limiter)
+            except Exception:
+                # Masalan, baza vaqtincha ishlamayapti — task o‘lmasin, keyinroq qayta uriniladi
+                logger.exception("job worker iteration failed, retrying in %.0fs", self.poll)
+                await asyncio.sleep(self.poll)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_runner = JobRunner()
+
+
+# ==============================
+# Endpointlar
+# ==============================
+def _get_own_job(db: Session, job_id: int, user: User) -> Job:
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.created_by != user.id and user.role not in [UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return job
+
+
+@jobs_router.post("/{kind}", response_model=JobResponse, status_code=202)
+def create_job(
+    kind: str,
+    params: Optional[dict] = Body(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind: {kind}")
+
+    params_model, build = JOB_KINDS[kind]
+    try:
+        validated = params_model.model_validate(params or {})
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    # Ruxsat va filtrlar navbatga qo‘yishdan oldin tekshiriladi (so‘rov bajarilmaydi)
+    build(db, current_user, validated)
+
+    queued = db.query(func.count(Job.id)).filter(Job.status == QUEUED).scalar()
+    if queued >= JOB_QUEUE_LIMIT:
+        raise HTTPException(status_code=429, detail="Too many queued jobs, try again later")
+
+    job = Job(kind=kind, status=QUEUED, params=validated.model_dump(), created_by=current_user.id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    job_runner.notify()
+    return job
+
+
+@jobs_router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return _get_own_job(db, job_id, current_user)
+
+
+@jobs_router.get("/{job_id}/result")
+def get_job_result(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = _get_own_job(db, job_id, current_user)
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not job.result_path or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=410, detail="Result file is no longer available")
+    fmt = job.result_name.rsplit(".", 1)[-1]
+    return FileResponse(job.result_path, media_type=EXPORT_FORMATS[fmt], filename=job.result_name)
@@ -0,0 +1,24 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Payment, Question, Test
+
+# ==============================
+# Eager-loading profillari
+# ==============================
+# Har bir o‘qish endpointi response_model’i yuradigan relationship’larni
+# shu yerdan oladi — serializatsiya vaqtida qatorma-qator lazy SELECT bo‘lmaydi.
+# Many-to-one uchun joinedload (o‘sha so‘rovda JOIN), kolleksiyalar uchun
+# selectinload (bitta qo‘shimcha `IN (...)` so‘rov, LIMIT’ni buzmaydi).
+
+# PaymentResponse: student, teacher, group
+PAYMENT_LIST = (
+    joinedload(Payment.student),
+    joinedload(Payment.teacher),
+    joinedload(Payment.group),
+)
+
+# TestResponse: questions[].options — variantlar savollar bilan bitta so‘rovda
+# (selectinload IN ro‘yxatini 500 tadan bo‘ladi, katta testda so‘rovlar soni o‘sardi)
+TEST_DETAIL = (
+    selectinload(Test.questions).joinedload(Question.options),
+)
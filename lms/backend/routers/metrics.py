@@ -0,0 +1,284 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .database import replicas
+from .events import broker
+from .exams import answer_buffer
+from .utils import hasher
+
+logger = logging.getLogger(__name__)
+
+# ==============================
+# Route bo‘yicha latency va SQL metrikalari (Prometheus text format)
+# ==============================
+# Middleware har bir so‘rov uchun route shablonini (/students/{student_id}),
+# davomiylikni va shu so‘rovda bajarilgan SQL statementlar soni/vaqtini yozadi.
+# SLOW_QUERY_MS > 0 bo‘lsa sekin statementlar route bilan birga log qilinadi.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"  # 404 lar kardinallikni oshirmasligi uchun
+# So‘rov SQL’i qaysi bazada bajarilgani: "primary", "replica-0" ... (vergul bilan).
+# Streaming eksportlarda header body’dan oldin yuboriladi — ular uchun
+# lms_db_route_requests_total metrikasiga qarang.
+DB_ROUTE_HEADER = "X-DB-Route"
+
+
+class _RequestStats:
+    __slots__ = ("scope", "statements", "sql_seconds", "db_routes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.db_routes = set()
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+# Threadpool’ga o‘tgan sync endpointlar ham kontekst nusxasi orqali shu obyektni ko‘radi.
+# query_budget ham shu hisoblagichni o‘qiydi — SQL bitta joyda sanaladi.
+_current: ContextVar[Optional[_RequestStats]] = ContextVar("request_metrics", default=None)
+
+
+def request_stats() -> Optional[_RequestStats]:
+    """Joriy HTTP so‘rovning hisoblagichi (so‘rovdan tashqarida None)."""
+    return _current.get()
+
+
+def track_request(scope):
+    """(stats, token): hisoblagich allaqachon bo‘lsa o‘shani qaytaradi, token None."""
+    stats = _current.get()
+    if stats is not None:
+        return stats, None
+    stats = _RequestStats(scope)
+    return stats, _current.set(stats)
+
+
+def untrack_request(token):
+    _current.reset(token)
+
+
+class MetricsRegistry:
+    """Jarayon ichidagi hisoblagichlar; har bir worker o‘z qiymatlarini beradi."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}   # (method, route) -> [bucket_counts..., sum, count]
+        self._requests = {}  # (method, route, status) -> count
+        self._sql = {}       # (method, route) -> [statements, seconds]
+        self._db_routes = {}  # (method, route, db) -> count
+
+    def observe(
+        self, method: str, route: str, status: int, seconds: float, statements: int, sql_seconds: float,
+        db_routes=(),
+    ):
+        key = (method, route)
+        with self._lock:
+            hist = self._latency.get(key)
+            if hist is None:
+                hist = self._latency[key] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                hist[index] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+            status_key = (method, route, str(status))
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+
+            sql = self._sql.setdefault(key, [0, 0.0])
+            sql[0] += statements
+            sql[1] += sql_seconds
+
+            for db in db_routes:
+                db_key = (method, route, db)
+                self._db_routes[db_key] = self._db_routes.get(db_key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._latency.clear()
+            self._requests.clear()
+            self._sql.clear()
+            self._db_routes.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            latency = {k: list(v) for k, v in self._latency.items()}
+            requests = dict(self._requests)
+            sql = {k: list(v) for k, v in self._sql.items()}
+            db_routes = dict(self._db_routes)
+
+        lines = [
+            "# HELP lms_http_request_duration_seconds Request latency by route template.",
+            "# TYPE lms_http_request_duration_seconds histogram",
+        ]
+        for (method, route), hist in sorted(latency.items()):
+            labels = _labels(method=method, route=route)
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist):
+                cumulative += count
+                lines.append(f'lms_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'lms_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist[-1]}')
+            lines.append(f"lms_http_request_duration_seconds_sum{{{labels}}} {hist[-2]:.6f}")
+            lines.append(f"lms_http_request_duration_seconds_count{{{labels}}} {hist[-1]}")
+
+        lines += [
+            "# HELP lms_http_requests_total Requests by route template and status.",
+            "# TYPE lms_http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(requests.items()):
+            lines.append(f"lms_http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+        lines += [
+            "# HELP lms_sql_statements_total SQL statements issued by route template.",
+            "# TYPE lms_sql_statements_total counter",
+        ]
+        for (method, route), (statements, _) in sorted(sql.items()):
+            lines.append(f"lms_sql_statements_total{{{_labels(method=method, route=route)}}} {statements}")
+
+        lines += [
+            "# HELP lms_sql_duration_seconds_total Time spent in SQL by route template.",
+            "# TYPE lms_sql_duration_seconds_total counter",
+        ]
+        for (method, route), (_, seconds) in sorted(sql.items()):
+            lines.append(f"lms_sql_duration_seconds_total{{{_labels(method=method, route=route)}}} {seconds:.6f}")
+
+        lines += [
+            "# HELP lms_db_route_requests_total Requests that ran SQL on each database (primary / replica-N).",
+            "# TYPE lms_db_route_requests_total counter",
+        ]
+        for (method, route, db), count in sorted(db_routes.items()):
+            lines.append(f"lms_db_route_requests_total{{{_labels(method=method, route=route, db=db)}}} {count}")
+
+        if replicas.replicas:
+            lines += [
+                "# HELP lms_db_replica_healthy 1 if the replica passed its last health check.",
+                "# TYPE lms_db_replica_healthy gauge",
+            ]
+            lines += [
+                f"lms_db_replica_healthy{{{_labels(replica=r.name)}}} {int(r.healthy)}" for r in replicas.replicas
+            ]
+            lines += [
+                "# HELP lms_db_replica_lag_seconds Replication lag seen by the last health check.",
+                "# TYPE lms_db_replica_lag_seconds gauge",
+            ]
+            lines += [
+                f"lms_db_replica_lag_seconds{{{_labels(replica=r.name)}}} {r.lag:.3f}" for r in replicas.replicas
+            ]
+
+        lines += [
+            "# HELP lms_password_hash_in_flight Bcrypt jobs running or queued.",
+            "# TYPE lms_password_hash_in_flight gauge",
+            f"lms_password_hash_in_flight {hasher.in_flight}",
+            "# HELP lms_password_hash_queue_depth Bcrypt jobs waiting for a worker.",
+            "# TYPE lms_password_hash_queue_depth gauge",
+            f"lms_password_hash_queue_depth {hasher.queue_depth}",
+            "# HELP lms_dashboard_stream_subscribers Open dashboard SSE connections.",
+            "# TYPE lms_dashboard_stream_subscribers gauge",
+            f"lms_dashboard_stream_subscribers {broker.subscribers}",
+            "# HELP lms_exam_autosave_pending Autosaved answers waiting to be flushed to attempt_drafts.",
+            "# TYPE lms_exam_autosave_pending gauge",
+            f"lms_exam_autosave_pending {answer_buffer.pending}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+# ------------------------------
+# SQLAlchemy hook’lari
+# ------------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("metrics_started")
+    if stats is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    stats.db_routes.add(replicas.route_name(conn.engine))
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query %.1f ms [%s %s]: %s",
+            elapsed * 1000, stats.scope.get("method"), stats.route, " ".join(statement.split())[:500],
+        )
+
+
+# ------------------------------
+# ASGI middleware
+# ------------------------------
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = _RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+        elapsed = None
+
+        async def send_wrapper(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = dict(message.get("headers", []))
+                if headers.get(b"content-type", b"").startswith(b"text/event-stream"):
+                    elapsed = time.perf_counter() - started
+                if stats.db_routes:
+                    route_header = ",".join(sorted(stats.db_routes)).encode("latin-1")
+                    message["headers"] = [*message.get("headers", []), (DB_ROUTE_HEADER.encode("latin-1"), route_header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Streaming javoblar to‘liq yuborilgandan keyin o‘lchanadi; SSE esa soatlab
+            # ochiq turadi — uning latency’si javob boshlanguncha (http.response.start)
+            if elapsed is None:
+                elapsed = time.perf_counter() - started
+            self.registry.observe(
+                scope["method"], stats.route, status,
+                elapsed, stats.statements, stats.sql_seconds, stats.db_routes,
+            )
+            _current.reset(token)
+
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
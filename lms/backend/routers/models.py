@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Enum, Float, ForeignKey, DateTime, Table, Text, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Enum, Float, ForeignKey, DateTime, Table, Text, Date, UniqueConstraint, Index, JSON, text
+from sqlalchemy.orm import relationship, synonym
 from .database import Base
-from datetime import datetime
+from datetime import datetime, timezone
 import enum
 
+
+def _utcnow():
+    # Imtihon vaqtlari timezone-aware UTC saqlanadi (exams.utcnow bilan bir xil)
+    return datetime.now(timezone.utc)
+
 # ==============================
 # User roles
 # ==============================
@@ -27,6 +32,9 @@ class StudentStatus(str, enum.Enum):
 # ==============================
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_role_status", "role", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False, index=True)
@@ -44,6 +52,12 @@ class User(Base):
     fee = Column(Float, nullable=True)
     status = Column(Enum(StudentStatus), default=StudentStatus.interested)
 
+    # Parol o‘zgarganda oshiriladi — eski JWT’lar ("ver" claim) bekor bo‘ladi
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # full_name + username + telefon raqamlari, normallashtirilgan (routers/search.py)
+    search_key = Column(Text, nullable=True)
+
     # Relationships
     groups_as_teacher = relationship("Group", secondary="group_teachers", back_populates="teachers")
     groups_as_student = relationship("Group", secondary="group_students", back_populates="students")
@@ -53,7 +67,7 @@ class User(Base):
     payments_as_teacher = relationship("Payment", foreign_keys="Payment.teacher_id", back_populates="teacher")
 
     # ✅ Qo‘shilganlar:
-    created_courses = relationship("Course", back_populates="creator")  # o‘zi yaratgan kurslar
+    created_courses = relationship("Course", foreign_keys="Course.created_by", back_populates="creator")  # o‘zi yaratgan kurslar
     enrolled_courses = relationship("StudentCourse", back_populates="student")  # o‘zi qatnashgan kurslar
 
 
@@ -63,15 +77,15 @@ class User(Base):
 group_students = Table(
     "group_students",
     Base.metadata,
-    Column("group_id", Integer, ForeignKey("groups.id")),
-    Column("student_id", Integer, ForeignKey("users.id"))
+    Column("group_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("student_id", Integer, ForeignKey("users.id"), primary_key=True)
 )
 
 group_teachers = Table(
     "group_teachers",
     Base.metadata,
-    Column("group_id", Integer, ForeignKey("groups.id")),
-    Column("teacher_id", Integer, ForeignKey("users.id"))
+    Column("group_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("teacher_id", Integer, ForeignKey("users.id"), primary_key=True)
 )
 
 # ==============================
@@ -103,11 +117,11 @@ class Payment(Base):
     id = Column(Integer, primary_key=True)
     amount = Column(Float, nullable=False)
     description = Column(String, nullable=True)
-    student_id = Column(Integer, ForeignKey("users.id"))
+    student_id = Column(Integer, ForeignKey("users.id"), index=True)
     teacher_id = Column(Integer, ForeignKey("users.id"))
     group_id = Column(Integer, ForeignKey("groups.id"))
-    month = Column(String(7), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    month = Column(String(7), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     student = relationship("User", foreign_keys=[student_id], back_populates="payments_as_student")
     teacher = relationship("User", foreign_keys=[teacher_id], back_populates="payments_as_teacher")
@@ -118,6 +132,11 @@ class Payment(Base):
 # ==============================
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # Bir kunda bir student uchun bitta yozuv
+        UniqueConstraint("group_id", "student_id", "date", name="uq_attendance_group_student_date"),
+        Index("ix_attendance_group_date", "group_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -142,25 +161,27 @@ class Test(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     group_id = Column(Integer, ForeignKey("groups.id"))
     created_at = Column(DateTime, default=datetime.utcnow)  # ✅ shu yer
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # savollar o‘zgarganda oshadi
+    duration_minutes = Column(Integer, nullable=True)  # imtihon vaqti; None — EXAM_DEFAULT_MINUTES
     group = relationship("Group", back_populates="tests")
-    questions = relationship("Question", back_populates="test")
+    questions = relationship("Question", back_populates="test", order_by="Question.id")
 
 class Question(Base):
     __tablename__ = "questions"
 
     id = Column(Integer, primary_key=True, index=True)
-    test_id = Column(Integer, ForeignKey("tests.id"))
+    test_id = Column(Integer, ForeignKey("tests.id"), index=True)
     text = Column(String, nullable=False)
     type = Column(String, default="single")  # single / multiple
 
     test = relationship("Test", back_populates="questions")
-    options = relationship("Option", back_populates="question")
+    options = relationship("Option", back_populates="question", order_by="Option.id")
 
 class Option(Base):
     __tablename__ = "options"
 
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id"))
+    question_id = Column(Integer, ForeignKey("questions.id"), index=True)
     text = Column(String, nullable=False)
     is_correct = Column(Integer, default=0)  # 1 = true, 0 = false
 
@@ -168,12 +189,57 @@ class Option(Base):
 
 class StudentAnswer(Base):
     __tablename__ = "student_answers"
+    __table_args__ = (
+        Index("ix_student_answers_student_question", "student_id", "question_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"))
     question_id = Column(Integer, ForeignKey("questions.id"))
     selected_option_id = Column(Integer, ForeignKey("options.id"))
-    submitted_at = Column(DateTime, default=datetime.utcnow)
+    attempt_id = Column(Integer, ForeignKey("test_attempts.id"), nullable=True, index=True)
+    submitted_at = Column(DateTime(timezone=True), default=_utcnow)
+
+    attempt = relationship("TestAttempt", back_populates="answers")
+
+class TestAttempt(Base):
+    __tablename__ = "test_attempts"
+    __table_args__ = (
+        # Student bir testda bir vaqtda faqat bitta ochiq imtihon urinishiga ega
+        Index(
+            "ux_test_attempts_open", "student_id", "test_id", unique=True,
+            postgresql_where=text("status = 'in_progress'"), sqlite_where=text("status = 'in_progress'"),
+        ),
+        # Muddati o‘tgan ochiq urinishlarni topish (fon task’i)
+        Index(
+            "ix_test_attempts_open_deadline", "deadline_at",
+            postgresql_where=text("status = 'in_progress'"), sqlite_where=text("status = 'in_progress'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
+    started_at = Column(DateTime(timezone=True), default=_utcnow)
+    submitted_at = Column(DateTime(timezone=True), default=_utcnow)  # ochiq urinishda NULL
+    score = Column(Integer, nullable=False, default=0)  # to‘g‘ri javoblar soni
+    total = Column(Integer, nullable=False, default=0)  # testdagi savollar soni
+    status = Column(String(20), nullable=False, default="submitted", server_default="submitted")  # in_progress / submitted
+    deadline_at = Column(DateTime(timezone=True), nullable=True)  # faqat /start orqali boshlangan urinishlarda
+
+    student = relationship("User")
+    test = relationship("Test")
+    answers = relationship("StudentAnswer", back_populates="attempt")
+
+
+class AttemptDraft(Base):
+    """Ochiq imtihondagi avtosaqlangan javoblar: savol -> tanlangan variantlar (yakunlanganda o‘chiriladi)."""
+    __tablename__ = "attempt_drafts"
+
+    attempt_id = Column(Integer, ForeignKey("test_attempts.id", ondelete="CASCADE"), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    option_ids = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=_utcnow)
 
 # ==============================
 # Course model
@@ -191,7 +257,8 @@ class Course(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    creator = relationship("User", back_populates="created_courses")
+    creator_id = synonym("created_by")  # CourseOut.creator_id
+    creator = relationship("User", foreign_keys=[created_by], back_populates="created_courses")
     students = relationship("StudentCourse", back_populates="course")
     teacher_id = Column(Integer, ForeignKey("users.id"))
     teacher = relationship("User", foreign_keys=[teacher_id])
@@ -211,3 +278,45 @@ class StudentCourse(Base):
     course = relationship("Course", back_populates="students")
 
 
+# ==============================
+# Dashboard rollup
+# ==============================
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+
+    key = Column(String, primary_key=True)  # masalan: students.total, payments.total
+    value = Column(Float, nullable=False, default=0)
+
+
+# ==============================
+# Oylik to‘lovlar rollup’i (ledger uchun)
+# ==============================
+class PaymentMonthTotal(Base):
+    __tablename__ = "payment_month_totals"
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # '2025-10'
+    amount = Column(Float, nullable=False, default=0)
+
+
+# ==============================
+# Fon ishlari (hisobotlar, eksportlar)
+# ==============================
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),  # navbatdan olish
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued / running / succeeded / failed
+    params = Column(JSON, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    claim_token = Column(String(32), nullable=True)  # har bir claim’da yangi (jobs.run_job shunga tekshiradi)
+    error = Column(Text, nullable=True)
+    result_path = Column(String, nullable=True)
+    result_name = Column(String, nullable=True)
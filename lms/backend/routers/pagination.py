@@ -0,0 +1,100 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query as OrmQuery
+
+# ==============================
+# Keyset (cursor) pagination
+# ==============================
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+TOTAL_ESTIMATE_CAP = 10_000  # birinchi sahifada shu songacha sanaladi
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_ESTIMATE_HEADER = "X-Total-Estimate"
+
+
+class PageParams:
+    """`Depends(PageParams)` — barcha ro‘yxat endpointlari uchun umumiy parametrlar."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Oldingi javobdagi X-Next-Cursor"),
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        sort: str = Query("id", pattern=r"^-?(id|created_at)$", description="id, -id, created_at, -created_at"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.descending = sort.startswith("-")
+        self.sort_key = sort.lstrip("-")
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, is_datetime: bool) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, last_id = json.loads(raw)
+        if is_datetime and value is not None:  # None — created_at’i NULL qator
+            value = datetime.fromisoformat(value)
+        return [value, int(last_id)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _estimate_total(query: OrmQuery) -> int:
+    capped = query.order_by(None).limit(TOTAL_ESTIMATE_CAP).subquery()
+    return query.session.execute(select(func.count()).select_from(capped)).scalar()
+
+
+def paginate(query: OrmQuery, model, page: PageParams, response: Response) -> list:
+    """
+    `query`ni (model.sort_key, model.id) bo‘yicha keyset usulida sahifalaydi.
+    Keyingi sahifa kursori va taxminiy jami son javob header’larida qaytadi.
+    created_at NULL bo‘lishi mumkin: NULL qatorlar o‘sish tartibida boshida,
+    kamayishda oxirida (id bo‘yicha) keladi va kursorda `null` bo‘lib qoladi.
+    """
+    column = getattr(model, page.sort_key, None)
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {page.sort_key}")
+    id_column = model.id
+
+    if page.cursor is None:
+        response.headers[TOTAL_ESTIMATE_HEADER] = str(_estimate_total(query))
+    else:
+        is_datetime = page.sort_key != "id"
+        value, last_id = decode_cursor(page.cursor, is_datetime)
+        if not is_datetime:
+            after = id_column < last_id if page.descending else id_column > last_id
+        elif page.descending:
+            after = and_(column.is_(None), id_column < last_id) if value is None else or_(
+                column < value, and_(column == value, id_column < last_id), column.is_(None)
+            )
+        else:
+            after = or_(and_(column.is_(None), id_column > last_id), column.isnot(None)) if value is None else or_(
+                column > value, and_(column == value, id_column > last_id)
+            )
+        query = query.filter(after)
+
+    if page.sort_key == "id":
+        order = [id_column.desc() if page.descending else id_column.asc()]
+    elif page.descending:
+        order = [column.desc().nulls_last(), id_column.desc()]
+    else:
+        order = [column.asc().nulls_first(), id_column.asc()]
+
+    items = query.order_by(*order).limit(page.limit + 1).all()
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(last, page.sort_key), last.id]
+        )
+    return items
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Integer, and_, case, cast, func, literal, or_, select, true, union_all
 from typing import List, Optional
 from datetime import date
-from .dependencies import get_db, get_current_user
-from .schemas import PaymentResponse, UserResponse, GroupResponse
-from .models import User, UserRole, Payment, Group
+from .dependencies import get_db, get_current_user, replica_reads
+from .schemas import PaymentCreate, PaymentResponse, UserResponse, GroupResponse
+from .models import User, UserRole, StudentStatus, Payment, Group, PaymentMonthTotal, group_students
+from .rollups import bump, add_month_payment, PAYMENTS_TOTAL
+from .pagination import (
+    DEFAULT_LIMIT, MAX_LIMIT, PageParams, paginate, encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+)
+from .spreadsheets import export_response
+from .loaders import PAYMENT_LIST
+from .query_budget import sql_budget
+from .events import broker
 
 payments_router = APIRouter(
     prefix="/payments",
@@ -13,46 +21,107 @@ payments_router = APIRouter(
 )
 
 # ------------------------------
-# GET Payments
+# Filtrlar (ro‘yxat va eksport uchun umumiy)
 # ------------------------------
-@payments_router.get("/", response_model=List[PaymentResponse])
-def get_payments(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+def _payments_query(db: Session, current_user: User, month, group_id, student_id):
     if current_user.role == UserRole.student:
-        payments = db.query(Payment).filter(
+        query = db.query(Payment).filter(
             or_(
                 Payment.student_id == current_user.id,
                 Payment.teacher_id == current_user.id
             )
-        ).all()
+        )
     elif current_user.role == UserRole.teacher:
         group_ids = [g.id for g in current_user.groups_as_teacher]
-        payments = db.query(Payment).filter(
+        query = db.query(Payment).filter(
             or_(
                 Payment.teacher_id == current_user.id,
                 Payment.group_id.in_(group_ids)
             )
-        ).all()
+        )
     elif current_user.role in [UserRole.manager, UserRole.admin]:
-        payments = db.query(Payment).all()
+        query = db.query(Payment)
     else:
-        payments = []
+        return None
+
+    if month:
+        query = query.filter(Payment.month == month)
+    if group_id:
+        query = query.filter(Payment.group_id == group_id)
+    if student_id:
+        query = query.filter(Payment.student_id == student_id)
+    return query
+
+
+# ------------------------------
+# GET Payments
+# ------------------------------
+@payments_router.get("/", response_model=List[PaymentResponse])
+@sql_budget(4)
+@replica_reads
+def get_payments(
+    response: Response,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    group_id: Optional[int] = Query(None),
+    student_id: Optional[int] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = _payments_query(db, current_user, month, group_id, student_id)
+    if query is None:
+        return []
+    return paginate(query.options(*PAYMENT_LIST), Payment, page, response)
+
+
+# ------------------------------
+# EXPORT Payments (CSV / XLSX oqim)
+# ------------------------------
+PAYMENT_EXPORT_HEADER = ["id", "created_at", "month", "amount", "description", "student", "teacher", "group"]
+
+
+def payments_export_statement(db: Session, current_user: User, month, group_id, student_id):
+    """Eksport endpointi va fon job’i uchun umumiy SELECT."""
+    query = _payments_query(db, current_user, month, group_id, student_id)
+    if query is None:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    # ORM obyektlari va lazy relationship’lar o‘rniga tekis ustunlar (outer join)
+    student = aliased(User)
+    teacher = aliased(User)
+    return (
+        query.outerjoin(student, Payment.student_id == student.id)
+        .outerjoin(teacher, Payment.teacher_id == teacher.id)
+        .outerjoin(Group, Payment.group_id == Group.id)
+        .with_entities(
+            Payment.id, Payment.created_at, Payment.month, Payment.amount, Payment.description,
+            student.full_name, teacher.full_name, Group.name,
+        )
+        .order_by(Payment.id)
+        .statement
+    )
+
+
+@payments_router.get("/export")
+@replica_reads
+def export_payments(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    group_id: Optional[int] = Query(None),
+    student_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    stmt = payments_export_statement(db, current_user, month, group_id, student_id)
+    return export_response(stmt, PAYMENT_EXPORT_HEADER, "payments", format)
 
-    return payments
 
 # ------------------------------
 # CREATE Payment
 # ------------------------------
 @payments_router.post("/", response_model=PaymentResponse)
 def create_payment(
-    amount: float = Body(..., gt=0),
-    description: Optional[str] = Body(None),
-    student_id: Optional[int] = Body(None),
-    teacher_id: Optional[int] = Body(None),
-    group_id: Optional[int] = Body(None),
-    month: Optional[str] = Body(None),  # yangi maydon
+    data: PaymentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -61,29 +130,35 @@ def create_payment(
         raise HTTPException(status_code=403, detail="Students cannot create payments")
 
     if current_user.role == UserRole.teacher:
-        if teacher_id and teacher_id != current_user.id:
+        if data.teacher_id and data.teacher_id != current_user.id:
             raise HTTPException(status_code=403, detail="Teachers can only add their own salary")
-        if group_id:
-            group = db.query(Group).filter(Group.id == group_id).first()
+        if data.group_id:
+            group = db.query(Group).filter(Group.id == data.group_id).first()
             if not group or current_user not in group.teachers:
                 raise HTTPException(status_code=403, detail="You can only add payments for your groups")
 
     # Agar month berilmagan bo‘lsa, hozirgi oyni default qilamiz
-    if not month:
-        month = date.today().strftime("%Y-%m")  # misol: '2025-10'
+    month = data.month or date.today().strftime("%Y-%m")  # misol: '2025-10'
 
     # Create payment
     payment = Payment(
-        amount=amount,
-        description=description,
-        student_id=student_id,
-        teacher_id=teacher_id,
-        group_id=group_id,
+        amount=data.amount,
+        description=data.description,
+        student_id=data.student_id,
+        teacher_id=data.teacher_id,
+        group_id=data.group_id,
         month=month  # saqlaymiz
     )
 
     db.add(payment)
+    bump(db, {PAYMENTS_TOTAL: data.amount})
+    if data.student_id:
+        add_month_payment(db, data.student_id, month, data.amount)
     db.commit()
+    broker.publish(
+        "payment", amount=data.amount, student_id=data.student_id, group_id=data.group_id, month=month,
+        counters={PAYMENTS_TOTAL: data.amount},
+    )
     db.refresh(payment)
 
     # Return full student/teacher/group info using from_orm
@@ -100,3 +175,171 @@ def create_payment(
         teacher_id=payment.teacher_id,
         group_id=payment.group_id
     )
+
+
+# ------------------------------
+# Ledger: student va oy bo‘yicha qarzdorlik
+# ------------------------------
+MAX_LEDGER_MONTHS = 36
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+
+def _month_index(month: str) -> int:
+    year, month = map(int, month.split("-"))
+    return year * 12 + month - 1
+
+
+def _month_range(first: str, last: str) -> List[str]:
+    return [f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(_month_index(first), _month_index(last) + 1)]
+
+
+def _sql_month_index(column):
+    """'YYYY-MM' ustunidan _month_index bilan bir xil son (oylar ayirmasi uchun)."""
+    return cast(func.substr(column, 1, 4), Integer) * 12 + cast(func.substr(column, 6, 2), Integer) - 1
+
+
+@payments_router.get("/ledger")
+@replica_reads
+def get_ledger(
+    response: Response,
+    from_month: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    to_month: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    group_id: Optional[int] = Query(None),
+    overdue_only: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="Oldingi javobdagi X-Next-Cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Har bir student uchun oyma-oy: kutilgan to‘lov (User.fee), to‘langan summa
+    (payment_month_totals rollup’idan) va yig‘ilib boruvchi balans (window SUM).
+    Ledger studentning birinchi to‘lov oyidan (yoki from_month’dan) boshlanadi;
+    from_month’dan oldingi to‘lov va hisoblashlar boshlang‘ich balansga kiradi.
+    Oraliq MAX_LEDGER_MONTHS oydan uzun bo‘lsa 400. To‘lov faqat o‘qiyotgan (studying) studentlardan kutiladi; ketgan/bitirgan
+    studentlar uchun — oxirgi to‘lov oyigacha. Hech to‘lamagan va o‘qimayotgan
+    studentlar ledger’ga kirmaydi.
+    """
+    if current_user.role not in [UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    to_month = to_month or date.today().strftime("%Y-%m")
+    if not from_month:
+        year, month = map(int, to_month.split("-"))
+        from_month = f"{year:04d}-01" if month == 12 else f"{year - 1:04d}-{month + 1:02d}"  # oxirgi 12 oy
+    month_list = _month_range(from_month, to_month)
+    if not month_list:
+        raise HTTPException(status_code=400, detail="from_month must not be after to_month")
+    if len(month_list) > MAX_LEDGER_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Ledger range must not exceed {MAX_LEDGER_MONTHS} months")
+
+    months = union_all(*[select(literal(m).label("month")) for m in month_list]).cte("months")
+
+    # Studentning birinchi to‘lov oyi; to‘lovi bo‘lmasa faqat oxirgi oy ko‘rsatiladi
+    first_month = (
+        select(func.min(PaymentMonthTotal.month))
+        .where(PaymentMonthTotal.student_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+    last_month = (
+        select(func.max(PaymentMonthTotal.month))
+        .where(PaymentMonthTotal.student_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+    paid_before = (
+        select(func.coalesce(func.sum(PaymentMonthTotal.amount), 0))
+        .where(PaymentMonthTotal.student_id == User.id, PaymentMonthTotal.month < from_month)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+    students = select(
+        User.id, User.full_name, func.coalesce(User.fee, 0).label("fee"),
+        (User.status == StudentStatus.studying).label("studying"),
+        first_month.label("first_month"), last_month.label("last_month"), paid_before.label("paid_before"),
+    ).where(User.role == UserRole.student, or_(User.status == StudentStatus.studying, first_month.isnot(None)))
+    if group_id:
+        students = students.where(User.id.in_(
+            select(group_students.c.student_id).where(group_students.c.group_id == group_id)
+        ))
+    students = students.subquery()
+
+    # Boshlang‘ich balans: from_month’gacha to‘langan minus shu oylar uchun kutilgan
+    # (ledger qoidasi bilan: birinchi to‘lov oyidan; o‘qimayotganlarga oxirgi to‘lov oyigacha)
+    charged_before = case(
+        (students.c.first_month < from_month, case(
+            (or_(students.c.studying, students.c.last_month >= from_month), _month_index(from_month) - 1),
+            else_=_sql_month_index(students.c.last_month),
+        ) - _sql_month_index(students.c.first_month) + 1),
+        else_=0,
+    )
+    opening = (students.c.paid_before - students.c.fee * charged_before).label("opening")
+
+    rows = (
+        select(
+            students.c.id.label("student_id"),
+            students.c.full_name,
+            months.c.month,
+            students.c.fee,
+            case(
+                (or_(students.c.studying, months.c.month <= students.c.last_month), students.c.fee),
+                else_=0,
+            ).label("expected"),
+            func.coalesce(PaymentMonthTotal.amount, 0).label("paid"),
+            opening,
+        )
+        .select_from(students)
+        .join(months, true())
+        .outerjoin(PaymentMonthTotal, and_(
+            PaymentMonthTotal.student_id == students.c.id,
+            PaymentMonthTotal.month == months.c.month,
+        ))
+        .where(months.c.month >= func.coalesce(students.c.first_month, to_month))
+        .subquery()
+    )
+
+    ledger = select(
+        rows,
+        (rows.c.opening + func.sum(rows.c.paid - rows.c.expected).over(
+            partition_by=rows.c.student_id, order_by=rows.c.month
+        )).label("balance"),
+        (rows.c.opening + func.sum(rows.c.paid - rows.c.expected).over(
+            partition_by=rows.c.student_id
+        )).label("final_balance"),
+    ).subquery()
+
+    # Sahifa studentlar bo‘yicha (keyset: student_id)
+    page_ids = select(ledger.c.student_id).distinct()
+    if overdue_only:
+        page_ids = page_ids.where(ledger.c.final_balance < 0)
+    if cursor:
+        page_ids = page_ids.where(ledger.c.student_id > decode_cursor(cursor, False)[1])
+    page_ids = [sid for (sid,) in db.execute(page_ids.order_by(ledger.c.student_id).limit(limit + 1))]
+    if len(page_ids) > limit:
+        page_ids = page_ids[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([page_ids[-1], page_ids[-1]])
+
+    result = {}
+    for row in db.execute(
+        select(ledger).where(ledger.c.student_id.in_(page_ids)).order_by(ledger.c.student_id, ledger.c.month)
+    ).mappings():
+        student = result.setdefault(row["student_id"], {
+            "student_id": row["student_id"],
+            "full_name": row["full_name"],
+            "fee": row["fee"],
+            "opening_balance": row["opening"],
+            "balance": row["final_balance"],
+            "months": [],
+        })
+        student["months"].append({
+            "month": row["month"],
+            "expected": row["expected"],
+            "paid": row["paid"],
+            "balance": row["balance"],
+        })
+
+    return list(result.values())
@@ -0,0 +1,84 @@
+import logging
+import os
+
+from starlette.responses import JSONResponse
+
+from .metrics import request_stats, track_request, untrack_request
+
+logger = logging.getLogger(__name__)
+
+# ==============================
+# So‘rov boshiga SQL budjeti (N+1 qo‘riqchisi)
+# ==============================
+# Endpoint `@sql_budget(n)` bilan nechta SQL statement bajarishi mumkinligini
+# e'lon qiladi. Statementlar alohida sanalmaydi — MetricsMiddleware’ning so‘rov
+# hisoblagichi (dependency’lar va response_model serializatsiyasi ham) o‘qiladi.
+# SQL_BUDGET_STRICT=1 (test/CI) bo‘lsa budjetdan oshgan endpoint 500 qaytaradi,
+# aks holda faqat log yoziladi.
+SQL_BUDGET_STRICT = os.getenv("SQL_BUDGET_STRICT") == "1"
+SQL_COUNT_HEADER = "X-SQL-Count"
+
+
+def sql_budget(limit: int):
+    """
+    Endpointning SQL budjetini belgilaydi. Router dekoratoridan PASTDA yoziladi:
+
+        @payments_router.get("/")
+        @sql_budget(5)
+        def get_payments(...): ...
+    """
+    def decorator(func):
+        func.sql_budget = limit
+        return func
+    return decorator
+
+
+def statement_count() -> int:
+    stats = request_stats()
+    return stats.statements if stats is not None else 0
+
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware: budjet javob boshlanishidan oldin tekshiriladi."""
+
+    def __init__(self, app, strict: bool = SQL_BUDGET_STRICT):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Odatda MetricsMiddleware tashqarida va hisoblagich allaqachon bor
+        stats, token = track_request(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Router `scope`ga endpointni yozib qo‘yadi
+                budget = getattr(scope.get("endpoint"), "sql_budget", None)
+                if budget is not None and stats.statements > budget:
+                    detail = f"SQL budget exceeded: {stats.statements} statements > {budget} ({scope['path']})"
+                    if self.strict:
+                        response = JSONResponse(status_code=500, content={"detail": detail})
+                        response.headers[SQL_COUNT_HEADER] = str(stats.statements)
+                        await response(scope, receive, send)
+                        raise _BudgetExceeded()
+                    logger.warning(detail)
+                if self.strict:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (SQL_COUNT_HEADER.lower().encode(), str(stats.statements).encode())
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except _BudgetExceeded:
+            pass
+        finally:
+            if token is not None:
+                untrack_request(token)
+
+
+class _BudgetExceeded(Exception):
+    """Asl javob tanasini yuborishni to‘xtatish uchun ichki signal."""
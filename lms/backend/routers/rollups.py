@@ -0,0 +1,137 @@
+from datetime import datetime, time
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models import DashboardCounter, Group, Payment, PaymentMonthTotal, StudentStatus, User, UserRole
+
+# ==============================
+# Dashboard rollup
+# ==============================
+# Admin/manager dashboardi har safar butun jadvallarni sanamasligi uchun
+# hisoblagichlar `dashboard_counters` jadvalida saqlanadi va yozish
+# endpointlari ularni o‘sha tranzaksiyada yangilaydi.
+
+STUDENT_TOTAL = "students.total"
+GROUPS_COUNT = "groups.count"
+PAYMENTS_TOTAL = "payments.total"
+
+STUDENT_STATUS_KEYS = {s: f"students.{s.value}" for s in StudentStatus}
+DASHBOARD_KEYS = [STUDENT_TOTAL, *STUDENT_STATUS_KEYS.values(), GROUPS_COUNT, PAYMENTS_TOTAL]
+# Faqat rebuild_dashboard() yozadi: bump() rollup qurilmasdan yaratgan (faqat
+# delta saqlagan) qatorlar to‘liq hisoblagich deb o‘qilmasligi uchun
+ROLLUP_BUILT = "rollup.built"
+
+_UPSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def _student_counters(role, status) -> dict:
+    if role is None or UserRole(role) != UserRole.student:
+        return {}
+    counters = {STUDENT_TOTAL: 1}
+    if status is not None:
+        counters[STUDENT_STATUS_KEYS[StudentStatus(status)]] = 1
+    return counters
+
+
+def student_deltas(before=None, after=None) -> dict:
+    """(role, status) juftliklaridan hisoblagich o‘zgarishlarini hosil qiladi."""
+    deltas = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        for key, value in _student_counters(*state).items():
+            deltas[key] = deltas.get(key, 0) + sign * value
+    return {k: v for k, v in deltas.items() if v}
+
+
+def bump(db: Session, deltas: dict):
+    """Hisoblagichlarni joyida oshiradi (bitta upsert); commit chaqiruvchi tomonda."""
+    if not deltas:
+        return
+    insert = _UPSERTS[db.get_bind().dialect.name]
+    # Kalitlar tartiblangan — qatorlar rebuild_dashboard() bilan bir xil tartibda qulflanadi
+    stmt = insert(DashboardCounter).values([{"key": k, "value": deltas[k]} for k in sorted(deltas)])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DashboardCounter.key],
+        set_={"value": DashboardCounter.value + stmt.excluded.value},
+    ))
+
+
+def aggregate_dashboard(db: Session) -> dict:
+    """Barcha hisoblagichlarni bitta so‘rovda (shartli agregatlar bilan) hisoblaydi."""
+    student_cols = [func.count(User.id).label(STUDENT_TOTAL)] + [
+        func.coalesce(func.sum(case((User.status == status, 1), else_=0)), 0).label(key)
+        for status, key in STUDENT_STATUS_KEYS.items()
+    ]
+    students = select(*student_cols).where(User.role == UserRole.student).subquery()
+
+    row = db.execute(
+        select(
+            students,
+            select(func.count(Group.id)).scalar_subquery().label(GROUPS_COUNT),
+            select(func.coalesce(func.sum(Payment.amount), 0)).scalar_subquery().label(PAYMENTS_TOTAL),
+        )
+    ).mappings().one()
+    return {key: row[key] for key in DASHBOARD_KEYS}
+
+
+def rebuild_dashboard(db: Session) -> dict:
+    """
+    Hisoblagichlarni qator qulfi ostida qayta hisoblaydi va bitta
+    INSERT ... ON CONFLICT DO UPDATE bilan yozadi. Qulf olingach hisoblangani
+    uchun parallel bump() yo‘qolmaydi: commit bo‘lgani agregatga kiradi,
+    commit bo‘lmagani qulfni kutib, keyin qo‘shiladi.
+    """
+    insert = _UPSERTS[db.get_bind().dialect.name]
+    keys = sorted([*DASHBOARD_KEYS, ROLLUP_BUILT])
+    db.execute(insert(DashboardCounter).values([{"key": k, "value": 0} for k in keys]).on_conflict_do_nothing())
+    db.execute(
+        select(DashboardCounter.key).where(DashboardCounter.key.in_(keys))
+        .order_by(DashboardCounter.key).with_for_update()
+    )
+
+    values = aggregate_dashboard(db)
+    stmt = insert(DashboardCounter).values(
+        [{"key": k, "value": v} for k, v in sorted(values.items())] + [{"key": ROLLUP_BUILT, "value": 1}]
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DashboardCounter.key],
+        set_={"value": stmt.excluded.value},
+    ))
+    db.commit()
+    return values
+
+
+def read_dashboard(db: Session) -> dict:
+    rows = db.query(DashboardCounter.key, DashboardCounter.value).filter(
+        DashboardCounter.key.in_([*DASHBOARD_KEYS, ROLLUP_BUILT])
+    ).all()
+    values = dict(rows)
+    if values.pop(ROLLUP_BUILT, None) is None or len(values) != len(DASHBOARD_KEYS):
+        values = rebuild_dashboard(db)
+    return values
+
+
+def today_payments(db: Session) -> float:
+    # created_at indeksidan oraliq bo‘yicha o‘qiladi (func.date() indeksni ishlatmaydi)
+    start = datetime.combine(datetime.utcnow().date(), time.min)
+    return db.query(func.coalesce(func.sum(Payment.amount), 0)).filter(
+        Payment.created_at >= start
+    ).scalar()
+
+
+# ==============================
+# Oylik to‘lovlar rollup’i
+# ==============================
+
+def add_month_payment(db: Session, student_id: int, month: str, amount: float):
+    """payment_month_totals (student_id, month) qatoriga summani qo‘shadi (upsert)."""
+    insert = _UPSERTS[db.get_bind().dialect.name]
+    stmt = insert(PaymentMonthTotal).values(student_id=student_id, month=month, amount=amount)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PaymentMonthTotal.student_id, PaymentMonthTotal.month],
+        set_={"amount": PaymentMonthTotal.amount + stmt.excluded.amount},
+    ))
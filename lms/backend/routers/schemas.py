@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 from enum import Enum
 from datetime import date
@@ -57,6 +57,37 @@ class UserCreate(BaseModel):
     teacher_id: Optional[int] = None  # optional
 
 
+# ------------------------------
+# Studentlarni CSV/XLSX’dan import qilish
+# ------------------------------
+class StudentImportRow(BaseModel):
+    username: str = Field(min_length=1, max_length=150)
+    password: Optional[str] = None  # bo‘sh bo‘lsa — standart parol
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    subject: Optional[str] = None
+    fee: Optional[float] = None
+    age: Optional[int] = None
+    status: Optional[StudentStatus] = None
+    group_id: Optional[int] = None
+    group: Optional[str] = None  # guruh nomi (group_id o‘rniga)
+
+    class Config:
+        coerce_numbers_to_str = True  # XLSX: telefon / username raqam bo‘lib keladi
+
+
+class ImportRowError(BaseModel):
+    row: int
+    username: Optional[str] = None
+    error: str
+
+
+class StudentImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError] = []
+
 
 class UserResponse(UserBase):
     id: int
@@ -120,7 +151,8 @@ class PaymentBase(BaseModel):
 
 
 class PaymentCreate(PaymentBase):
-    month: Optional[str] = None
+    amount: float = Field(..., gt=0)
+    month: Optional[str] = Field(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$")  # YYYY-MM
 
 
 class PaymentResponse(PaymentBase):
@@ -174,6 +206,7 @@ class TestCreate(BaseModel):
     description: Optional[str]
     group_id: int                    # ✅ test aniq bir guruh uchun
     questions: List[QuestionCreate]
+    duration_minutes: Optional[int] = Field(None, ge=1, le=600)  # imtihon rejimi uchun vaqt
 
 
 class OptionResponse(BaseModel):
@@ -200,6 +233,7 @@ class TestResponse(BaseModel):
     title: str
     description: Optional[str]
     group_id: int
+    duration_minutes: Optional[int] = None
     questions: List[QuestionResponse]
 
     class Config:
@@ -214,6 +248,12 @@ class AnswerItem(BaseModel):
     option_id: int
 class TestSubmit(BaseModel):
     answers: List[AnswerItem]
+    started_at: Optional[datetime] = None  # eski clientlar uchun; server vaqti yoziladi
+
+
+class ExamAnswers(BaseModel):
+    # savol_id -> tanlangan variantlar; [] — javob o‘chirildi
+    answers: Dict[int, List[int]] = {}
 
 
 class TestResultResponse(BaseModel):
@@ -248,4 +288,42 @@ class CourseOut(CourseBase):
     creator_name: str | None = None
 
     class Config:
-        from_attributes = True  # ✅ Pydantic v2 uchun to‘g‘ri variant
\ No newline at end of file
+        from_attributes = True  # ✅ Pydantic v2 uchun to‘g‘ri variant
+
+# ==============================
+# Job schemas
+# ==============================
+class ReportParams(BaseModel):
+    format: Literal["csv", "xlsx"] = "csv"
+
+
+class AttendanceReportParams(ReportParams):
+    month: Optional[int] = Field(None, ge=1, le=12)
+    year: Optional[int] = Field(None, ge=2000, le=2100)
+    group_id: Optional[int] = None
+
+
+class PaymentsExportParams(ReportParams):
+    month: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}$")
+    group_id: Optional[int] = None
+    student_id: Optional[int] = None
+
+
+class TestResultsParams(ReportParams):
+    test_id: Optional[int] = None
+    group_id: Optional[int] = None
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: Optional[dict] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,156 @@
+import csv
+import enum
+import io
+import json
+import tempfile
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+
+from .database import SessionLocal, use_replica
+
+
+# ------------------------------
+# Yordamchi: iterable’ni bo‘laklarga ajratish
+# ------------------------------
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ------------------------------
+# XLSX o‘qish (read-only rejim — xotira fayl hajmiga bog‘liq emas)
+# ------------------------------
+def iter_xlsx_rows(fileobj: BinaryIO) -> Iterator[tuple]:
+    """Birinchi varaqning qatorlarini (qator_raqami, {sarlavha: qiymat}) ko‘rinishida beradi."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [str(h).strip().lower() if h is not None else "" for h in header]
+        for number, values in enumerate(rows, start=2):
+            if all(v is None or str(v).strip() == "" for v in values):
+                continue
+            yield number, dict(zip(keys, values))
+    finally:
+        workbook.close()
+
+
+# ------------------------------
+# CSV o‘qish (oqim bilan; iter_xlsx_rows bilan bir xil ko‘rinishda)
+# ------------------------------
+def iter_csv_rows(fileobj: BinaryIO) -> Iterator[tuple]:
+    """(qator_raqami, {sarlavha: qiymat}); bo‘sh katakchalar None, BOM e'tiborsiz."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        keys = [h.strip().lower() for h in header]
+        for values in reader:
+            if all(v.strip() == "" for v in values):
+                continue
+            yield reader.line_num, {k: (v.strip() or None) for k, v in zip(keys, values)}
+    finally:
+        text.detach()  # UploadFile’ning o‘z fayli yopilmasin
+
+
+# ------------------------------
+# NDJSON o‘qish (har qatorda bitta JSON obyekt, oqim bilan)
+# ------------------------------
+def iter_ndjson_rows(fileobj: BinaryIO) -> Iterator[tuple]:
+    """(qator_raqami, obyekt); bo‘sh qatorlar o‘tkazib yuboriladi, buzilgan qator — ValueError."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig")
+    try:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{number}-qator: {e}") from e
+    finally:
+        text.detach()
+
+
+# ==============================
+# Eksport: CSV / XLSX oqimi (xotira qatorlar soniga bog‘liq emas)
+# ==============================
+EXPORT_BATCH = 1000
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _cell(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def iter_statement(stmt, batch: int = EXPORT_BATCH) -> Iterator[List[tuple]]:
+    """
+    So‘rovni alohida sessiyada server-side kursor (yield_per) bilan o‘qiydi.
+    Sessiya generator ichida ochiladi — javob oqimi tugaguncha yashaydi.
+    Eksport va fon hisobotlari faqat o‘qiydi — replika bo‘lsa o‘shandan.
+    """
+    with SessionLocal() as session:
+        use_replica(session)
+        result = session.execute(stmt.execution_options(yield_per=batch))
+        for rows in result.partitions():
+            yield [tuple(_cell(v) for v in row) for row in rows]
+
+
+def csv_chunks(header: List[str], batches: Iterable[List[tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # Excel kirill harflarini to‘g‘ri ochishi uchun BOM
+    writer.writerow(header)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def xlsx_chunks(header: List[str], batches: Iterable[List[tuple]], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """openpyxl write-only rejimi qatorlarni diskka yozadi; tayyor fayl bo‘lak-bo‘lak uzatiladi."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for rows in batches:
+        for row in rows:
+            sheet.append(row)
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_response(stmt, header: List[str], filename: str, fmt: str) -> StreamingResponse:
+    batches = iter_statement(stmt)
+    body = xlsx_chunks(header, batches) if fmt == "xlsx" else csv_chunks(header, batches)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -1,22 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import os
+import zipfile
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from .dependencies import get_db, get_current_user
-from passlib.context import CryptContext
-from .schemas import UserResponse, UserCreate, UserBase
-from .models import User, UserRole, StudentStatus
+from typing import List, Optional
+from .dependencies import get_db, get_current_user, invalidate_user, replica_reads
+from .schemas import UserResponse, UserCreate, UserBase, StudentImportRow, StudentImportResult
+from .models import User, UserRole, StudentStatus, Group, group_students
+from .pagination import DEFAULT_LIMIT, MAX_LIMIT, PageParams, paginate
+from .rollups import bump, student_deltas
+from .spreadsheets import chunked, export_response, iter_csv_rows, iter_xlsx_rows
+from .cache import catalog_cache, GROUPS_TAG
+from .query_budget import sql_budget
+from .search import build_search_key, search_users
+from .events import broker
+from .utils import hash_password, hasher
 
 students_router = APIRouter(
     prefix="/students",
     tags=["Students"]
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Dashboard SSE obunachilariga (commit’dan keyin)
+def _publish_student(student_id: int, before, after, group_ids, counters: dict):
+    broker.publish(
+        "student", student_id=student_id,
+        before=before.value if before else None, after=after.value if after else None,
+        group_ids=group_ids, counters=counters,
+    )
 
 
 # ✅ Student qo‘shish
 @students_router.post("/", response_model=UserResponse)
-def create_student(
+async def create_student(
     student: UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -24,12 +44,13 @@ def create_student(
     if current_user.role not in [UserRole.admin, UserRole.manager]:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    existing_user = db.query(User).filter(User.username == student.username).first()
+    # DB ishlari threadpool’da, bcrypt — process pool’da (auth.register kabi)
+    existing_user = await to_thread.run_sync(db.query(User).filter(User.username == student.username).first)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
     # 🔥 Parolni hash qilib saqlaymiz
-    hashed_password = pwd_context.hash(student.password or "1234")
+    hashed_password = await hash_password(student.password or "1234")
 
     new_student = User(
         username=student.username,
@@ -46,24 +67,274 @@ def create_student(
         teacher_id=getattr(student, "teacher_id", None)  # optional chaqirish
     )
 
-    db.add(new_student)
-    db.commit()
-    db.refresh(new_student)
+    deltas = student_deltas(after=(new_student.role, new_student.status))
+
+    def save():
+        db.add(new_student)
+        bump(db, deltas)
+        db.commit()
+        db.refresh(new_student)
+        return new_student
+
+    await to_thread.run_sync(save)
+    _publish_student(new_student.id, None, new_student.status, [], deltas)
     return new_student
 
 
-# ✅ Barcha studentlarni olish
-@students_router.get("/", response_model=List[UserResponse])
-def get_students(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+# ------------------------------
+# Studentlarni ommaviy import qilish (CSV / XLSX)
+# ------------------------------
+IMPORT_CHUNK = int(os.getenv("STUDENT_IMPORT_CHUNK", "500"))
+DEFAULT_PASSWORD = "1234"
+# 5000 ta parol BCRYPT_ROUNDS=12 da 4 yadroda ~7 daqiqa oladi, 8 da ~25 soniya.
+# Import qilingan (vaqtinchalik) parollar arzonroq cost bilan saqlanadi —
+# birinchi loginda verify_and_update ularni BCRYPT_ROUNDS bilan qayta hash qiladi.
+IMPORT_BCRYPT_ROUNDS = int(os.getenv("IMPORT_BCRYPT_ROUNDS", "8"))
+
+
+def _validate_chunk(chunk, group_ids: dict, known_groups: set, seen: set, errors: list) -> list:
+    """Qatorlarni tekshiradi; yaroqlilari (qator_raqami, StudentImportRow, group_id)."""
+    valid = []
+    for number, raw in chunk:
+        try:
+            row = StudentImportRow.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            errors.append({"row": number, "username": raw.get("username"), "error": f"{field}: {error['msg']}"})
+            continue
+
+        group_id = row.group_id
+        if row.group:
+            group_id = group_ids.get(row.group.strip().lower())
+        if (row.group or row.group_id) and group_id not in known_groups:
+            errors.append({"row": number, "username": row.username, "error": "Group not found"})
+            continue
+        if row.username in seen:
+            errors.append({"row": number, "username": row.username, "error": "Duplicate username in file"})
+            continue
+        seen.add(row.username)
+        valid.append((number, row, group_id))
+    return valid
+
+
+def _insert_chunk(db: Session, valid: list, hashes: list) -> dict:
+    """Userlar va guruh a’zoliklarini ko‘p qatorli INSERT bilan yozadi; rollup o‘zgarishlarini qaytaradi."""
+    users = []
+    deltas = {}
+    for (number, row, group_id), password in zip(valid, hashes):
+        status = row.status or StudentStatus.studying
+        users.append({
+            "username": row.username,
+            "full_name": row.full_name,
+            "password": password,
+            "phone": row.phone,
+            "address": row.address,
+            "role": UserRole.student,
+            "subject": row.subject,
+            "fee": row.fee,
+            "status": status,
+            "age": row.age,
+            "group_id": group_id,
+            # Core INSERT mapper hodisalarini chetlab o‘tadi
+            "search_key": build_search_key(row.full_name, row.username, row.phone),
+        })
+        for key, value in student_deltas(after=(UserRole.student, status)).items():
+            deltas[key] = deltas.get(key, 0) + value
+
+    ids = db.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), users).all()
+    memberships = [
+        {"group_id": group_id, "student_id": user_id}
+        for user_id, (_, _, group_id) in zip(ids, valid) if group_id
+    ]
+    if memberships:
+        db.execute(insert(group_students), memberships)
+    return deltas
+
+
+def _insert_rows(db: Session, valid: list, hashes: list, errors: list):
+    """
+    Bo‘lak ikkinchi marta ham IntegrityError bersa — qatorlar bittadan
+    SAVEPOINT ichida yoziladi; xato berganlari `errors`ga tushadi. Username
+    bandligi qayta so‘rov bilan aniqlanadi — boshqa cheklovlar (masalan, shu
+    orada o‘chirilgan guruh) o‘z xabari bilan qaytadi.
+    """
+    inserted, deltas = [], {}
+    for item, password in zip(valid, hashes):
+        try:
+            with db.begin_nested():
+                row_deltas = _insert_chunk(db, [item], [password])
+        except IntegrityError as e:
+            number, row, _ = item
+            if db.scalar(select(User.id).where(User.username == row.username)) is not None:
+                error = "Username already exists"
+            else:
+                error = f"Integrity error: {str(e.orig).splitlines()[0]}"
+            errors.append({"row": number, "username": row.username, "error": error})
+            continue
+        inserted.append(item)
+        for key, value in row_deltas.items():
+            deltas[key] = deltas.get(key, 0) + value
+    return inserted, deltas
+
+
+@students_router.post("/import", response_model=StudentImportResult)
+def import_students(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    CSV yoki XLSX (birinchi qator — sarlavha): username, password, full_name, phone,
+    address, subject, fee, age, status, group_id yoki group (nomi).
+    Fayl IMPORT_CHUNK qatorlik bo‘laklarda o‘qiladi; har bir bo‘lak — bitta IN so‘rov,
+    parallel hash va ko‘p qatorli INSERT, so‘ng commit. Xato qatorlar o‘tkazib
+    yuboriladi va javobdagi `errors` ro‘yxatida qaytadi.
+    """
+    if current_user.role not in [UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    filename = (file.filename or "").lower()
+    if filename.endswith(".csv"):
+        rows = iter_csv_rows(file.file)
+    elif filename.endswith(".xlsx"):
+        rows = iter_xlsx_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Faqat .csv yoki .xlsx fayl qabul qilinadi")
+
+    group_ids = {name.strip().lower(): id_ for id_, name in db.execute(select(Group.id, Group.name))}
+    known_groups = set(group_ids.values())
+    seen = set()
+    errors = []
+    created = 0
+    counters = {}
+    imported_groups = set()
+    try:
+        for chunk in chunked(rows, IMPORT_CHUNK):
+            valid = _validate_chunk(chunk, group_ids, known_groups, seen, errors)
+            if not valid:
+                continue
+            hashes = None
+            for attempt in range(2):  # parallel so‘rov shu username’ni band qilsa — qayta tekshiriladi
+                existing = set(db.scalars(
+                    select(User.username).where(User.username.in_([row.username for _, row, _ in valid]))
+                ))
+                for number, row, _ in valid:
+                    if row.username in existing:
+                        errors.append({"row": number, "username": row.username, "error": "Username already exists"})
+                if hashes is None:
+                    valid = [item for item in valid if item[1].username not in existing]
+                    hashes = hasher.hash_many(
+                        [row.password or DEFAULT_PASSWORD for _, row, _ in valid], IMPORT_BCRYPT_ROUNDS
+                    )
+                else:
+                    pairs = [(item, h) for item, h in zip(valid, hashes) if item[1].username not in existing]
+                    valid, hashes = [item for item, _ in pairs], [h for _, h in pairs]
+                if not valid:
+                    break
+                try:
+                    if attempt:
+                        valid, deltas = _insert_rows(db, valid, hashes, errors)
+                    else:
+                        deltas = _insert_chunk(db, valid, hashes)
+                    bump(db, deltas)
+                    db.commit()
+                    created += len(valid)
+                    for key, value in deltas.items():
+                        counters[key] = counters.get(key, 0) + value
+                    imported_groups.update(group_id for _, _, group_id in valid if group_id)
+                    break
+                except IntegrityError:
+                    db.rollback()
+                    if attempt:
+                        raise
+    except (ValueError, csv.Error, zipfile.BadZipFile) as e:  # buzilgan fayl (kodlash, CSV/XLSX formati)
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Faylni o‘qib bo‘lmadi: {e}")
+
+    if created:
+        catalog_cache.invalidate(GROUPS_TAG)  # GroupResponse.student_ids
+        broker.publish("students", created=created, group_ids=sorted(imported_groups), counters=counters)
+    errors.sort(key=lambda e: e["row"])
+    return {"created": created, "failed": len(errors), "errors": errors}
+
+
+def _students_query(db: Session, current_user: User, status, group_id):
     if current_user.role not in [UserRole.admin, UserRole.manager, UserRole.teacher]:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    students = db.query(User).filter(User.role == UserRole.student).all()
-    return students
+    query = db.query(User).filter(User.role == UserRole.student)
+    if status:
+        query = query.filter(User.status == status)
+    if group_id:
+        query = query.filter(User.id.in_(
+            db.query(group_students.c.student_id).filter(group_students.c.group_id == group_id)
+        ))
+    return query
+
+
+# ✅ Barcha studentlarni olish
+@students_router.get("/", response_model=List[UserResponse])
+@sql_budget(3)
+@replica_reads
+def get_students(
+    response: Response,
+    status: Optional[StudentStatus] = Query(None),
+    group_id: Optional[int] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = _students_query(db, current_user, status, group_id)
+    return paginate(query, User, page, response)
+
+
+# ✅ Studentlarni eksport qilish (CSV / XLSX oqim) — /{student_id} dan oldin e'lon qilinadi
+STUDENT_EXPORT_HEADER = ["id", "username", "full_name", "phone", "address", "age", "status", "fee", "subject"]
+
+
+@students_router.get("/export")
+@replica_reads
+def export_students(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    status: Optional[StudentStatus] = Query(None),
+    group_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    stmt = (
+        _students_query(db, current_user, status, group_id)
+        .with_entities(
+            User.id, User.username, User.full_name, User.phone, User.address,
+            User.age, User.status, User.fee, User.subject,
+        )
+        .order_by(User.id)
+        .statement
+    )
+    return export_response(stmt, STUDENT_EXPORT_HEADER, "students", format)
+
+
+# ✅ Studentlarni qidirish (ism, username, telefon) — moslik bo‘yicha saralanadi
+@students_router.get("/search", response_model=List[UserResponse])
+@sql_budget(2)
+@replica_reads
+def search_students(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    status: Optional[StudentStatus] = Query(None),
+    group_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Oldingi javobdagi X-Next-Cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = _students_query(db, current_user, status, group_id)
+    return search_users(db, q, response, limit, cursor, criteria=query.whereclause)
 
 
 # ✅ Bitta studentni olish
 @students_router.get("/{student_id}", response_model=UserResponse)
+@sql_budget(2)
 def get_student(student_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     student = db.query(User).filter(User.id == student_id, User.role == UserRole.student).first()
     if not student:
@@ -91,19 +362,20 @@ def update_student(
         raise HTTPException(status_code=404, detail="Student not found")
 
     update_data = updated.dict(exclude_unset=True)
+    before = (student.role, student.status)
 
-    # 🔒 Agar password kelgan bo‘lsa — hash qilamiz
-    if "password" in update_data and update_data["password"]:
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        update_data["password"] = pwd_context.hash(update_data["password"])
-
+    # UserBase’da parol yo‘q — parol /users/{id} orqali o‘zgaradi (token_version o‘sha yerda oshadi)
     # 🔁 Boshqa fieldlarni yangilaymiz
     for key, value in update_data.items():
         setattr(student, key, value)
 
+    deltas = student_deltas(before=before, after=(student.role, student.status))
+    bump(db, deltas)
     db.commit()
+    invalidate_user(student.id)
     db.refresh(student)
+    if before[1] != student.status or deltas:
+        _publish_student(student.id, before[1], student.status, [g.id for g in student.groups_as_student], deltas)
     return student
 
 
@@ -118,6 +390,12 @@ def delete_student(student_id: int, db: Session = Depends(get_db), current_user:
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    status = student.status
+    deltas = student_deltas(before=(student.role, status))
+    group_ids = [g.id for g in student.groups_as_student]
+    bump(db, deltas)
     db.delete(student)
     db.commit()
+    invalidate_user(student_id)
+    _publish_student(student_id, status, None, group_ids, deltas)
     return {"detail": "Student deleted successfully"}
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .dependencies import get_db
+from .dependencies import get_async_db
 from .dependencies import get_current_user
 from .schemas import GroupResponse
 from .models import User, Group
+from .cache import catalog_cache, GROUPS_TAG
 
 teachers_router = APIRouter(
     prefix="/teacher",
@@ -12,14 +15,25 @@ teachers_router = APIRouter(
 )
 
 
+GROUP_LIST = TypeAdapter(List[GroupResponse])
+
+
 @teachers_router.get("/groups/", response_model=List[GroupResponse])
-def get_teacher_groups(
+async def get_teacher_groups(
+        request: Request,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Faqat teacherlar uchun")
 
-    groups = db.query(Group).join(Group.teachers) \
-        .filter(User.id == current_user.id).all()
-    return groups
+    # Javob har bir teacher uchun alohida — kalitga user id ham kiradi. Guruh
+    # o‘zgarishi boshqa workerda bo‘lgan bo‘lsa, bu yerda CATALOG_CACHE_TTL gacha eski
+    key, cached = catalog_cache.lookup(request, GROUPS_TAG, f"{current_user.role.value}:{current_user.id}")
+    if cached is not None:
+        return cached
+
+    result = await db.execute(
+        select(Group).join(Group.teachers).where(User.id == current_user.id)
+    )
+    return catalog_cache.store(request, key, result.scalars().all(), GROUP_LIST)
@@ -1,17 +1,48 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+import csv
+import json
+import os
+import zipfile
+from typing import Iterator, List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile, File, Query, Response
+from pydantic import ValidationError
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from datetime import datetime,  timezone, timedelta
-from .dependencies import get_db
-from .auth import get_current_user
-from .models import UserRole, Test, User, Question, Option, group_students, StudentAnswer, Group
-from .schemas import TestResponse, TestCreate, TestSubmit
+from datetime import datetime
+from .dependencies import get_db, get_current_user, replica_reads
+from .models import UserRole, Test, User, Question, Option, group_students, StudentAnswer, Group, TestAttempt
+from .schemas import ExamAnswers, TestResponse, TestCreate, TestSubmit, QuestionCreate
+from .spreadsheets import chunked, iter_ndjson_rows, iter_xlsx_rows
+from .pagination import PageParams, paginate
+from .loaders import TEST_DETAIL
+from .query_budget import sql_budget
+from .answer_keys import get_compiled
+from .exams import (
+    SUBMITTED, answer_buffer, collect_answers, get_open_attempt, local_time, seal, start_attempt, utcnow,
+)
 
 
 tests_router = APIRouter(prefix="/tests", tags=["Tests"])
 
 
+QUESTION_CHUNK = 500
+
+
+def _insert_questions(db: Session, test_id: int, questions: List[QuestionCreate]):
+    """Savollar va variantlarni ikkita ko‘p qatorli INSERT bilan yozadi (commit yo‘q)."""
+    question_ids = db.scalars(
+        insert(Question).returning(Question.id, sort_by_parameter_order=True),
+        [{"test_id": test_id, "text": q.text, "type": q.type} for q in questions],
+    ).all()
+
+    options = [
+        {"question_id": question_id, "text": opt.text, "is_correct": int(opt.is_correct or 0)}
+        for question_id, q in zip(question_ids, questions)
+        for opt in q.options
+    ]
+    if options:
+        db.execute(insert(Option), options)
+
+
 # ✅ Test yaratish (Teacher)
 @tests_router.post("/", response_model=TestResponse)
 def create_test(test: TestCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -23,59 +54,166 @@ def create_test(test: TestCreate, db: Session = Depends(get_db), current_user: U
         description=test.description,
         created_by=current_user.id,  # testni kim yaratgan
         group_id=test.group_id,
+        duration_minutes=test.duration_minutes,
         created_at=datetime.utcnow()
     )
     db.add(db_test)
+    db.flush()
+
+    # Butun test daraxti bitta tranzaksiyada
+    for chunk in chunked(test.questions, QUESTION_CHUNK):
+        _insert_questions(db, db_test.id, chunk)
     db.commit()
-    db.refresh(db_test)
 
-    for q in test.questions:
-        db_question = Question(
-            test_id=db_test.id,
-            text=q.text
-        )
-        db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
+    # commit’dan keyin db_test expire bo‘lgan — javob uchun savollar bilan birga qayta o‘qiladi
+    return db.query(Test).options(*TEST_DETAIL).filter(Test.id == db_test.id).one()
+
 
-        for opt in q.options:
-            db_option = Option(
-                question_id=db_question.id,
-                text=opt.text,
-                is_correct=int(opt.is_correct)
+# ------------------------------
+# Savollar bankini import qilish (NDJSON, XLSX yoki JSON)
+# ------------------------------
+# NDJSON va XLSX oqim bilan o‘qiladi. Oddiy JSON butunlay xotiraga yuklanadi,
+# shuning uchun uning hajmi cheklangan — katta banklar .ndjson bilan yuboriladi.
+QUESTION_JSON_MAX_BYTES = int(os.getenv("QUESTION_JSON_MAX_BYTES", str(5 * 1024 * 1024)))
+
+
+def _questions_from_json(fileobj) -> Iterator[tuple]:
+    raw = fileobj.read(QUESTION_JSON_MAX_BYTES + 1)
+    if len(raw) > QUESTION_JSON_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"JSON fayl {QUESTION_JSON_MAX_BYTES // (1024 * 1024)} MB dan katta — .ndjson formatida yuboring",
+        )
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON fayl noto‘g‘ri")
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="JSON savollar ro‘yxati bo‘lishi kerak")
+    for number, item in enumerate(data, start=1):
+        yield number, item
+
+
+def _questions_from_xlsx(fileobj) -> Iterator[tuple]:
+    """
+    Ustunlar: question | type | correct | option_1 | option_2 | ...
+    correct — to‘g‘ri variantlar tartib raqami, masalan "2" yoki "1,3".
+    """
+    for number, row in iter_xlsx_rows(fileobj):
+        option_keys = sorted(
+            (k for k in row if k.startswith("option")),
+            key=lambda k: int("".join(ch for ch in k if ch.isdigit()) or 0),
+        )
+        texts = [row[k] for k in option_keys if row[k] not in (None, "")]
+        try:
+            correct = {
+                int(float(part)) for part in str(row.get("correct") or "").replace(";", ",").split(",")
+                if part.strip()
+            }
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"{number}-qator: correct — variant raqamlari bo‘lishi kerak, masalan \"1,3\""
             )
-            db.add(db_option)
+        yield number, {
+            "text": row.get("question"),
+            "type": row.get("type") or "single",
+            "options": [
+                {"text": str(text), "is_correct": int(i in correct)}
+                for i, text in enumerate(texts, start=1)
+            ],
+        }
+
+
+@tests_router.post("/{test_id}/import")
+def import_questions(
+    test_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    test = db.query(Test).filter(Test.id == test_id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Test topilmadi")
+
+    if current_user.role != UserRole.teacher or test.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Faqat testni yaratgan teacher savol qo‘sha oladi")
+
+    filename = (file.filename or "").lower()
+    if filename.endswith((".ndjson", ".jsonl")):
+        rows = iter_ndjson_rows(file.file)
+    elif filename.endswith(".json"):
+        rows = _questions_from_json(file.file)
+    elif filename.endswith(".xlsx"):
+        rows = _questions_from_xlsx(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Faqat .ndjson, .json yoki .xlsx fayl qabul qilinadi")
+
+    def validated():
+        for number, item in rows:
+            try:
+                yield QuestionCreate.model_validate(item)
+            except ValidationError as e:
+                raise HTTPException(status_code=400, detail=f"{number}-qator: {e.errors()[0]['msg']}")
+
+    # Fayl bo‘lak-bo‘lak o‘qiladi va yoziladi; xato bo‘lsa hammasi bekor qilinadi
+    imported = 0
+    try:
+        for chunk in chunked(validated(), QUESTION_CHUNK):
+            _insert_questions(db, test_id, chunk)
+            imported += len(chunk)
+        # Kompilyatsiya qilingan javob kaliti eskiradi
+        test.version = Test.version + 1
         db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except (ValueError, csv.Error, zipfile.BadZipFile) as e:  # buzilgan fayl (kodlash, XLSX formati)
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Faylni o‘qib bo‘lmadi: {e}")
 
-    return db_test
+    return {"test_id": test_id, "imported": imported}
 
 
 # ✅ Testlarni olish (Teacher yoki Student)
 @tests_router.get("/", response_model=List[TestResponse])
-def get_my_tests(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@sql_budget(6)
+def get_my_tests(
+    response: Response,
+    group_id: Optional[int] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role == UserRole.student:
         group_ids = [g.id for g in current_user.groups_as_student]
     elif current_user.role == UserRole.teacher:
         group_ids = [g.id for g in current_user.groups_as_teacher]
     elif current_user.role in [UserRole.admin, UserRole.manager]:
-        return db.query(Test).all()
+        group_ids = None
     else:
         return []
 
-    if not group_ids:
-        return []
-    tests = db.query(Test).filter(Test.group_id.in_(group_ids)).all()
-    return tests
+    query = db.query(Test).options(*TEST_DETAIL)
+    if group_ids is not None:
+        if not group_ids:
+            return []
+        query = query.filter(Test.group_id.in_(group_ids))
+    if group_id:
+        query = query.filter(Test.group_id == group_id)
+    return paginate(query, Test, page, response)
 
 
 # ✅ Testni ID orqali olish (Student yechishi uchun)
 @tests_router.get("/{test_id}", response_model=TestResponse)
+@sql_budget(5)
 def get_test(
     test_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    test = db.query(Test).filter(Test.id == test_id).first()
+    test = db.query(Test.id, Test.group_id, Test.version).filter(Test.id == test_id).first()
     if not test:
         raise HTTPException(status_code=404, detail="Test topilmadi")
 
@@ -91,7 +229,8 @@ def get_test(
         if test.group_id not in student_group_ids:
             raise HTTPException(status_code=403, detail="Siz bu testni ko‘ra olmaysiz")
 
-    return test
+    # Oldindan serializatsiya qilingan TestResponse
+    return Response(content=get_compiled(db, test.id, test.version).payload, media_type="application/json")
 
 
 # ✅ Testni javobini yuborish (Student)
@@ -102,41 +241,143 @@ def submit_test(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    test = db.query(Test).filter(Test.id == test_id).first()
+    test = db.query(Test.id, Test.version).filter(Test.id == test_id).first()
     if not test:
         raise HTTPException(status_code=404, detail="Test topilmadi")
 
     if current_user.role != UserRole.student:
         raise HTTPException(status_code=403, detail="Faqat studentlar test topshira oladi")
 
-    tashkent_time = datetime.now(timezone(timedelta(hours=5)))
-
-    score = 0
-    for ans in answers.answers:
-        option = db.query(Option).filter(Option.id == ans.option_id).first()
-        if option and option.is_correct:
-            score += 1
+    # Client yuborgan started_at e'tiborsiz: bu yo‘lda urinish bitta so‘rovda boshlanib tugaydi
+    now = utcnow()
+
+    # Baholash kompilyatsiya qilingan kalit bo‘yicha xotirada (bitmap)
+    compiled = get_compiled(db, test.id, test.version)
+    selected = compiled.selected_pairs((ans.question_id, ans.option_id) for ans in answers.answers)
+    score = compiled.grade(selected)
+
+    # Urinish va javoblar bitta tranzaksiyada yoziladi
+    attempt = TestAttempt(
+        student_id=current_user.id,
+        test_id=test_id,
+        started_at=now,
+        submitted_at=now,
+        score=score,
+        total=compiled.total,
+    )
+    db.add(attempt)
+    db.flush()
 
-        db_answer = StudentAnswer(
+    db.add_all(
+        StudentAnswer(
             student_id=current_user.id,
-            question_id=ans.question_id,
-            selected_option_id=ans.option_id,
-            submitted_at=tashkent_time  # ✅ Toshkent vaqti
+            question_id=question_id,
+            selected_option_id=option_id,
+            attempt_id=attempt.id,
+            submitted_at=now
         )
-        db.add(db_answer)
+        for question_id, option_id in selected
+    )
+    db.commit()
+
+    return {
+        "student_name": current_user.full_name,
+        "score": attempt.score,
+        "total": attempt.total,
+        "submitted_at": local_time(now)
+    }
+
+
+# ------------------------------
+# Imtihon rejimi: start -> avtosaqlash (PATCH) -> yakunlash
+# ------------------------------
+@tests_router.post("/{test_id}/start")
+def start_exam(
+    test_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ochiq urinishni (saqlangan javoblari bilan) qaytaradi yoki yangisini boshlaydi."""
+    if current_user.role != UserRole.student:
+        raise HTTPException(status_code=403, detail="Faqat studentlar test topshira oladi")
+
+    test = db.query(Test.id, Test.group_id, Test.version, Test.duration_minutes).filter(Test.id == test_id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Test topilmadi")
+
+    member = db.query(group_students.c.group_id).filter(
+        group_students.c.student_id == current_user.id, group_students.c.group_id == test.group_id
+    ).first()
+    if member is None:
+        raise HTTPException(status_code=403, detail="Siz bu testni ko‘ra olmaysiz")
+
+    attempt, answers = start_attempt(db, current_user.id, test)
+    return attempt.payload(answers)
+
 
+@tests_router.patch("/attempts/{attempt_id}")
+@sql_budget(3)  # sovuq holatda: urinish + javob kaliti; issiq holatda 0
+def autosave_answers(
+    attempt_id: int,
+    body: ExamAnswers,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Javoblar bufferga yoziladi (DB’ga fon task’i partiyalab yozadi)."""
+    attempt = get_open_attempt(db, attempt_id)
+    if attempt.student_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Bu sizning urinishingiz emas")
+    if attempt.expired():
+        raise HTTPException(status_code=409, detail="Imtihon vaqti tugagan")
+
+    compiled = get_compiled(db, attempt.test_id, attempt.version)
+    unknown = [question_id for question_id in body.answers if question_id not in compiled.correct_masks]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Testda bunday savol yo‘q: {unknown[0]}")
+
+    answer_buffer.put(attempt.id, {q: sorted(set(options)) for q, options in body.answers.items()})
+    return {"saved": len(body.answers), "seconds_left": attempt.seconds_left()}
+
+
+@tests_router.post("/attempts/{attempt_id}/submit")
+def submit_exam(
+    attempt_id: int,
+    body: Optional[ExamAnswers] = Body(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Urinishni muhrlaydi: saqlangan javoblar + body’dagi oxirgi javoblar baholanadi.
+    Muddat (grace bilan) o‘tgan bo‘lsa body e'tiborsiz, faqat saqlanganlari hisoblanadi.
+    """
+    attempt = get_open_attempt(db, attempt_id)
+    if attempt.student_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Bu sizning urinishingiz emas")
+
+    late = attempt.expired()
+    answers = collect_answers(db, attempt.id)
+    if body is not None and not late:
+        answers.update(body.answers)
+
+    result = seal(db, attempt, answers)
+    if result is None:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Urinish allaqachon yakunlangan")
     db.commit()
 
-    total = db.query(Question).filter(Question.test_id == test_id).count()
+    score, total, submitted_at = result
     return {
         "student_name": current_user.full_name,
         "score": score,
         "total": total,
-        "submitted_at": tashkent_time.strftime("%Y-%m-%d %H:%M:%S")
+        "submitted_at": local_time(submitted_at),
+        "late": late,
     }
 
 
 @tests_router.get("/{test_id}/results")
+@sql_budget(3)
+@replica_reads
 def get_test_results(
     test_id: int,
     db: Session = Depends(get_db),
@@ -151,65 +392,33 @@ def get_test_results(
     if current_user.role != UserRole.teacher or test.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Siz bu testning natijalarini ko‘ra olmaysiz")
 
-    # 3️⃣ Testdagi savollar soni
-    total_questions = db.query(Question).filter(Question.test_id == test_id).count()
+    # 3️⃣ Studentning guruhi (har bir urinish uchun alohida so‘rov emas)
+    group_name = (
+        select(Group.name)
+        .join(group_students, group_students.c.group_id == Group.id)
+        .where(group_students.c.student_id == TestAttempt.student_id)
+        .limit(1)
+        .scalar_subquery()
+    )
 
-    # 4️⃣ Studentlarning barcha urinishlarini olish
+    # 4️⃣ Saqlangan urinishlar — javoblarni qayta baholash shart emas
     attempts = (
-        db.query(
-            StudentAnswer.student_id,
-            User.full_name,
-            func.date_trunc('second', StudentAnswer.submitted_at).label("attempt_time")
-        )
-        .join(User, User.id == StudentAnswer.student_id)
-        .filter(
-            StudentAnswer.question_id.in_(
-                db.query(Question.id).filter(Question.test_id == test_id)
-            )
-        )
-        .distinct(StudentAnswer.student_id, func.date_trunc('second', StudentAnswer.submitted_at))
+        db.query(TestAttempt, User.full_name, group_name.label("group_name"))
+        .join(User, User.id == TestAttempt.student_id)
+        .filter(TestAttempt.test_id == test_id, TestAttempt.status == SUBMITTED)
+        .order_by(TestAttempt.submitted_at.asc())
         .all()
     )
 
-    output = []
-
-    for attempt in attempts:
-        # Har bir studentning aynan shu urinishdagi javoblarini olish
-        student_answers = (
-            db.query(StudentAnswer)
-            .filter(
-                StudentAnswer.student_id == attempt.student_id,
-                StudentAnswer.question_id.in_(
-                    db.query(Question.id).filter(Question.test_id == test_id)
-                ),
-                func.date_trunc('second', StudentAnswer.submitted_at) == attempt.attempt_time
-            )
-            .all()
-        )
-
-        # To‘g‘ri javoblarni hisoblash
-        correct = 0
-        for ans in student_answers:
-            option = db.query(Option).filter(Option.id == ans.selected_option_id).first()
-            if option and option.is_correct:
-                correct += 1
-
-        # Studentning guruhi
-        group_info = (
-            db.query(Group.name)
-            .join(group_students, group_students.c.group_id == Group.id)
-            .filter(group_students.c.student_id == attempt.student_id)
-            .first()
-        )
-        group_name = group_info[0] if group_info else None
-
-        output.append({
-            "student_name": attempt.full_name,
-            "group_name": group_name,
-            "score": correct,
-            "total": total_questions,
-            "submitted_at": attempt.attempt_time.strftime("%Y-%m-%d %H:%M:%S")
-        })
+    output = [
+        {
+            "student_name": full_name,
+            "group_name": group,
+            "score": attempt.score,
+            "total": attempt.total,
+            "submitted_at": local_time(attempt.submitted_at)
+        }
+        for attempt, full_name, group in attempts
+    ]
 
     return {"test_name": test.title, "results": output}
-
@@ -1,30 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
-from passlib.context import CryptContext
-from .dependencies import get_db, get_current_user
+from typing import List, Optional
+from .dependencies import get_db, get_current_user, invalidate_user, replica_reads
 from .schemas import UserResponse, RoleEnum, UserUpdate
-from .models import User, UserRole
+from .models import User, UserRole, StudentStatus
+from .rollups import bump, student_deltas
+from .utils import hash_password
+from .pagination import DEFAULT_LIMIT, MAX_LIMIT, PageParams, paginate
+from .query_budget import sql_budget
+from .search import search_users
 
 users_router = APIRouter(prefix="/users", tags=["Users"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # ------------------------------
 # GET All Users
 # ------------------------------
 @users_router.get("/", response_model=List[UserResponse])
-def get_users(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@sql_budget(3)
+@replica_reads
+def get_users(
+    response: Response,
+    role: Optional[UserRole] = Query(None),
+    status: Optional[StudentStatus] = Query(None),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role in [UserRole.admin, UserRole.manager]:
-        return db.query(User).all()
+        query = db.query(User)
+        if role:
+            query = query.filter(User.role == role)
+        if status:
+            query = query.filter(User.status == status)
+        return paginate(query, User, page, response)
     return [current_user]
 
 
+# ------------------------------
+# SEARCH Users (ism, username, telefon)
+# ------------------------------
+@users_router.get("/search", response_model=List[UserResponse])
+@sql_budget(2)
+@replica_reads
+def search_all_users(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    role: Optional[UserRole] = Query(None),
+    cursor: Optional[str] = Query(None, description="Oldingi javobdagi X-Next-Cursor"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in [UserRole.admin, UserRole.manager]:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return search_users(db, q, response, limit, cursor, criteria=User.role == role if role else None)
+
+
 # ------------------------------
 # CREATE User
 # ------------------------------
 @users_router.post("/", response_model=UserResponse)
-def create_user(
+async def create_user(
     username: str = Body(...),
     password: str = Body(...),
     role: RoleEnum = Body(RoleEnum.student),
@@ -35,16 +72,23 @@ def create_user(
     if current_user.role not in [UserRole.admin, UserRole.manager]:
         raise HTTPException(status_code=403, detail="Foydalanuvchi yaratish uchun ruxsat yo‘q")
 
-    if db.query(User).filter(User.username == username).first():
+    if await to_thread.run_sync(db.query(User).filter(User.username == username).first):
         raise HTTPException(status_code=400, detail="Bu foydalanuvchi nomi band")
 
-    hashed_pw = pwd_context.hash(password)
-    new_user = User(username=username, password=hashed_pw, role=UserRole(role), full_name=full_name)
+    hashed_pw = await hash_password(password)
+    new_user = User(
+        username=username, password=hashed_pw, role=UserRole(role), full_name=full_name,
+        status=StudentStatus.interested,
+    )
+
+    def save():
+        db.add(new_user)
+        bump(db, student_deltas(after=(new_user.role, new_user.status)))
+        db.commit()
+        db.refresh(new_user)
+        return new_user
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    return await to_thread.run_sync(save)
 
 
 # ------------------------------
@@ -59,13 +103,13 @@ def get_my_profile(current_user: User = Depends(get_current_user)):
 # UPDATE User
 # ------------------------------
 @users_router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await to_thread.run_sync(db.query(User).filter(User.id == user_id).first)
     if not user:
         raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
 
@@ -74,14 +118,19 @@ def update_user(
 
     data = user_update.dict(exclude_unset=True)
     if "password" in data:
-        data["password"] = pwd_context.hash(data["password"])
+        data["password"] = await hash_password(data["password"])
+        user.token_version = User.token_version + 1  # SQL’da — keshdagi snapshot eskirgan bo‘lishi mumkin
 
     for key, val in data.items():
         setattr(user, key, val)
 
-    db.commit()
-    db.refresh(user)
-    return user
+    def save():
+        db.commit()
+        invalidate_user(user_id)
+        db.refresh(user)
+        return user
+
+    return await to_thread.run_sync(save)
 
 
 # ------------------------------
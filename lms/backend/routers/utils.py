@@ -1,9 +1,137 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import List, Optional
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# ------------------------------
+# Sozlamalar
+# ------------------------------
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
 
-def verify_password(plain, hashed):
-    return pwd_context.verify(plain, hashed)
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+pwd_context = _context(BCRYPT_ROUNDS)
+
+
+# Process pool ichida bajariladigan funksiyalar (pickle qilinishi uchun modul darajasida)
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(plain: str, hashed: str, rounds: int):
+    return _context(rounds).verify_and_update(plain, hashed)
+
+
+# ==============================
+# Bcrypt uchun alohida process pool
+# ==============================
+class PasswordHasher:
+    """
+    Bcrypt hisoblashlarini API threadpool’idan alohida, cheklangan process
+    poolga chiqaradi. Endpointlar `await` bilan kutadi — hech qanday thread
+    band bo‘lmaydi. Bir vaqtda `workers + queue_limit` tadan ortiq so‘rov
+    kelsa, ortiqchasi kutmasdan 503 oladi (backpressure).
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Navbat o‘rnini egallagan so‘rovlar (hash_many — bitta)."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Worker bo‘shashini kutayotgan so‘rovlar soni."""
+        return max(0, self._in_flight - self.workers)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Pool birinchi murojaatda yaratiladi (import vaqtida emas)
+        with self._lock:
+            if self._executor is None:
+                # fork ishlayotgan server holatini (socket, thread, lock) nusxalaydi
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _acquire(self, blocking: bool):
+        if not self._slots.acquire(blocking=blocking):
+            raise HTTPException(
+                status_code=503, detail="Server band, birozdan so‘ng qayta urinib ko‘ring",
+                headers={"Retry-After": "1"},
+            )
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def _run(self, fn, *args):
+        self._acquire(blocking=False)
+        try:
+            return await asyncio.wrap_future(self._pool().submit(fn, *args))
+        finally:
+            self._release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, plain: str, hashed: str):
+        """(to‘g‘rimi, yangi_hash) — bcrypt cost o‘zgargan bo‘lsa yangi_hash qaytadi."""
+        return await self._run(_verify_and_update, plain, hashed, self.rounds)
+
+    def hash_many(self, passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+        """
+        Ko‘p parolni pool’ning barcha workerlarida parallel hash qiladi (tartib
+        saqlanadi). Sinxron — import threadida chaqiriladi va navbat to‘lsa
+        503 o‘rniga o‘rin bo‘shashini kutadi. Bitta navbat o‘rnini egallaydi;
+        chaqiruvchi ro‘yxatni bo‘laklab bersa, login so‘rovlari bo‘laklar
+        orasida navbatga kira oladi.
+        """
+        if not passwords:
+            return []
+        rounds = rounds or self.rounds
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        self._acquire(blocking=True)
+        try:
+            return list(self._pool().map(_hash, passwords, repeat(rounds), chunksize=chunksize))
+        finally:
+            self._release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hasher = PasswordHasher()
+
+
+async def hash_password(password: str):
+    return await hasher.hash(password)
+
+async def verify_and_update(plain, hashed):
+    return await hasher.verify_and_update(plain, hashed)
@@ -0,0 +1,109 @@
+"""
+Testlar vaqtinchalik SQLite bazada ishlaydi; SQL budjeti qat'iy rejimda.
+
+    cd lms/backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+# Ilova modullari import qilinishidan oldin o‘rnatiladi
+_tmp = tempfile.mkdtemp(prefix="lms_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["SQL_BUDGET_STRICT"] = "1"
+os.environ["JOB_RESULTS_DIR"] = os.path.join(_tmp, "job_results")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    from migrate import upgrade_head
+    from main import app
+
+    upgrade_head()
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    # Lifespan (job runner, autosave) ishga tushirilmaydi
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def seed(app):
+    """Har bir budjetli endpoint ro‘yxati bo‘sh bo‘lmasligi uchun ma'lumot."""
+    from routers.database import SessionLocal
+    from routers.models import (
+        Course, Group, Option, Payment, Question, StudentStatus, Test, TestAttempt, User, UserRole,
+    )
+
+    with SessionLocal() as db:
+        admin = User(username="admin", password="x", role=UserRole.admin, full_name="Admin")
+        teacher = User(username="teacher", password="x", role=UserRole.teacher, full_name="Teacher")
+        db.add_all([admin, teacher])
+        db.flush()
+
+        course = Course(
+            title="Math", subject="math", description="Algebra", teacher_name="Teacher",
+            created_by=admin.id, teacher_id=teacher.id,
+        )
+        db.add(course)
+        db.flush()
+        groups = [Group(name=f"Group {i}", course_id=course.id) for i in range(3)]
+        db.add_all(groups)
+        db.flush()
+
+        students = []
+        for i in range(12):
+            student = User(
+                username=f"student{i}", password="x", role=UserRole.student, full_name=f"Student {i}",
+                phone=f"+99890000{i:04d}", fee=500_000, status=StudentStatus.studying,
+            )
+            group = groups[i % len(groups)]
+            student.groups_as_student.append(group)
+            students.append(student)
+        db.add_all(students)
+        for group in groups:
+            group.teachers.append(teacher)
+        db.flush()
+
+        tests = []
+        for group in groups:
+            test = Test(title=f"{group.name} test", created_by=teacher.id, group_id=group.id)
+            for q in range(3):
+                question = Question(text=f"Q{q}", type="single")
+                question.options = [Option(text=f"O{o}", is_correct=int(o == 0)) for o in range(3)]
+                test.questions.append(question)
+            tests.append(test)
+        db.add_all(tests)
+        db.flush()
+
+        for student in students:
+            group = student.groups_as_student[0]
+            db.add(Payment(amount=500_000, student_id=student.id, teacher_id=teacher.id, group_id=group.id, month="2026-10"))
+            test = next(t for t in tests if t.group_id == group.id)
+            db.add(TestAttempt(student_id=student.id, test_id=test.id, score=2, total=3))
+        db.commit()
+
+        return {
+            "admin": admin.id,
+            "teacher": teacher.id,
+            "student": students[0].id,
+            "group": students[0].groups_as_student[0].id,
+            "test": next(t.id for t in tests if t.group_id == students[0].groups_as_student[0].id),
+        }
+
+
+@pytest.fixture(scope="session")
+def auth(seed):
+    from routers.auth import create_access_token
+
+    def headers(role: str) -> dict:
+        token = create_access_token({"sub": str(seed[role]), "ver": 0})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
@@ -0,0 +1,52 @@
+import json
+
+from routers import answer_keys
+from routers.answer_keys import get_compiled
+from routers.database import SessionLocal
+from routers.models import Option, Question, Test
+
+
+def _test(seed) -> int:
+    """Birinchi savolda ikkita to‘g‘ri variant, ikkinchisida bitta."""
+    with SessionLocal() as db:
+        test = Test(title="Keys", created_by=seed["teacher"], group_id=seed["group"])
+        for correct in ([1, 1, 0], [0, 1]):
+            question = Question(text=f"{len(correct)} variant", type="multiple")
+            question.options = [Option(text=f"O{i}", is_correct=c) for i, c in enumerate(correct)]
+            test.questions.append(question)
+        db.add(test)
+        db.commit()
+        return test.id
+
+
+def test_compiled_key_grades_exact_selection(seed):
+    test_id = _test(seed)
+    with SessionLocal() as db:
+        key = get_compiled(db, test_id, 1)
+    (q1, q2) = key.question_ids
+    o = {question_id: [option_id for option_id, (q, _) in key.option_slots.items() if q == question_id]
+         for question_id in key.question_ids}
+
+    assert key.total == 2
+    assert key.grade([(q1, o[q1][0]), (q1, o[q1][1]), (q2, o[q2][1])]) == 2
+    assert key.grade([(q1, o[q1][0]), (q2, o[q2][1]), (q2, o[q2][0])]) == 0  # q1 to‘liq emas, q2 ortiqcha
+    assert key.grade([(q2, o[q1][0]), (q2, o[q2][1])]) == 1  # boshqa savolning varianti e'tiborsiz
+    assert key.selected_pairs([(q2, o[q2][1]), (q2, o[q2][1]), (q1, o[q2][0])]) == [(q2, o[q2][1])]
+
+
+def test_question_import_bumps_version_and_recompiles(client, seed, auth):
+    test_id = _test(seed)
+    assert len(client.get(f"/tests/{test_id}", headers=auth("teacher")).json()["questions"]) == 2
+    old = answer_keys._compiled.get((test_id, 1))
+
+    line = json.dumps({"text": "Yangi", "options": [{"text": "A", "is_correct": 1}]})
+    imported = client.post(
+        f"/tests/{test_id}/import", files={"file": ("bank.ndjson", line.encode())}, headers=auth("teacher"),
+    )
+    assert imported.status_code == 200, imported.text
+
+    assert len(client.get(f"/tests/{test_id}", headers=auth("teacher")).json()["questions"]) == 3
+    new = answer_keys._compiled.get((test_id, 2))
+    assert (old.total, new.total) == (2, 3)
+    with SessionLocal() as db:
+        assert db.get(Test, test_id).version == 2
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from routers.database import SessionLocal
+from routers.models import Attendance, Group
+
+
+def _group(name: str) -> tuple:
+    """(group_id, {student_id: full_name})"""
+    with SessionLocal() as db:
+        group = db.query(Group).filter(Group.name == name).one()
+        return group.id, {s.id: s.full_name for s in group.students}
+
+
+def test_report_grid_covers_whole_month_only(client, auth, seed):
+    group_id, students = _group("Group 2")
+    present, absent = list(students)[:2]
+    with SessionLocal() as db:
+        db.add_all([
+            Attendance(student_id=present, teacher_id=seed["teacher"], group_id=group_id,
+                       date=datetime(2025, 3, 3, 9), status="present"),
+            Attendance(student_id=absent, teacher_id=seed["teacher"], group_id=group_id,
+                       date=datetime(2025, 3, 3, 9), status="absent"),
+            Attendance(student_id=present, teacher_id=seed["teacher"], group_id=group_id,
+                       date=datetime(2025, 3, 31, 23), status="present"),
+            Attendance(student_id=present, teacher_id=seed["teacher"], group_id=group_id,
+                       date=datetime(2025, 4, 1, 9), status="present"),
+        ])
+        db.commit()
+
+    response = client.get(f"/attendance/report/{group_id}", params={"month": 3, "year": 2025}, headers=auth("admin"))
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["day_list"] == ["03.03.2025", "31.03.2025"]
+    rows = {row.pop("fullname"): row for row in body["rows"]}
+    assert rows.keys() == set(students.values())
+    assert rows[students[present]] == {"03.03.2025": "Bor", "31.03.2025": "Bor"}
+    assert rows[students[absent]] == {"03.03.2025": "Yo'q", "31.03.2025": "Yo'q"}
+
+
+def test_bulk_insert_keeps_last_record_per_student_and_rejects_repeats(client, auth):
+    group_id, students = _group("Group 1")
+    first, second = list(students)[:2]
+    payload = {
+        "group_id": group_id,
+        "date_": "2025-05-05",
+        "records": [
+            {"student_id": first, "is_present": False},
+            {"student_id": second, "is_present": False},
+            {"student_id": first, "is_present": True},
+        ],
+    }
+
+    response = client.post("/attendance/", json=payload, headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    assert [(row["student_id"], row["status"]) for row in response.json()] == [(first, "present"), (second, "absent")]
+
+    repeat = client.post("/attendance/", json=payload, headers=auth("admin"))
+    assert repeat.status_code == 400
+    assert "already exists" in repeat.json()["detail"]
+
+    stranger = next(iter(_group("Group 0")[1]))
+    outsider = client.post(
+        "/attendance/", json={**payload, "date_": "2025-05-06", "records": [{"student_id": stranger, "is_present": True}]},
+        headers=auth("admin"),
+    )
+    assert outsider.status_code == 400
+    assert str(stranger) in outsider.json()["detail"]
+
+    with SessionLocal() as db:
+        assert db.query(Attendance).filter(Attendance.group_id == group_id, Attendance.date >= datetime(2025, 5, 5)).count() == 2
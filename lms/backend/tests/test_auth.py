@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from anyio import to_thread
+from sqlalchemy import event
+
+from routers.auth import create_access_token
+from routers.database import SessionLocal, engine
+from routers.models import User, UserRole
+from routers.utils import _context, hasher
+
+
+def _user(username: str, password: str = "x") -> int:
+    with SessionLocal() as db:
+        user = User(username=username, password=password, role=UserRole.student, full_name=username)
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def _headers(claims: dict) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(claims)}"}
+
+
+def test_token_without_version_is_revoked_by_password_change(client):
+    user_id = _user("legacy_token")
+    legacy = _headers({"sub": str(user_id)})
+    assert client.get("/auth/me", headers=legacy).status_code == 200
+
+    response = client.put(f"/users/{user_id}", json={"password": "new-secret"}, headers=legacy)
+
+    assert response.status_code == 200, response.text
+    assert client.get("/auth/me", headers=legacy).status_code == 401
+    assert client.get("/auth/me", headers=_headers({"sub": str(user_id), "ver": 1})).status_code == 200
+
+
+def test_password_change_bumps_version_in_sql(client):
+    """Keshdagi snapshot eskirgan bo‘lsa ham versiya bazadagi qiymatdan oshiriladi."""
+    user_id = _user("stale_snapshot")
+    token = _headers({"sub": str(user_id), "ver": 0})
+    assert client.get("/auth/me", headers=token).status_code == 200  # snapshot keshga tushadi
+    with SessionLocal() as db:
+        db.get(User, user_id).token_version = 5
+        db.commit()
+
+    response = client.put(f"/users/{user_id}", json={"password": "new-secret"}, headers=token)
+
+    assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        assert db.get(User, user_id).token_version == 6
+
+
+def test_logins_waiting_for_bcrypt_do_not_block_other_requests(app, monkeypatch):
+    """Login’lar bcrypt’ni kutayotganda boshqa so‘rovlar javob oladi; SQL event loop threadida bajarilmaydi."""
+    password = _context(4).hash("pw")
+    for i in range(8):
+        _user(f"burst{i}", password)
+    me = _headers({"sub": str(_user("bystander")), "ver": 0})
+
+    async def slow_run(fn, *args):  # process pool o‘rniga: loop’dan tashqarida 1 s
+        await to_thread.run_sync(time.sleep, 1.0)
+        return fn(*args)
+
+    monkeypatch.setattr(hasher, "_run", slow_run)
+    sql_threads = set()
+
+    def record_thread(*_):
+        sql_threads.add(threading.get_ident())
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            logins = [
+                asyncio.create_task(http.post("/auth/login", json={"username": f"burst{i}", "password": "pw"}))
+                for i in range(8)
+            ]
+            await asyncio.sleep(0.1)
+            others = await asyncio.gather(*(http.get("/auth/me", headers=me) for _ in range(5)))
+            still_hashing = sum(not task.done() for task in logins)
+            return threading.get_ident(), others, still_hashing, await asyncio.gather(*logins)
+
+    event.listen(engine, "before_cursor_execute", record_thread)
+    try:
+        loop_thread, others, still_hashing, logins = asyncio.run(burst())
+    finally:
+        event.remove(engine, "before_cursor_execute", record_thread)
+
+    assert [r.status_code for r in others] == [200] * 5
+    assert still_hashing == 8
+    assert [r.status_code for r in logins] == [200] * 8
+    assert sql_threads and loop_thread not in sql_threads
@@ -0,0 +1,45 @@
+import os
+import re
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(module: str, *args) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", module, *args], cwd=BACKEND, capture_output=True, text=True, timeout=300,
+    )
+
+
+def test_generator_fills_a_fresh_database_and_loadtest_runs_against_it(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bench.db'}"
+    sizes = ["--students", "30", "--groups", "3", "--attendance", "200", "--payments", "100",
+             "--tests-per-group", "1", "--questions", "3", "--answers", "60", "--batch", "50"]
+
+    generated = _run("benchmarks.generate", "--database-url", url, *sizes)
+    assert generated.returncode == 0, generated.stderr
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        counts = {
+            table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            for table in ("users", "attendance", "payments", "student_answers", "test_attempts")
+        }
+    engine.dispose()
+    assert counts == {"users": 30 + 1 + 1, "attendance": 200, "payments": 100, "student_answers": 60, "test_attempts": 20}
+
+    again = _run("benchmarks.generate", "--database-url", url, *sizes)
+    assert again.returncode != 0 and "bo‘sh emas" in again.stderr
+
+    loaded = _run(
+        "benchmarks.loadtest", "--in-process", "--database-url", url,
+        "--students", "30", "--sample", "3", "--concurrency", "2", "--duration", "1",
+    )
+    assert loaded.returncode == 0, loaded.stderr
+    assert "concurrency=2" in loaded.stdout
+    errors = re.findall(r"^\s*(\w+)\s+(\d+)\s+(\d+)\s", loaded.stdout, re.MULTILINE)
+    assert {name for name, _, _ in errors} == {"login", "dashboard", "attendance_report", "payments", "test_submit"}
+    assert all(count == "0" for _, _, count in errors), loaded.stdout
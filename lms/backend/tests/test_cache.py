@@ -0,0 +1,18 @@
+def test_catalog_answers_304_until_a_write_invalidates_it(client, seed, auth):
+    first = client.get("/courses/", params={"limit": 500})
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/courses/", params={"limit": 500}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+
+    course = {"title": "Physics", "subject": "physics", "description": "Mechanics", "teacher_id": seed["teacher"]}
+    created = client.post("/courses/", json=course, headers=auth("admin"))
+    assert created.status_code == 200, created.text
+
+    changed = client.get("/courses/", params={"limit": 500}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "Physics" in [course["title"] for course in changed.json()]
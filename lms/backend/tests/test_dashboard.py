@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+from routers.auth import create_access_token
+from routers.database import SessionLocal
+from routers.models import Attendance, Course, Group, StudentStatus, Test, TestAttempt, User, UserRole
+
+
+def _headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id), 'ver': 0})}"}
+
+
+def _at(day: int) -> datetime:
+    return datetime(2026, 10, day, 9, 0, tzinfo=timezone.utc)
+
+
+def test_student_history_keeps_latest_submitted_attempt_per_test(client, seed):
+    with SessionLocal() as db:
+        student = User(username="history_student", password="x", role=UserRole.student, full_name="History")
+        db.add(student)
+        db.flush()
+        other = db.query(Test).filter(Test.title == "Group 1 test").one()
+        db.add_all([
+            TestAttempt(student_id=student.id, test_id=seed["test"], score=1, total=3, submitted_at=_at(1)),
+            TestAttempt(student_id=student.id, test_id=other.id, score=1, total=2, submitted_at=_at(2)),
+            TestAttempt(student_id=student.id, test_id=seed["test"], score=3, total=3, submitted_at=_at(3)),
+            TestAttempt(student_id=student.id, test_id=other.id, status="in_progress", submitted_at=None),
+        ])
+        db.commit()
+        student_id, other_id = student.id, other.id
+
+    response = client.get("/dashboard/stats", headers=_headers(student_id))
+
+    assert response.status_code == 200, response.text
+    tests = response.json()["tests"]
+    assert [(d["test_id"], d["correct"], d["total_questions"], d["score"]) for d in tests["details"]] == [
+        (other_id, 1, 2, 50.0), (seed["test"], 3, 3, 100.0),
+    ]
+    assert (tests["average"], tests["last"]) == (75.0, 100.0)
+
+
+def test_teacher_stats_count_shared_students_once_and_use_latest_attempts(client):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with SessionLocal() as db:
+        teacher = User(username="stats_teacher", password="x", role=UserRole.teacher)
+        shared, graduate, other = (
+            User(username=f"stats_{name}", password="x", role=UserRole.student, status=status)
+            for name, status in (("shared", StudentStatus.studying), ("graduate", StudentStatus.graduated),
+                                 ("other", StudentStatus.studying))
+        )
+        db.add(teacher)
+        db.flush()
+        course = Course(title="Stats", subject="math", description="-", teacher_name="T",
+                        created_by=teacher.id, teacher_id=teacher.id)
+        first, second = Group(name="Stats A", course=course), Group(name="Stats B", course=course)
+        first.teachers.append(teacher)
+        second.teachers.append(teacher)
+        first.students.extend([shared, graduate])
+        second.students.extend([shared, other])
+        test = Test(title="Stats test", group=first)
+        db.add_all([course, first, second, test])
+        db.flush()
+
+        days_ago = {1: "present", 2: "present", 3: "absent", 40: "absent"}  # 40 kun oldingisi oynadan tashqari
+        db.add_all([
+            Attendance(student_id=shared.id, teacher_id=teacher.id, group_id=first.id,
+                       date=now - timedelta(days=days), status=status)
+            for days, status in days_ago.items()
+        ] + [Attendance(student_id=graduate.id, teacher_id=teacher.id, group_id=first.id,
+                        date=now - timedelta(days=1), status="present")])
+        db.add_all([
+            TestAttempt(student_id=shared.id, test_id=test.id, score=0, total=2, submitted_at=_at(1)),
+            TestAttempt(student_id=shared.id, test_id=test.id, score=2, total=2, submitted_at=_at(2)),
+            TestAttempt(student_id=graduate.id, test_id=test.id, score=1, total=2, submitted_at=_at(1)),
+        ])
+        db.commit()
+        teacher_id = teacher.id
+
+    response = client.get("/dashboard/stats", headers=_headers(teacher_id))
+
+    assert response.status_code == 200, response.text
+    stats = response.json()
+    assert (stats["groups"], stats["students_count"], stats["graduated"]) == (2, 3, 1)
+    assert (stats["attendance_rate"], stats["average_score"]) == (75.0, 75.0)
+    assert [(g["name"], g["students"], g["graduated"], g["attendance_rate"], g["average_score"])
+            for g in stats["groups_detail"]] == [("Stats A", 2, 1, 75.0, 75.0), ("Stats B", 2, 0, None, None)]
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from routers import events
+from routers.dashboard import _TeacherGroups
+from routers.events import EventBroker, event_stream
+
+
+def _data(chunk: str) -> dict:
+    return json.loads(next(line for line in chunk.splitlines() if line.startswith("data: "))[len("data: "):])
+
+
+def test_teacher_stream_picks_up_groups_on_refresh(seed, monkeypatch):
+    monkeypatch.setattr(events, "EVENT_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(events, "EVENT_REFRESH_SECONDS", 0)
+
+    async def scenario():
+        accepts = _TeacherGroups(seed["teacher"], set())  # ulanish paytida guruh hali biriktirilmagan
+        stream = event_stream(accepts, accepts.refresh)
+        assert (await anext(stream)).startswith("retry:")
+        assert _data(await anext(stream))["type"] == "ready"
+
+        events.broker.publish("attendance", group_id=seed["group"])
+        assert await anext(stream) == ": ping\n\n"  # eski filtr rad etdi; heartbeat’da yangilandi
+        assert seed["group"] in accepts.group_ids
+
+        events.broker.publish("attendance", group_id=-1)
+        events.broker.publish("student", group_ids=[-1, seed["group"]])
+        delivered = _data(await anext(stream))
+        await stream.aclose()
+        return delivered
+
+    delivered = asyncio.run(scenario())
+
+    assert (delivered["type"], delivered["group_ids"]) == ("student", [-1, seed["group"]])
+    assert events.broker.subscribers == 0
+
+
+def test_overflow_sends_one_resync_and_refreshes_filter(monkeypatch):
+    monkeypatch.setattr(events, "broker", EventBroker(queue_size=2))
+    refreshed = []
+
+    async def scenario():
+        stream = event_stream(lambda event: True, lambda: refreshed.append(True))
+        await anext(stream)
+        await anext(stream)
+        for n in range(3):
+            events.broker.publish("payment", amount=n)
+        await asyncio.sleep(0)  # call_soon_threadsafe dispatch
+        received = [_data(await anext(stream))["type"]]
+        events.broker.publish("payment", amount=3)
+        received.append(_data(await anext(stream))["type"])
+        await stream.aclose()
+        return received
+
+    assert asyncio.run(scenario()) == ["resync", "payment"]
+    assert refreshed == [True]
+
+
+def test_stream_rejects_students(client, auth):
+    response = client.get("/dashboard/stream", headers=auth("student"))
+    assert response.status_code == 403
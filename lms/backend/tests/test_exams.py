@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from routers.database import SessionLocal
+from routers.exams import as_utc, seal_expired
+from routers.models import StudentAnswer, TestAttempt
+
+
+def test_start_returns_utc_deadline_and_expired_attempt_is_sealed(client, seed, auth):
+    response = client.post(f"/tests/{seed['test']}/start", headers=auth("student"))
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    deadline = datetime.fromisoformat(body["deadline_at"].replace("Z", "+00:00"))
+    assert body["deadline_at"].endswith("Z")
+    assert abs((deadline - datetime.now(timezone.utc)).total_seconds() - body["seconds_left"]) < 5
+
+    with SessionLocal() as db:
+        attempt = db.get(TestAttempt, body["attempt_id"])
+        assert abs(as_utc(attempt.started_at) - datetime.now(timezone.utc)) < timedelta(minutes=1)
+        attempt.deadline_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+
+    assert seal_expired() >= 1
+    with SessionLocal() as db:
+        assert db.get(TestAttempt, body["attempt_id"]).status == "submitted"
+
+
+def test_submit_ignores_client_started_at(client, seed, auth):
+    response = client.post(
+        f"/tests/{seed['test']}/submit",
+        json={"answers": [], "started_at": "2001-01-01T00:00:00"},
+        headers=auth("student"),
+    )
+    assert response.status_code == 200, response.text
+
+    with SessionLocal() as db:
+        attempt = db.query(TestAttempt).order_by(TestAttempt.id.desc()).first()
+        assert as_utc(attempt.started_at) == as_utc(attempt.submitted_at)
+        assert abs(as_utc(attempt.started_at) - datetime.now(timezone.utc)) < timedelta(minutes=1)
+
+
+def test_exam_scores_exact_selection_and_stores_each_answer_once(client, seed, auth):
+    test = client.get(f"/tests/{seed['test']}", headers=auth("student")).json()
+    started = client.post(f"/tests/{seed['test']}/start", headers=auth("student")).json()
+    (q1, q2, q3) = test["questions"]
+    options = {q["id"]: [o["id"] for o in q["options"]] for q in test["questions"]}  # birinchisi to‘g‘ri
+
+    response = client.post(f"/tests/attempts/{started['attempt_id']}/submit", json={"answers": {
+        q1["id"]: options[q1["id"]],                              # hammasi belgilangan — ball yo‘q
+        q2["id"]: [options[q2["id"]][0], options[q2["id"]][0]],  # to‘g‘ri, ikki marta yuborilgan
+        q3["id"]: [options[q3["id"]][1]],
+    }}, headers=auth("student"))
+
+    assert response.status_code == 200, response.text
+    assert (response.json()["score"], response.json()["total"]) == (1, 3)
+    with SessionLocal() as db:
+        rows = db.query(StudentAnswer.question_id).filter(StudentAnswer.attempt_id == started["attempt_id"]).all()
+        assert sorted(question_id for (question_id,) in rows) == sorted([q1["id"]] * 3 + [q2["id"], q3["id"]])
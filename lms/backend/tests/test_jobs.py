@@ -0,0 +1,47 @@
+import os
+from datetime import datetime, timedelta
+
+from routers import jobs
+from routers.database import SessionLocal
+from routers.models import Job
+
+
+def _queue(client, auth) -> int:
+    response = client.post("/jobs/test_results", json={"format": "csv"}, headers=auth("admin"))
+    assert response.status_code == 202, response.text
+    return response.json()["id"]
+
+
+def _claim(job_id: int) -> str:
+    claimed = jobs.claim_job()
+    assert claimed is not None and claimed[0] == job_id
+    return claimed[1]
+
+
+def test_job_result_is_downloadable(client, seed, auth):
+    job_id = _queue(client, auth)
+    jobs.run_job(job_id, _claim(job_id))
+
+    assert client.get(f"/jobs/{job_id}", headers=auth("admin")).json()["status"] == jobs.SUCCEEDED
+    result = client.get(f"/jobs/{job_id}/result", headers=auth("admin"))
+    assert result.status_code == 200
+    assert result.content.decode("utf-8-sig").splitlines()[0] == "test,group,student,score,total,percent,submitted_at"
+
+
+def test_reclaimed_job_ignores_the_first_worker(client, seed, auth):
+    job_id = _queue(client, auth)
+    stale_token = _claim(job_id)
+    with SessionLocal() as db:  # birinchi worker JOB_TIMEOUT_SECONDS’dan oshib ketdi
+        db.get(Job, job_id).started_at = datetime.utcnow() - timedelta(seconds=jobs.JOB_TIMEOUT_SECONDS + 1)
+        db.commit()
+    token = _claim(job_id)
+
+    jobs.run_job(job_id, stale_token)
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        assert (job.status, job.result_path, job.claim_token) == (jobs.RUNNING, None, token)
+    assert not [name for name in os.listdir(jobs.JOB_RESULTS_DIR) if name.startswith(f"job_{job_id}.")]
+
+    jobs.run_job(job_id, token)
+    with SessionLocal() as db:
+        assert db.get(Job, job_id).status == jobs.SUCCEEDED
@@ -0,0 +1,75 @@
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from migrate import alembic_config
+from routers import database
+
+
+def _config():
+    config = alembic_config()
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    """Bo‘sh SQLite baza; `upgrade(rev)` migratsiyalarni shu bazaga qo‘llaydi (env.py ilova engine’ini oladi)."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+
+    def upgrade(revision: str):
+        command.upgrade(_config(), revision)
+
+    yield engine, upgrade
+    engine.dispose()
+
+
+def test_0002_backfills_attempts_from_answers(scratch):
+    engine, upgrade = scratch
+    upgrade("0001")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password) VALUES (1, 'old', 'x')"))
+        conn.execute(text("INSERT INTO tests (id, title) VALUES (1, 'Old test')"))
+        conn.execute(text("INSERT INTO questions (id, test_id, text) VALUES (1, 1, 'Q1'), (2, 1, 'Q2'), (3, 1, 'Q3')"))
+        conn.execute(text(
+            "INSERT INTO options (id, question_id, text, is_correct) VALUES "
+            "(1, 1, 'a', 1), (2, 1, 'b', 0), (3, 2, 'a', 1), (4, 2, 'b', 0)"
+        ))
+        # Ikki submit: birinchisida bitta to‘g‘ri, ikkinchisida ikkita to‘g‘ri javob
+        conn.execute(text(
+            "INSERT INTO student_answers (id, student_id, question_id, selected_option_id, submitted_at) VALUES "
+            "(1, 1, 1, 1, '2025-01-01 10:00:00'), (2, 1, 2, 4, '2025-01-01 10:00:00'), "
+            "(3, 1, 1, 1, '2025-02-01 10:00:00'), (4, 1, 2, 3, '2025-02-01 10:00:00')"
+        ))
+
+    upgrade("0002")
+
+    with engine.connect() as conn:
+        attempts = conn.execute(text(
+            "SELECT id, student_id, test_id, score, total, submitted_at FROM test_attempts ORDER BY submitted_at"
+        )).all()
+        links = dict(conn.execute(text("SELECT id, attempt_id FROM student_answers")).all())
+
+    assert [(a.student_id, a.test_id, a.score, a.total) for a in attempts] == [(1, 1, 1, 3), (1, 1, 2, 3)]
+    first, second = (a.id for a in attempts)
+    assert links == {1: first, 2: first, 3: second, 4: second}
+
+
+def test_head_matches_models_and_memberships_get_primary_keys(scratch):
+    engine, upgrade = scratch
+    upgrade("0002")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password) VALUES (1, 's', 'x'), (2, 't', 'x')"))
+        conn.execute(text("INSERT INTO groups (id, name) VALUES (1, 'G')"))
+        conn.execute(text("INSERT INTO group_students (group_id, student_id) VALUES (1, 1), (1, 1), (NULL, 1)"))
+        conn.execute(text("INSERT INTO group_teachers (group_id, teacher_id) VALUES (1, 2), (1, 2)"))
+
+    upgrade("head")
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT group_id, student_id FROM group_students")).all() == [(1, 1)]
+        assert conn.execute(text("SELECT group_id, teacher_id FROM group_teachers")).all() == [(1, 2)]
+        indexes = {row.name for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {"ix_attendance_group_date", "ix_payments_student_id", "ix_users_role_status"} <= indexes
+    command.check(_config())  # modeldan farq bo‘lsa AutoGenerateDiffsDetected
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+from fastapi import Response
+
+from routers.database import SessionLocal
+from routers.models import Payment, User, UserRole
+from routers.pagination import NEXT_CURSOR_HEADER, PageParams, paginate
+
+
+@pytest.fixture(scope="module")
+def payments(app):
+    """(student_id, to‘lov id’lari): bir qismi created_at’siz (eski qatorlar), ikkitasi bir xil vaqtda."""
+    stamps = [None, datetime(2026, 1, 2), None, datetime(2026, 1, 1), datetime(2026, 1, 2), None, datetime(2026, 1, 3)]
+    with SessionLocal() as db:
+        student = User(username="paged_student", password="x", role=UserRole.student)
+        db.add(student)
+        db.flush()
+        rows = [Payment(amount=10, student_id=student.id, month="2026-01") for _ in stamps]
+        db.add_all(rows)
+        db.flush()
+        for row, stamp in zip(rows, stamps):
+            row.created_at = stamp
+        db.commit()
+        yield student.id, [row.id for row in rows]
+
+        # boshqa testlardagi /payments/ javob sxemasi created_at’ni talab qiladi
+        for row in rows:
+            db.delete(row)
+        db.delete(student)
+        db.commit()
+
+
+@pytest.mark.parametrize("sort", ["created_at", "-created_at", "id", "-id"])
+def test_keyset_pages_cover_rows_with_null_created_at(payments, sort):
+    student_id, payment_ids = payments
+    seen, cursor = [], None
+    with SessionLocal() as db:
+        while True:
+            response = Response()
+            page = PageParams(cursor=cursor, limit=2, sort=sort)
+            query = db.query(Payment).filter(Payment.student_id == student_id)
+            seen += [payment.id for payment in paginate(query, Payment, page, response)]
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if not cursor:
+                break
+
+    assert sorted(seen) == sorted(payment_ids)
+    assert len(seen) == len(set(seen))
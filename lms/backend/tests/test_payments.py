@@ -0,0 +1,77 @@
+from routers.database import SessionLocal
+from routers.models import StudentStatus, User, UserRole
+
+
+def _student(username: str, status: StudentStatus) -> int:
+    with SessionLocal() as db:
+        user = User(username=username, password="x", role=UserRole.student, full_name=username, fee=100, status=status)
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def _ledger(client, auth, student_id: int):
+    response = client.get("/payments/ledger", params={"from_month": "2026-01", "to_month": "2026-04", "limit": 500},
+                          headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    return next((s for s in response.json() if s["student_id"] == student_id), None)
+
+
+def _pay(client, auth, student_id: int, month: str, amount: float = 100):
+    return client.post("/payments/", json={"amount": amount, "student_id": student_id, "month": month},
+                       headers=auth("admin"))
+
+
+def test_ledger_skips_non_studying_student_without_payments(client, auth):
+    student_id = _student("ledger_left", StudentStatus.left)
+
+    assert _ledger(client, auth, student_id) is None
+
+
+def test_ledger_charges_studying_student_to_current_month(client, auth):
+    student_id = _student("ledger_studying", StudentStatus.studying)
+    assert _pay(client, auth, student_id, "2026-02").status_code == 200
+
+    ledger = _ledger(client, auth, student_id)
+
+    assert [m["expected"] for m in ledger["months"]] == [100, 100, 100]
+    assert ledger["balance"] == -200
+
+
+def test_ledger_stops_charging_after_last_payment_of_left_student(client, auth):
+    student_id = _student("ledger_graduated", StudentStatus.graduated)
+    assert _pay(client, auth, student_id, "2026-01").status_code == 200
+    assert _pay(client, auth, student_id, "2026-02", 50).status_code == 200
+
+    ledger = _ledger(client, auth, student_id)
+
+    assert [m["expected"] for m in ledger["months"]] == [100, 100, 0, 0]
+    assert ledger["balance"] == -50
+
+
+def test_create_payment_rejects_malformed_month(client, auth):
+    student_id = _student("payment_month", StudentStatus.studying)
+
+    for month in ("2026-13", "2026/01", "26-01", "2026-1"):
+        assert _pay(client, auth, student_id, month).status_code == 422, month
+
+
+def test_ledger_rejects_range_longer_than_cap(client, auth):
+    def ledger(from_month):
+        return client.get("/payments/ledger", params={"from_month": from_month, "to_month": "2026-04"},
+                          headers=auth("admin"))
+
+    assert ledger("2023-05").status_code == 200  # roppa-rosa 36 oy
+    assert ledger("2023-04").status_code == 400
+
+
+def test_ledger_opens_with_balance_before_from_month(client, auth):
+    student_id = _student("ledger_opening", StudentStatus.studying)
+    assert _pay(client, auth, student_id, "2025-11").status_code == 200
+    assert _pay(client, auth, student_id, "2025-12", 30).status_code == 200
+
+    ledger = _ledger(client, auth, student_id)
+
+    assert ledger["opening_balance"] == -70
+    assert [m["balance"] for m in ledger["months"]] == [-170, -270, -370, -470]
+    assert ledger["balance"] == -470
@@ -0,0 +1,51 @@
+import pytest
+
+from routers import courses, dashboard, groups, payments, students, test_page, users
+from routers.metrics import registry
+from routers.query_budget import SQL_COUNT_HEADER
+
+# (rol, URL shabloni — seed kalitlari bilan to‘ldiriladi, query, endpoint)
+BUDGETED = [
+    ("admin", "/students/", {}, students.get_students),
+    ("admin", "/students/search", {"q": "student"}, students.search_students),
+    ("admin", "/students/{student}", {}, students.get_student),
+    ("admin", "/users/", {}, users.get_users),
+    ("admin", "/users/search", {"q": "student"}, users.search_all_users),
+    ("admin", "/groups/", {}, groups.get_groups),
+    ("admin", "/courses/", {}, courses.get_courses),
+    ("admin", "/payments/", {}, payments.get_payments),
+    ("admin", "/dashboard/stats", {}, dashboard.get_dashboard_stats),
+    ("teacher", "/tests/", {}, test_page.get_my_tests),
+    ("student", "/tests/{test}", {}, test_page.get_test),
+    ("teacher", "/tests/{test}/results", {}, test_page.get_test_results),
+]
+
+
+@pytest.mark.parametrize("role,path,query,endpoint", BUDGETED, ids=[f"{r} {p}" for r, p, _, _ in BUDGETED])
+def test_endpoint_within_sql_budget(client, seed, auth, role, path, query, endpoint):
+    response = client.get(path.format(**seed), params=query, headers=auth(role))
+
+    assert response.status_code == 200, response.text
+    assert int(response.headers[SQL_COUNT_HEADER]) <= endpoint.sql_budget
+    if isinstance(response.json(), list):
+        assert response.json(), "seed ma'lumoti javobga tushmadi"
+
+
+def test_budget_exceeded_fails_in_strict_mode(client, seed, auth, monkeypatch):
+    monkeypatch.setattr(students.get_students, "sql_budget", 0)
+
+    response = client.get("/students/", headers=auth("admin"))
+
+    assert response.status_code == 500
+    assert "SQL budget exceeded" in response.json()["detail"]
+    assert int(response.headers[SQL_COUNT_HEADER]) > 0
+
+
+def test_budget_reads_metrics_counter(client, seed, auth):
+    """Budjet va /metrics bitta hisoblagichdan foydalanadi."""
+    registry.clear()
+
+    response = client.get("/students/", headers=auth("admin"))
+
+    statements, _ = registry._sql[("GET", "/students/")]
+    assert statements == int(response.headers[SQL_COUNT_HEADER])
@@ -0,0 +1,51 @@
+import json
+
+from routers import test_page
+
+
+def _create_test(client, seed, auth) -> dict:
+    response = client.post("/tests/", json={
+        "title": "Bank", "description": None, "group_id": seed["group"],
+        "questions": [{"text": "2+2", "type": "single", "options": [
+            {"text": "4", "is_correct": 1}, {"text": "5", "is_correct": 0},
+        ]}],
+    }, headers=auth("teacher"))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _import(client, auth, test_id: int, filename: str, content: bytes):
+    return client.post(f"/tests/{test_id}/import", files={"file": (filename, content)}, headers=auth("teacher"))
+
+
+def test_create_test_returns_questions_with_ids(client, seed, auth):
+    test = _create_test(client, seed, auth)
+
+    (question,) = test["questions"]
+    assert question["text"] == "2+2"
+    assert [(o["text"], o["is_correct"]) for o in question["options"]] == [("4", 1), ("5", 0)]
+    assert all(isinstance(o["id"], int) for o in question["options"])
+
+
+def test_import_streams_ndjson_and_reports_broken_line(client, seed, auth):
+    test = _create_test(client, seed, auth)
+    line = json.dumps({"text": "3+3", "options": [{"text": "6", "is_correct": 1}]})
+
+    ok = _import(client, auth, test["id"], "bank.ndjson", f"{line}\n\n{line}\n".encode())
+    assert ok.status_code == 200, ok.text
+    assert ok.json()["imported"] == 2
+
+    broken = _import(client, auth, test["id"], "bank.jsonl", f"{line}\n{{oops\n".encode())
+    assert broken.status_code == 400
+    assert "2-qator" in broken.json()["detail"]
+    assert len(client.get(f"/tests/{test['id']}", headers=auth("teacher")).json()["questions"]) == 3
+
+
+def test_import_rejects_oversized_plain_json(client, seed, auth, monkeypatch):
+    test = _create_test(client, seed, auth)
+    monkeypatch.setattr(test_page, "QUESTION_JSON_MAX_BYTES", 64)
+
+    questions = [{"text": f"Q{i}", "options": [{"text": "A", "is_correct": 1}]} for i in range(5)]
+    response = _import(client, auth, test["id"], "bank.json", json.dumps(questions).encode())
+
+    assert response.status_code == 413
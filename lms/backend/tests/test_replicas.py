@@ -0,0 +1,76 @@
+import os
+import shutil
+
+import pytest
+from sqlalchemy import event
+
+from routers import database
+from routers.database import ReplicaPool, SessionLocal
+from routers.models import Payment
+
+
+def _statements(engine) -> list:
+    seen = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: seen.append(statement))
+    return seen
+
+
+@pytest.fixture
+def replica(seed, tmp_path, monkeypatch):
+    """Primary bazaning nusxasi — nusxadan keyingi yozuvlar replikada ko‘rinmaydi."""
+    path = tmp_path / "replica.db"
+    shutil.copy(database.engine.url.database, path)
+    pool = ReplicaPool([f"sqlite:///{path}"], interval=60)
+    monkeypatch.setattr(database, "replicas", pool)
+    yield pool.replicas[0]
+    pool.replicas[0].engine.dispose()
+
+
+def _add_payment(student_id: int) -> int:
+    with SessionLocal() as db:
+        payment = Payment(amount=1, student_id=student_id, month="2026-10")
+        db.add(payment)
+        db.commit()
+        return payment.id
+
+
+def test_marked_get_reads_from_replica(client, auth, seed, replica):
+    on_replica = _statements(replica.engine)
+    fresh = _add_payment(seed["student"])  # faqat primary’da
+
+    response = client.get("/payments/", params={"student_id": seed["student"]}, headers=auth("admin"))
+
+    assert response.status_code == 200, response.text
+    assert fresh not in [payment["id"] for payment in response.json()]
+    assert any("payments" in statement for statement in on_replica)
+
+
+def test_reads_after_a_write_stay_on_primary(seed, replica):
+    on_replica, on_primary = _statements(replica.engine), _statements(database.engine)
+
+    with SessionLocal() as db:
+        assert database.use_replica(db)
+        db.query(Payment).filter(Payment.student_id == seed["student"]).count()
+        assert len(on_replica) == 1 and not on_primary
+
+        payment = Payment(amount=1, student_id=seed["student"], month="2026-10")
+        db.add(payment)
+        db.flush()
+        assert db.query(Payment).filter(Payment.id == payment.id).one() is payment
+        db.rollback()
+
+    assert len(on_replica) == 1
+    assert any(statement.startswith("SELECT") for statement in on_primary)
+
+
+def test_unhealthy_replica_falls_back_to_primary(client, auth, seed, tmp_path, monkeypatch):
+    pool = ReplicaPool([f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"], interval=60)
+    monkeypatch.setattr(database, "replicas", pool)
+    fresh = _add_payment(seed["student"])
+
+    response = client.get("/payments/", params={"student_id": seed["student"]}, headers=auth("admin"))
+
+    assert response.status_code == 200, response.text
+    assert fresh in [payment["id"] for payment in response.json()]
+    assert not pool.replicas[0].healthy
+    assert not os.path.exists(tmp_path / "missing")
@@ -0,0 +1,36 @@
+from routers.database import SessionLocal
+from routers.models import DashboardCounter
+from routers.rollups import (
+    DASHBOARD_KEYS, GROUPS_COUNT, PAYMENTS_TOTAL, ROLLUP_BUILT, aggregate_dashboard, bump, read_dashboard,
+)
+
+
+def _reset():
+    with SessionLocal() as db:
+        db.query(DashboardCounter).delete()
+        db.commit()
+
+
+def test_bump_before_rebuild_is_not_read_as_totals(seed):
+    _reset()
+    with SessionLocal() as db:
+        # Rollup hali yo‘q: har bir kalitga faqat delta yoziladi
+        bump(db, {key: 1 for key in DASHBOARD_KEYS})
+        db.commit()
+
+        assert read_dashboard(db) == aggregate_dashboard(db)
+        assert db.get(DashboardCounter, ROLLUP_BUILT) is not None
+
+
+def test_bump_after_rebuild_upserts_in_place(seed):
+    _reset()
+    with SessionLocal() as db:
+        before = read_dashboard(db)
+        bump(db, {GROUPS_COUNT: 2, PAYMENTS_TOTAL: -100})
+        db.commit()
+
+        after = read_dashboard(db)
+
+    assert after[GROUPS_COUNT] == before[GROUPS_COUNT] + 2
+    assert after[PAYMENTS_TOTAL] == before[PAYMENTS_TOTAL] - 100
+    _reset()  # boshqa testlar uchun rollup qayta quriladi
@@ -0,0 +1,61 @@
+from routers.database import SessionLocal
+from routers.models import StudentStatus, User, UserRole
+from routers.search import build_search_key, fold
+
+
+def _students(*names) -> list:
+    with SessionLocal() as db:
+        users = [
+            User(username=f"search_{i}_{len(names)}", password="x", role=UserRole.student, full_name=name,
+                 status=StudentStatus.studying)
+            for i, name in enumerate(names)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+
+def _search(client, auth, q: str, **params):
+    response = client.get("/students/search", params={"q": q, **params}, headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_fold_matches_cyrillic_and_latin_spellings():
+    assert fold("Алишер Алиев") == fold("Alisher Aliyev") == "alisher aliev"
+    assert fold("Ғайрат Ўроқов") == fold("G‘ayrat O'roqov") == "gayrat oroqov"
+    assert fold("Khurshid") == fold("Хуршид") == "xurshid"
+
+
+def test_search_key_listener_follows_inserts_and_updates(app):
+    with SessionLocal() as db:
+        user = User(username="listener", password="x", role=UserRole.student, full_name="Ғайрат", phone="90 111 22 33")
+        db.add(user)
+        db.commit()
+        assert user.search_key == "gayrat listener 998901112233"
+
+        user.full_name = "Malika Yusupova"
+        db.commit()
+        assert user.search_key == build_search_key("Malika Yusupova", "listener", "90 111 22 33")
+
+
+def test_search_finds_both_scripts(client, auth):
+    latin, cyrillic = _students("Shoxrux Rahimov", "Шохрух Раҳимов")
+
+    for q in ("shoxrux", "Шохрух", "rahimov shox"):
+        found = {user["id"] for user in _search(client, auth, q).json()}
+        assert {latin, cyrillic} <= found, q
+
+
+def test_search_pages_reach_every_match(client, auth):
+    ids = _students(*[f"Qahramon {n}" for n in range(7)])
+
+    seen, cursor = [], None
+    while True:
+        response = _search(client, auth, "qahramon", limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [user["id"] for user in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(ids)
@@ -0,0 +1,49 @@
+from sqlalchemy.exc import IntegrityError
+
+from routers import students
+from routers.database import SessionLocal
+from routers.models import User
+
+
+def _import(client, auth, csv_text: str):
+    response = client.post(
+        "/students/import", files={"file": ("students.csv", csv_text.encode(), "text/csv")}, headers=auth("admin"),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_import_reports_bad_rows_and_stores_reduced_cost_hashes(client, auth):
+    result = _import(client, auth, (
+        "username,full_name,group\n"
+        "import_new,Import New,Group 0\n"
+        "student0,Taken,\n"
+        "import_new,Again,\n"
+        "import_nogroup,No Group,Missing group\n"
+    ))
+
+    assert result["created"] == 1
+    assert [(e["row"], e["error"]) for e in result["errors"]] == [
+        (3, "Username already exists"), (4, "Duplicate username in file"), (5, "Group not found"),
+    ]
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == "import_new").one()
+        assert user.password.startswith(f"$2b${students.IMPORT_BCRYPT_ROUNDS:02d}$")
+        assert [g.name for g in user.groups_as_student] == ["Group 0"]
+
+
+def test_import_reports_other_integrity_errors_as_they_are(client, auth, monkeypatch):
+    insert_chunk = students._insert_chunk
+
+    def failing(db, valid, hashes):
+        if any(row.username == "import_broken" for _, row, _ in valid):
+            raise IntegrityError("INSERT INTO users", {}, Exception("CHECK constraint failed: fee"))
+        return insert_chunk(db, valid, hashes)
+
+    monkeypatch.setattr(students, "_insert_chunk", failing)
+    result = _import(client, auth, "username\nimport_ok\nimport_broken\n")
+
+    assert result["created"] == 1
+    assert result["errors"] == [
+        {"row": 3, "username": "import_broken", "error": "Integrity error: CHECK constraint failed: fee"},
+    ]
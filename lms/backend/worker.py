@@ -0,0 +1,38 @@
+"""
+Fon ishlari uchun alohida worker process.
+
+    JOB_WORKERS=0 uvicorn main:app ...   # API job’larni faqat navbatga qo‘yadi
+    python worker.py                     # navbatni shu process bajaradi
+    python worker.py --once              # navbatdagi hamma job’ni bajarib chiqadi
+
+Bir nechta worker parallel ishlashi mumkin — job’lar jadvaldan atomik olinadi.
+"""
+import argparse
+import time
+
+from routers.jobs import JOB_POLL_SECONDS, JOB_SWEEP_SECONDS, claim_job, expire_results, run_job
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="navbat bo‘shagach chiqish")
+    parser.add_argument("--poll", type=float, default=JOB_POLL_SECONDS)
+    args = parser.parse_args()
+
+    swept_at = 0.0
+    while True:
+        claimed = claim_job()
+        if claimed is not None:
+            print(f"▶️ job {claimed[0]}")
+            run_job(*claimed)
+            continue
+        if time.monotonic() - swept_at >= JOB_SWEEP_SECONDS:
+            swept_at = time.monotonic()
+            expire_results()
+        if args.once:
+            return
+        time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()